@@ -0,0 +1,451 @@
+# En: backend/achievements.py
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import event, bindparam, func, case
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import (
+    SessionLocal, Achievement, UserAchievement, GameProfile, UserEventCounter,
+    User, Expense, BudgetItem, HarvestLog, CultivationPlan, FamilyPlan, CommunityPost, CommunityEvent
+)
+
+# --- MOTOR DE LOGROS ---
+# Los endpoints emiten eventos de dominio ("expense_created", "harvest_logged", ...)
+# que se acumulan en la sesión durante el request. Justo antes del commit se
+# aplican todos juntos: se actualizan los contadores por ventana de cada usuario
+# (un upsert en lote y una consulta para leerlos), se recalcula el progreso de los logros cuyas
+# reglas escuchan esos eventos y los puntos se suman con un único UPDATE por lotes.
+# Nunca se vuelve a consultar el historial en el camino del request.
+
+PENDING_KEY = "pending_achievements"
+EVENTS_KEY = "pending_events"
+CHANGED_PROFILES_KEY = "changed_profiles"
+
+POINT_COLUMNS = {
+    "finance": "financial_points",
+    "cultivation": "cultivation_points",
+    "community": "community_points",
+}
+
+WINDOW_KEYS = {
+    "total": lambda moment: "total",
+    "month": lambda moment: moment.strftime("%Y-%m"),
+    "week": lambda moment: "{0}-W{1:02d}".format(*moment.isocalendar()[:2]),
+}
+
+# Catálogo base. Se inserta al arrancar si falta; en logros ya existentes solo
+# se completan los campos de la regla que estén vacíos.
+DEFAULT_ACHIEVEMENTS = [
+    {"id": "first_expense", "name": "Primer Gasto", "description": "Registraste tu primer gasto.", "icon": "🧾", "points": 10, "type": "finance", "event_type": "expense_created", "time_window": "total", "target": 1},
+    {"id": "expenses_30_month", "name": "Constancia Financiera", "description": "Registrá 30 gastos en un mismo mes.", "icon": "📒", "points": 30, "type": "finance", "event_type": "expense_created", "time_window": "month", "target": 30},
+    {"id": "budget_3_months", "name": "Presupuesto en Orden", "description": "Cerrá 3 meses gastando menos que tus ingresos.", "icon": "🏆", "points": 50, "type": "finance", "event_type": "month_under_budget", "time_window": "total", "target": 3},
+    {"id": "first_cultivation_plan", "name": "Primer Plan de Cultivo", "description": "Generaste tu primer plan de cultivo.", "icon": "🌱", "points": 10, "type": "cultivation", "event_type": "cultivation_plan_created", "time_window": "total", "target": 1},
+    {"id": "first_harvest", "name": "Primera Cosecha", "description": "Registraste tu primera cosecha.", "icon": "🥬", "points": 10, "type": "cultivation", "event_type": "harvest_logged", "time_window": "total", "target": 1},
+    {"id": "harvests_10_month", "name": "Huerta Productiva", "description": "Registrá 10 cosechas en un mismo mes.", "icon": "🧺", "points": 40, "type": "cultivation", "event_type": "harvest_logged", "time_window": "month", "target": 10},
+    {"id": "first_community_post", "name": "Primera Publicación", "description": "Compartiste tu primera publicación en la comunidad.", "icon": "💬", "points": 10, "type": "community", "event_type": "community_post_created", "time_window": "total", "target": 1},
+    {"id": "community_organizer", "name": "Organizador Comunitario", "description": "Organizá 3 eventos comunitarios.", "icon": "📣", "points": 30, "type": "community", "event_type": "community_event_created", "time_window": "total", "target": 3},
+]
+
+# `insert` con ON CONFLICT de cada base soportada, para los upserts en lote.
+UPSERT_INSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+# Fuentes para el backfill: de qué tabla sale cada evento y con qué fecha.
+EVENT_SOURCES = {
+    "expense_created": (Expense.user_email, Expense.date),
+    "harvest_logged": (HarvestLog.user_email, HarvestLog.harvest_date),
+    "cultivation_plan_created": (CultivationPlan.user_email, CultivationPlan.created_at),
+    "family_plan_created": (FamilyPlan.user_email, FamilyPlan.created_at),
+    "community_post_created": (CommunityPost.user_email, CommunityPost.created_at),
+    "community_event_created": (CommunityEvent.user_email, func.coalesce(CommunityEvent.created_at, CommunityEvent.event_date)),
+}
+
+
+def window_of(window_key: str) -> str:
+    if window_key == "total":
+        return "total"
+    return "week" if "-W" in window_key else "month"
+
+
+class AchievementDefinition:
+    __slots__ = ("id", "name", "description", "icon", "points", "type", "event_type", "time_window", "target")
+
+    def __init__(self, achievement: Achievement):
+        self.id = achievement.id
+        self.name = achievement.name
+        self.description = achievement.description
+        self.icon = achievement.icon
+        self.points = achievement.points or 0
+        self.type = achievement.type
+        self.event_type = achievement.event_type
+        self.time_window = achievement.time_window if achievement.time_window in WINDOW_KEYS else "total"
+        self.target = achievement.target if achievement.target is not None else self.points
+
+
+class Catalog:
+    def __init__(self, definitions):
+        self.by_id: Dict[str, AchievementDefinition] = {d.id: d for d in definitions}
+        self.by_event: Dict[str, list] = defaultdict(list)
+        for definition in definitions:
+            if definition.event_type:
+                self.by_event[definition.event_type].append(definition)
+
+    def windows_for(self, event_type: str) -> set:
+        return {definition.time_window for definition in self.by_event.get(event_type, [])}
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(db: Session) -> Catalog:
+    """El catálogo de logros es estático: se lee una vez y queda en memoria."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = Catalog([AchievementDefinition(a) for a in db.query(Achievement).all()])
+    return _catalog
+
+
+def invalidate_catalog():
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+
+
+def seed_catalog(db: Session):
+    existing = {a.id: a for a in db.query(Achievement).all()}
+    for data in DEFAULT_ACHIEVEMENTS:
+        achievement = existing.get(data["id"])
+        if achievement is None:
+            db.add(Achievement(**data))
+            continue
+        for field in ("event_type", "time_window", "target"):
+            if getattr(achievement, field) is None:
+                setattr(achievement, field, data[field])
+    db.commit()
+    invalidate_catalog()
+
+
+def record_event(db: Session, user_email: str, event_type: str, amount: int = 1, occurred_at: Optional[datetime] = None):
+    """Emite un evento de dominio; las reglas que lo escuchan se evalúan en el próximo commit."""
+    db.info.setdefault(EVENTS_KEY, []).append((user_email, event_type, amount, occurred_at or datetime.utcnow()))
+
+
+def record_progress(db: Session, user_email: str, achievement_id: str, progress_to_add: int = 1):
+    """Suma progreso manual a un logro puntual; se aplica en el próximo commit de la sesión."""
+    pending = db.info.setdefault(PENDING_KEY, defaultdict(int))
+    pending[(user_email, achievement_id)] += progress_to_add
+
+
+def apply_events(db: Session, events: list, catalog: Catalog) -> Dict[tuple, int]:
+    """
+    Actualiza los contadores por ventana y devuelve el progreso absoluto que
+    corresponde a cada (email, logro) según sus valores nuevos.
+    """
+    increments = defaultdict(int)
+    for email, event_type, amount, occurred_at in events:
+        for window in catalog.windows_for(event_type):
+            increments[(email, event_type, WINDOW_KEYS[window](occurred_at))] += amount
+    if not increments:
+        return {}
+
+    # Todos los contadores se suman con un único upsert en lote (executemany):
+    # `INSERT ... ON CONFLICT DO UPDATE SET count = count + excluded.count` es
+    # atómico, así que eventos concurrentes no pisan ni pierden incrementos.
+    table = UserEventCounter.__table__
+    connection = db.connection()
+    statement = UPSERT_INSERTS[connection.dialect.name](table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.user_email, table.c.event_type, table.c.window_key],
+        set_={"count": table.c.count + statement.excluded.count}
+    )
+    connection.execute(statement, [
+        {"user_email": email, "event_type": event_type, "window_key": window_key, "count": amount}
+        for (email, event_type, window_key), amount in increments.items()
+    ])
+
+    counters = {
+        (email, event_type, window_key): count
+        for email, event_type, window_key, count in db.query(
+            UserEventCounter.user_email, UserEventCounter.event_type, UserEventCounter.window_key, UserEventCounter.count
+        ).filter(
+            UserEventCounter.user_email.in_({key[0] for key in increments}),
+            UserEventCounter.event_type.in_({key[1] for key in increments}),
+            UserEventCounter.window_key.in_({key[2] for key in increments})
+        )
+    }
+
+    progress = {}
+    for (email, event_type, window_key) in increments:
+        window = window_of(window_key)
+        for definition in catalog.by_event[event_type]:
+            if definition.time_window != window:
+                continue
+            key = (email, definition.id)
+            progress[key] = max(progress.get(key, 0), counters.get((email, event_type, window_key), 0))
+    return progress
+
+
+def apply_pending(db: Session, increments: Dict[tuple, int], absolutes: Optional[Dict[tuple, int]] = None) -> list:
+    """
+    Aplica el progreso acumulado (sumas manuales y valores absolutos de las reglas).
+    Devuelve los logros desbloqueados como (email, AchievementDefinition).
+    """
+    catalog = get_catalog(db)
+    absolutes = absolutes or {}
+    for achievement_id in {achievement_id for _, achievement_id in increments if achievement_id not in catalog.by_id}:
+        print(f"Advertencia: Logro '{achievement_id}' no encontrado en la base de datos.")
+    keys = {key for key in set(increments) | set(absolutes) if key[1] in catalog.by_id}
+    if not keys:
+        return []
+
+    existing = {
+        (ua.user_email, ua.achievement_id): ua
+        for ua in db.query(UserAchievement).filter(
+            UserAchievement.user_email.in_({email for email, _ in keys}),
+            UserAchievement.achievement_id.in_({achievement_id for _, achievement_id in keys})
+        )
+    }
+
+    unlocked = []
+    deltas = defaultdict(lambda: defaultdict(int))
+    for email, achievement_id in keys:
+        definition = catalog.by_id[achievement_id]
+        user_achiev = existing.get((email, achievement_id))
+        if user_achiev is None:
+            user_achiev = UserAchievement(user_email=email, achievement_id=achievement_id, progress=0, is_completed=False)
+            db.add(user_achiev)
+        if user_achiev.is_completed:
+            continue
+        mark_profile_changed(db, email)
+        # El valor que viene de un contador es el progreso real de la ventana vigente
+        # (así los logros mensuales se reinician); las sumas manuales se agregan encima.
+        base = absolutes[(email, achievement_id)] if (email, achievement_id) in absolutes else (user_achiev.progress or 0)
+        progress = base + increments.get((email, achievement_id), 0)
+        user_achiev.progress = min(progress, definition.target) if definition.target else progress
+        if user_achiev.progress >= definition.target:
+            user_achiev.is_completed = True
+            user_achiev.completion_date = datetime.utcnow()
+            column = POINT_COLUMNS.get(definition.type)
+            if column:
+                deltas[email][column] += definition.points
+            deltas[email]["resi_score"] += definition.points * 2
+            deltas[email]["resilient_coins"] += definition.points * 5
+            unlocked.append((email, definition))
+
+    if deltas:
+        apply_profile_deltas(db, deltas)
+    return unlocked
+
+
+def apply_profile_deltas(db: Session, deltas: Dict[str, Dict[str, int]], reason: str = "achievement"):
+    """
+    Suma los deltas de puntos con un único UPDATE ejecutado en lote (executemany).
+    El ResiScore ganado también acumula en el puntaje semanal, que se reinicia
+    solo cuando el perfil suma en una semana nueva. Las monedas quedan
+    registradas en el libro (coin_ledger) con el motivo `reason`.
+    """
+    columns = ("resi_score", "resilient_coins", "financial_points", "cultivation_points", "community_points")
+    profiles = GameProfile.__table__
+    week = WINDOW_KEYS["week"](datetime.utcnow())
+    values = {column: profiles.c[column] + bindparam(f"b_{column}") for column in columns}
+    values["weekly_score"] = case(
+        (profiles.c.weekly_score_week == bindparam("b_week"), profiles.c.weekly_score + bindparam("b_weekly")),
+        else_=bindparam("b_weekly")
+    )
+    values["weekly_score_week"] = bindparam("b_week")
+    statement = profiles.update().where(profiles.c.user_email == bindparam("b_email")).values(values)
+    params = [
+        {
+            "b_email": email,
+            "b_week": week,
+            "b_weekly": changes.get("resi_score", 0),
+            **{f"b_{column}": changes.get(column, 0) for column in columns}
+        }
+        for email, changes in deltas.items()
+    ]
+    db.connection().execute(statement, params)
+    from coins import record_entries
+    record_entries(db, [
+        {"user_email": email, "delta": changes["resilient_coins"], "reason": reason}
+        for email, changes in deltas.items() if changes.get("resilient_coins")
+    ])
+    for email in deltas:
+        mark_profile_changed(db, email)
+
+
+# --- AVISOS DE CAMBIOS EN PERFILES ---
+# Quien necesite reaccionar a cambios de puntos o monedas (ranking, caches) se
+# suscribe acá. Los avisos salen recién después del commit, con los emails afectados.
+_profile_listeners = []
+
+
+def on_profile_change(listener):
+    _profile_listeners.append(listener)
+    return listener
+
+
+def mark_profile_changed(db: Session, user_email: str):
+    db.info.setdefault(CHANGED_PROFILES_KEY, set()).add(user_email)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _notify_profile_changes(session: Session):
+    emails = session.info.pop(CHANGED_PROFILES_KEY, None)
+    if not emails:
+        return
+    for listener in _profile_listeners:
+        try:
+            listener(emails)
+        except Exception as e:
+            print(f"Error al notificar cambios de perfil: {e}")
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _flush_pending_achievements(session: Session):
+    increments = session.info.pop(PENDING_KEY, None) or {}
+    events = session.info.pop(EVENTS_KEY, None) or []
+    if not increments and not events:
+        return
+    # Los datos del usuario se escriben antes y fuera del savepoint: sus errores sí
+    # abortan el commit. Un error en los logros solo descarta los logros.
+    session.flush()
+    try:
+        with session.begin_nested():
+            absolutes = apply_events(session, events, get_catalog(session)) if events else {}
+            apply_pending(session, increments, absolutes)
+    except Exception as e:
+        print(f"Error al aplicar logros; se descartan sin afectar el resto del commit: {e}")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending_achievements(session: Session):
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(EVENTS_KEY, None)
+    session.info.pop(CHANGED_PROFILES_KEY, None)
+
+
+# --- CIERRE DE MES ---
+# "month_under_budget" no lo emite ningún endpoint: lo emite la tarea periódica
+# close_month una vez cerrado el mes. Cada usuario evaluado queda marcado con un
+# contador MONTH_CLOSED_MARKER del mes, escrito en la misma transacción que el
+# evento, así la tarea se puede repetir o correr en varias instancias sin contar
+# un mes dos veces.
+MONTH_CLOSED_MARKER = "month_closed"
+
+
+def close_month(db: Session, now: Optional[datetime] = None) -> dict:
+    """Emite `month_under_budget` para cada usuario que cerró el mes anterior gastando menos que su ingreso declarado."""
+    end = (now or datetime.utcnow()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start = (end - timedelta(days=1)).replace(day=1)
+    month = WINDOW_KEYS["month"](start)
+
+    closed = {email for (email,) in db.query(UserEventCounter.user_email).filter(
+        UserEventCounter.event_type == MONTH_CLOSED_MARKER, UserEventCounter.window_key == month
+    )}
+    incomes = dict(db.query(BudgetItem.user_email, BudgetItem.allocated_amount).filter(BudgetItem.category == "_income"))
+    spent_by_user = db.query(Expense.user_email, func.sum(Expense.amount)).filter(
+        Expense.date >= start, Expense.date < end
+    ).group_by(Expense.user_email).all()
+
+    emitted = 0
+    for email, spent in spent_by_user:
+        income = incomes.get(email) or 0
+        if email is None or email in closed or income <= 0 or (spent or 0) > income:
+            continue
+        try:
+            with db.begin_nested():
+                db.connection().execute(UserEventCounter.__table__.insert().values(
+                    user_email=email, event_type=MONTH_CLOSED_MARKER, window_key=month, count=1
+                ))
+        except IntegrityError:
+            continue  # Otra instancia ya cerró el mes de este usuario.
+        record_event(db, email, "month_under_budget", occurred_at=end - timedelta(microseconds=1))
+        db.commit()
+        emitted += 1
+    return {"month": month, "users": emitted}
+
+
+# --- BACKFILL ---
+def _count_months_under_budget(db: Session, counts: Dict[tuple, int]):
+    """
+    Cuenta, por usuario, los meses cerrados en los que gastó menos que su ingreso
+    declarado, con la marca de cierre de cada mes para que close_month no los repita.
+    """
+    incomes = dict(db.query(BudgetItem.user_email, BudgetItem.allocated_amount).filter(BudgetItem.category == "_income"))
+    current_month = WINDOW_KEYS["month"](datetime.utcnow())
+    monthly_spent = defaultdict(float)
+    for email, date, amount in db.query(Expense.user_email, Expense.date, Expense.amount).yield_per(5000):
+        if date is None:
+            continue
+        month = WINDOW_KEYS["month"](date)
+        if month < current_month:
+            monthly_spent[(email, month)] += amount or 0
+    for (email, month), spent in monthly_spent.items():
+        income = incomes.get(email) or 0
+        if income > 0 and spent <= income:
+            counts[(email, "month_under_budget", "total")] += 1
+            counts[(email, MONTH_CLOSED_MARKER, month)] = 1
+
+
+def backfill(db: Session) -> dict:
+    """
+    Recalcula en bloque los contadores de eventos y el progreso de logros de
+    todos los usuarios a partir del historial. Los logros ya completados se
+    mantienen; los que se completen ahora suman sus puntos como siempre.
+    Borra y reescribe todos los contadores: es una migración para correr una vez
+    (o al cambiar el catálogo) sin tráfico, porque los eventos que lleguen mientras
+    corre se pierden. Los meses cerrados los registra close_month.
+    """
+    seed_catalog(db)
+    catalog = get_catalog(db)
+
+    counts = defaultdict(int)
+    for event_type, (email_column, date_column) in EVENT_SOURCES.items():
+        windows = catalog.windows_for(event_type)
+        if not windows:
+            continue
+        for email, occurred_at in db.query(email_column, date_column).yield_per(5000):
+            if email is None or occurred_at is None:
+                continue
+            for window in windows:
+                counts[(email, event_type, WINDOW_KEYS[window](occurred_at))] += 1
+    if catalog.windows_for("month_under_budget"):
+        _count_months_under_budget(db, counts)
+
+    db.query(UserEventCounter).delete(synchronize_session=False)
+    if counts:
+        db.connection().execute(
+            UserEventCounter.__table__.insert(),
+            [{"user_email": email, "event_type": event_type, "window_key": window_key, "count": count}
+             for (email, event_type, window_key), count in counts.items()]
+        )
+
+    now = datetime.utcnow()
+    absolutes = {}
+    for (email, event_type, window_key), count in counts.items():
+        window = window_of(window_key)
+        for definition in catalog.by_event.get(event_type, []):
+            if definition.time_window != window:
+                continue
+            # Ventanas pasadas solo cuentan si ya alcanzaron la meta.
+            if window_key != WINDOW_KEYS[window](now) and count < definition.target:
+                continue
+            key = (email, definition.id)
+            absolutes[key] = max(absolutes.get(key, 0), count)
+
+    known_users = {email for (email,) in db.query(User.email)}
+    absolutes = {key: value for key, value in absolutes.items() if key[0] in known_users}
+    unlocked = apply_pending(db, {}, absolutes)
+    db.commit()
+    return {"counters": len(counts), "users": len({key[0] for key in absolutes}), "unlocked": len(unlocked)}
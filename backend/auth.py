@@ -0,0 +1,122 @@
+# En: backend/auth.py
+import os
+import time
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from cache import TTLCache
+from metrics import track_upstream
+
+# --- VERIFICACIÓN DE TOKENS ---
+# El frontend (NextAuth) manda `Authorization: Bearer <jwt>`. Se acepta:
+# - HS256 con el secreto compartido (AUTH_JWT_SECRET o NEXTAUTH_SECRET), o
+# - firmas asimétricas verificadas contra un JWKS (AUTH_JWKS_URL).
+# Un token ya verificado se guarda por su hash hasta que vence, así que los
+# pedidos siguientes no vuelven a verificar la firma. El JWKS también se cachea
+# y solo se vuelve a bajar si aparece un `kid` desconocido.
+#
+# Sin nada configurado se rechaza todo token. El esquema viejo (el bearer es
+# el email, sin verificar) solo se acepta con AUTH_INSECURE_DEV=1, para
+# desarrollo local: en cualquier otro entorno permitiría hacerse pasar por
+# cualquier usuario.
+
+JWT_SECRET = os.environ.get("AUTH_JWT_SECRET") or os.environ.get("NEXTAUTH_SECRET")
+JWKS_URL = os.environ.get("AUTH_JWKS_URL")
+JWT_ISSUER = os.environ.get("AUTH_ISSUER")
+JWT_AUDIENCE = os.environ.get("AUTH_AUDIENCE")
+INSECURE_DEV = os.environ.get("AUTH_INSECURE_DEV") == "1"
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256"]
+
+TOKEN_CACHE_MAX_SECONDS = 300
+JWKS_CACHE_SECONDS = 3600
+JWKS_MIN_REFRESH_SECONDS = 60
+LEEWAY_SECONDS = 30
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def is_configured() -> bool:
+    return bool(JWT_SECRET or JWKS_URL)
+
+
+_verified = TTLCache(maxsize=50000, ttl=TOKEN_CACHE_MAX_SECONDS)
+
+
+class _KeySet:
+    def __init__(self, url: str):
+        self.url = url
+        self._keys: Dict[str, object] = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        import httpx
+        import jwt
+        with track_upstream("jwks", "fetch"):
+            response = httpx.get(self.url, timeout=5.0)
+        response.raise_for_status()
+        keys = {}
+        for jwk in response.json().get("keys", []):
+            try:
+                keys[jwk.get("kid", "")] = jwt.PyJWK(jwk).key
+            except jwt.PyJWTError:
+                continue
+        self._keys, self._fetched_at = keys, time.monotonic()
+
+    def get(self, kid: str):
+        with self._lock:
+            age = time.monotonic() - self._fetched_at
+            stale = age > JWKS_CACHE_SECONDS
+            unknown = kid not in self._keys and age > JWKS_MIN_REFRESH_SECONDS
+            if not self._keys or stale or unknown:
+                self._refresh()
+            key = self._keys.get(kid)
+        if key is None:
+            raise InvalidToken("Clave de firma desconocida.")
+        return key
+
+
+_key_set: Optional[_KeySet] = _KeySet(JWKS_URL) if JWKS_URL else None
+
+
+def _decode(token: str) -> dict:
+    import jwt
+    options = {"require": ["exp"], "verify_aud": JWT_AUDIENCE is not None}
+    kwargs = {"audience": JWT_AUDIENCE, "issuer": JWT_ISSUER, "leeway": LEEWAY_SECONDS, "options": options}
+    try:
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") == "HS256" and JWT_SECRET:
+            return jwt.decode(token, JWT_SECRET, algorithms=["HS256"], **kwargs)
+        if _key_set is not None and header.get("alg") in ASYMMETRIC_ALGORITHMS:
+            return jwt.decode(token, _key_set.get(header.get("kid", "")), algorithms=ASYMMETRIC_ALGORITHMS, **kwargs)
+    except jwt.PyJWTError as e:
+        raise InvalidToken(str(e))
+    raise InvalidToken("Algoritmo de firma no admitido.")
+
+
+def verify(token: str) -> str:
+    """Devuelve el email del token o levanta InvalidToken."""
+    if not is_configured():
+        if INSECURE_DEV:
+            return token
+        raise InvalidToken("La verificación de tokens no está configurada.")
+
+    cache_key = hashlib.sha256(token.encode()).digest()
+    cached = _verified.get(cache_key)
+    if cached is not None:
+        email, expires_at = cached
+        if expires_at > time.time():
+            return email
+
+    claims = _decode(token)
+    email = claims.get("email") or claims.get("sub")
+    if not email:
+        raise InvalidToken("El token no tiene email.")
+    expires_at = float(claims["exp"])
+    ttl = min(expires_at - time.time(), TOKEN_CACHE_MAX_SECONDS)
+    if ttl > 0:
+        _verified.set(cache_key, (email, expires_at), ttl=ttl)
+    return email
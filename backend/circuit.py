@@ -0,0 +1,126 @@
+# En: backend/circuit.py
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+# --- CORTACIRCUITOS PARA SERVICIOS EXTERNOS ---
+# Cada servicio externo (Gemini, dolarapi, Speech) tiene su cortacircuitos:
+# - "closed": las llamadas pasan y se anota si fallaron (o tardaron más de
+#   `slow_call_seconds`) en una ventana de `window_seconds`.
+# - "open": si en la ventana hubo al menos `min_calls` llamadas y fallaron más
+#   de `failure_rate`, durante `open_seconds` las llamadas fallan al instante
+#   con CircuitOpen, sin esperar el timeout. Cada ruta decide su respaldo.
+# - "half_open": pasado ese tiempo se deja pasar una sola llamada de prueba;
+#   si sale bien se vuelve a "closed", si no, a "open".
+# El estado es por proceso: cada instancia detecta la caída por su lado.
+
+CIRCUIT_BREAKER_ENABLED = os.environ.get("CIRCUIT_BREAKER_ENABLED", "1") == "1"
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"El servicio '{name}' no está respondiendo; se reintenta en {retry_after:.0f}s.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_rate: float = 0.5, min_calls: int = 5, window_seconds: float = 30.0,
+                 open_seconds: float = 30.0, slow_call_seconds: Optional[float] = None,
+                 is_failure: Callable[[BaseException], bool] = lambda error: True):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.is_failure = is_failure
+        self.state = "closed"
+        self._outcomes = deque()  # (momento, falló)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        BREAKERS[name] = self
+
+    def _transition(self, state: str):
+        if state != self.state:
+            print(f"Cortacircuitos '{self.name}': {self.state} -> {state}")
+            self.state = state
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def before_call(self):
+        """Levanta CircuitOpen si la llamada no debe salir."""
+        if not CIRCUIT_BREAKER_ENABLED:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self.state == "open":
+                remaining = self._opened_at + self.open_seconds - now
+                if remaining > 0:
+                    raise CircuitOpen(self.name, remaining)
+                self._transition("half_open")
+            if self.state == "half_open":
+                if self._probing:
+                    raise CircuitOpen(self.name, self.open_seconds)
+                self._probing = True
+
+    def record(self, failed: bool):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+                self._outcomes.clear()
+                if failed:
+                    self._opened_at = now
+                    self._transition("open")
+                else:
+                    self._transition("closed")
+                return
+            self._outcomes.append((now, failed))
+            self._trim(now)
+            failures = sum(1 for _, outcome in self._outcomes if outcome)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._opened_at = now
+                self._outcomes.clear()
+                self._transition("open")
+
+    @contextmanager
+    def guard(self):
+        """`with breaker.guard(): llamada()`: fallo rápido si está abierto y registro del resultado."""
+        self.before_call()
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as error:
+            self.record(self.is_failure(error))
+            raise
+        slow = self.slow_call_seconds is not None and time.monotonic() - started > self.slow_call_seconds
+        self.record(slow)
+
+
+BREAKERS: Dict[str, CircuitBreaker] = {}
+
+
+def _is_google_failure(error: BaseException) -> bool:
+    # Un pedido mal armado (4xx) no dice nada de la salud de un servicio de Google.
+    # OutOfRange es el corte de un stream de voz cuyo cliente dejó de mandar audio.
+    try:
+        from google.api_core import exceptions as google_exceptions
+    except ImportError:
+        return True
+    return not isinstance(error, (google_exceptions.InvalidArgument, google_exceptions.PermissionDenied, google_exceptions.NotFound, google_exceptions.OutOfRange))
+
+
+GEMINI = CircuitBreaker("gemini", open_seconds=30.0, slow_call_seconds=20.0, is_failure=_is_google_failure)
+DOLARAPI = CircuitBreaker("dolarapi", min_calls=3, open_seconds=60.0, slow_call_seconds=2.0)
+GOOGLE_SPEECH = CircuitBreaker("google_speech", open_seconds=30.0, is_failure=_is_google_failure)
+
+
+def states() -> Dict[str, str]:
+    return {name: breaker.state for name, breaker in BREAKERS.items()}
@@ -0,0 +1,236 @@
+# En: backend/clients.py
+import os
+import time
+import textwrap
+import threading
+from contextlib import contextmanager
+
+from metrics import track_upstream
+import tracing
+import usage
+import prompts
+import circuit
+
+# --- REGISTRO PEREZOSO DE CLIENTES PESADOS ---
+# Los modelos de Gemini y el motor de voz se crean recién en el primer uso (o en
+# /warmup), no al importar. Así un arranque en frío de Cloud Run no paga por
+# clientes que quizás ese contenedor nunca use.
+
+GEMINI_MODEL_NAME = os.environ.get("GEMINI_MODEL_NAME", "gemini-1.5-flash-latest")
+# Tope por llamada; sin él, una llamada colgada retiene el hilo indefinidamente.
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "30"))
+
+CHAT_SYSTEM_INSTRUCTION = textwrap.dedent("""
+    Eres "Resi", un asistente de IA amigable, empático y experto en resiliencia económica y alimentaria para usuarios en Argentina. Tu propósito es empoderar a las personas para que tomen el control de sus finanzas y bienestar.
+
+    Tu personalidad:
+    - Tono: Cercano, motivador y práctico. Usá un lenguaje coloquial argentino (ej: "vos" en lugar de "tú", "plata" en lugar de "dinero").
+    - Enfoque: Siempre positivo y orientado a soluciones. No juzgues, solo ayudá.
+    - Conocimiento: Experto en finanzas personales, ahorro, presupuesto, cultivo casero y planificación familiar, todo adaptado al contexto argentino.
+
+    Herramientas Internas de Resi (Tus propias herramientas):
+    - "Módulo Financiero": Incluye un "Planificador" para asignar presupuestos, "Metas de Ahorro" para fijar objetivos, un "Historial" para ver gastos pasados y una sección de "Análisis" con gráficos.
+    - "Módulo de Cultivo": Un planificador para que los usuarios creen su propio huerto casero (hidropónico u orgánico) y así puedan producir sus alimentos y ahorrar dinero.
+    - "Módulo de Planificación Familiar": Una herramienta que genera planes de comidas, ahorro y ocio adaptados a la familia del usuario.
+    - "Registro de Gastos": El usuario puede registrar gastos por voz o texto a través de un botón flotante.
+
+    Ahora tienes acceso a información más profunda del usuario. Úsala para dar consejos increíblemente personalizados:
+    - `risk_profile`: Perfil de riesgo del usuario (Conservador, Moderado, Audaz). Adapta tus sugerencias de ahorro e inversión a esto.
+    - `long_term_goals`: Metas a largo plazo del usuario (ej: "comprar una casa", "jubilarme a los 60"). Ayúdalo a alinear sus decisiones diarias con estas metas.
+    - `last_family_plan`: El último plan familiar que generó. Si pregunta sobre comidas o actividades, básate en este plan.
+    - `last_cultivation_plan`: El último plan de cultivo que generó. Si pregunta sobre su huerta, utiliza este plan como base.
+
+    NUEVA CAPACIDAD: CONTEXTO EN TIEMPO REAL
+    Al inicio de cada conversación, recibirás un bloque de "CONTEXTO EN TIEMPO REAL" con datos económicos actuales. DEBES usar esta información para que tus consejos sean precisos y valiosos.
+    Ejemplo de cómo usar el contexto:
+    - Si el usuario pregunta si le conviene comprar dólares, tu respuesta DEBE basarse en la cotización del Dólar Blue que te fue proporcionada.
+    - Si un usuario quiere invertir, DEBES mencionar la tasa de plazo fijo actual (próximamente) y compararla con la inflación (próximamente) para evaluar si es una buena opción.
+    - NO inventes datos. Si no tienes un dato específico (ej. inflación del mes), acláralo.
+
+    Tus reglas:
+    1.  Integra siempre el contexto del usuario y el contexto en tiempo real en tus respuestas.
+    2.  Si el usuario pregunta algo fuera de tus temas, redirige amablemente la conversación a tus temas centrales.
+    3.  Sé conciso y andá al grano.
+    4.  Utilizá el historial de chat para recordar conversaciones pasadas.
+    5.  NUNCA uses formato Markdown (asteriscos, etc.). Responde siempre en texto plano.
+    6.  MUY IMPORTANTE: Antes de sugerir cualquier herramienta o solución externa, SIEMPRE priorizá y recomendá las "Herramientas Internas de Resi".
+    """)
+
+MODEL_SPECS = {
+    "chat": {"system_instruction": CHAT_SYSTEM_INSTRUCTION},
+    "expense_parser": {"system_instruction": prompts.EXPENSE_SYSTEM_INSTRUCTION},
+    "plan_generator": {"system_instruction": prompts.PLAN_SYSTEM_INSTRUCTION, "generation_config": prompts.PLAN_OUTPUT},
+    "validator": {"system_instruction": prompts.VALIDATOR_SYSTEM_INSTRUCTION, "generation_config": prompts.VALIDATOR_OUTPUT},
+    "family_plan_generator": {"system_instruction": prompts.FAMILY_PLAN_SYSTEM_INSTRUCTION, "generation_config": prompts.FAMILY_PLAN_OUTPUT},
+}
+
+_lock = threading.Lock()
+_genai = None
+_models = {}
+_speech_backend = None
+
+
+def _get_genai():
+    """Importa y configura el SDK de Gemini una sola vez, en el primer uso."""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+                _genai = genai
+    return _genai
+
+
+def _prompt_chars(contents) -> int:
+    """Tamaño aproximado del prompt (texto plano, historial de chat o lista de partes)."""
+    if isinstance(contents, str):
+        return len(contents)
+    if isinstance(contents, (list, tuple)):
+        return sum(_prompt_chars(part) for part in contents)
+    if isinstance(contents, dict):
+        return _prompt_chars(contents.get("parts", []))
+    return 0
+
+
+def _token_counts(response):
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return 0, 0
+    return getattr(metadata, "prompt_token_count", 0) or 0, getattr(metadata, "candidates_token_count", 0) or 0
+
+
+@contextmanager
+def _observed(operation: str, name: str, model_name: str, user_email, attempt: int, prompt_chars: int):
+    """
+    Mide, traza y suma al consumo del usuario (usage.py) una llamada a Gemini.
+    Si el cortacircuitos está abierto, falla enseguida con CircuitOpen sin contar consumo.
+    """
+    attributes = {
+        "gen_ai.system": "gemini",
+        "gen_ai.request.model": model_name,
+        "resi.feature": name,
+        "resi.prompt_chars": prompt_chars,
+        "resi.attempt": attempt,
+    }
+    result = {}
+    with circuit.GEMINI.guard():
+        started = time.perf_counter()
+        error = False
+        try:
+            with track_upstream("gemini", name), tracing.span(operation, **attributes) as current:
+                yield result
+                prompt_tokens, completion_tokens = _token_counts(result.get("response"))
+                current.set_attributes({"gen_ai.usage.input_tokens": prompt_tokens, "gen_ai.usage.output_tokens": completion_tokens})
+        except BaseException:
+            error = True
+            raise
+        finally:
+            prompt_tokens, completion_tokens = _token_counts(result.get("response"))
+            usage.record(user_email, name, model_name, prompt_tokens, completion_tokens,
+                         (time.perf_counter() - started) * 1000, attempt=attempt, error=error)
+
+
+class _TimedChat:
+    def __init__(self, chat, name: str, model_name: str, history_chars: int, user_email=None):
+        self._chat = chat
+        self._name = name
+        self._model_name = model_name
+        self._history_chars = history_chars
+        self._user_email = user_email
+
+    def send_message(self, content, *args, **kwargs):
+        prompt_chars = self._history_chars + _prompt_chars(content)
+        with _observed("gemini.send_message", self._name, self._model_name, self._user_email, 1, prompt_chars) as result:
+            kwargs.setdefault("request_options", {"timeout": GEMINI_TIMEOUT_SECONDS})
+            result["response"] = self._chat.send_message(content, *args, **kwargs)
+            return result["response"]
+
+    def __getattr__(self, attribute):
+        return getattr(self._chat, attribute)
+
+
+class _TimedModel:
+    """
+    Envuelve un GenerativeModel para medir, trazar y contabilizar cada llamada
+    (ver metrics.py, tracing.py y usage.py). Con `user_email` se aplica el
+    presupuesto diario: pasado el límite se usa el modelo barato o se corta.
+    """
+
+    def __init__(self, model, name: str, model_name: str, model_kwargs: dict):
+        self._model = model
+        self._name = name
+        self._model_name = model_name
+        self._model_kwargs = model_kwargs
+        self._downgraded = None
+
+    def _for_user(self, user_email):
+        decision = usage.budget_decision(user_email)
+        if decision == "block":
+            raise usage.BudgetExceeded()
+        if decision == "downgrade" and self._model_name != usage.LLM_DOWNGRADE_MODEL:
+            if self._downgraded is None:
+                kwargs = dict(self._model_kwargs, model_name=usage.LLM_DOWNGRADE_MODEL)
+                self._downgraded = _get_genai().GenerativeModel(**kwargs)
+            return self._downgraded, usage.LLM_DOWNGRADE_MODEL
+        return self._model, self._model_name
+
+    def generate_content(self, contents, *args, attempt: int = 1, user_email=None, **kwargs):
+        """Igual que en el SDK; `attempt` es el número de intento y `user_email` a quién se le cuenta el consumo."""
+        model, model_name = self._for_user(user_email)
+        with _observed("gemini.generate_content", self._name, model_name, user_email, attempt, _prompt_chars(contents)) as result:
+            kwargs.setdefault("request_options", {"timeout": GEMINI_TIMEOUT_SECONDS})
+            result["response"] = model.generate_content(contents, *args, **kwargs)
+            return result["response"]
+
+    def start_chat(self, *args, user_email=None, **kwargs):
+        model, model_name = self._for_user(user_email)
+        history_chars = _prompt_chars(kwargs.get("history") or [])
+        return _TimedChat(model.start_chat(*args, **kwargs), self._name, model_name, history_chars, user_email)
+
+    def __getattr__(self, attribute):
+        return getattr(self._model, attribute)
+
+
+def get_model(key: str):
+    """Devuelve el modelo compartido registrado en MODEL_SPECS, creándolo si hace falta."""
+    model = _models.get(key)
+    if model is not None:
+        return model
+    if key not in MODEL_SPECS:
+        raise KeyError(f"Modelo de IA desconocido: '{key}'")
+    genai = _get_genai()
+    with _lock:
+        if key not in _models:
+            kwargs = dict(MODEL_SPECS[key], model_name=GEMINI_MODEL_NAME)
+            _models[key] = _TimedModel(genai.GenerativeModel(**kwargs), key, GEMINI_MODEL_NAME, kwargs)
+        return _models[key]
+
+
+def get_speech_backend():
+    global _speech_backend
+    if _speech_backend is None:
+        with _lock:
+            if _speech_backend is None:
+                from transcription import create_speech_backend
+                _speech_backend = create_speech_backend()
+    return _speech_backend
+
+
+def shutdown():
+    if _speech_backend is not None and hasattr(_speech_backend, "shutdown"):
+        _speech_backend.shutdown()
+
+
+def warm_up(include_speech: bool = True) -> dict:
+    """Inicializa todos los clientes y devuelve cuánto tardó cada uno, en milisegundos."""
+    timings = {}
+    for key in MODEL_SPECS:
+        started = time.perf_counter()
+        get_model(key)
+        timings[key] = round((time.perf_counter() - started) * 1000, 2)
+    if include_speech:
+        started = time.perf_counter()
+        get_speech_backend()
+        timings["speech"] = round((time.perf_counter() - started) * 1000, 2)
+    return timings
@@ -0,0 +1,97 @@
+# En: backend/coins.py
+import math
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import update, func
+from sqlalchemy.orm import Session
+
+from database import GameProfile, CoinLedgerEntry
+from achievements import mark_profile_changed
+
+# --- LIBRO MAYOR DE MONEDAS ---
+# Los saldos nunca se modifican con leer-sumar-escribir en Python: cada
+# movimiento es un UPDATE atómico `coins = coins + :delta` (con la condición
+# `coins >= :costo` si es un débito) más una fila en `coin_ledger` dentro de la
+# misma transacción. Dos compras concurrentes no pueden pisarse ni dejar saldo negativo.
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def coin_price(price: float) -> int:
+    """Los precios del marketplace son Float; las monedas, enteras. Redondeamos hacia arriba."""
+    return int(math.ceil(price or 0))
+
+
+def apply(db: Session, user_email: str, delta: int, reason: str, reference: Optional[str] = None):
+    """
+    Mueve `delta` monedas en el saldo del usuario y lo registra en el libro.
+    Los débitos fallan con InsufficientFunds si el saldo no alcanza (o no hay perfil).
+    No commitea: el movimiento se confirma junto con el resto de la operación.
+    """
+    profiles = GameProfile.__table__
+    statement = update(profiles).where(profiles.c.user_email == user_email).values(
+        resilient_coins=profiles.c.resilient_coins + delta
+    )
+    if delta < 0:
+        statement = statement.where(profiles.c.resilient_coins >= -delta)
+    result = db.execute(statement)
+    if result.rowcount != 1:
+        raise InsufficientFunds(f"Saldo insuficiente para {user_email}")
+    db.add(CoinLedgerEntry(user_email=user_email, delta=delta, reason=reason, reference=reference))
+    mark_profile_changed(db, user_email)
+
+
+def record_entries(db: Session, entries: list):
+    """Agrega en lote filas al libro para movimientos ya aplicados en el saldo (ej: logros)."""
+    if entries:
+        now = datetime.utcnow()
+        db.connection().execute(
+            CoinLedgerEntry.__table__.insert(),
+            [{"created_at": now, "reference": None, **entry} for entry in entries]
+        )
+
+
+def reconcile_balances(db: Session) -> dict:
+    """
+    Compara cada saldo con la suma de su libro. El libro manda: un saldo que no
+    coincide se informa (log y resultado) y se corrige al total del libro; nunca
+    se agrega un movimiento para taparlo. La única excepción son los perfiles sin
+    ningún movimiento (saldos previos al libro), que reciben un "opening_balance".
+    Se resuelve en una sola consulta para que saldos y libro salgan de la misma foto.
+    """
+    ledger = db.query(
+        CoinLedgerEntry.user_email, func.sum(CoinLedgerEntry.delta).label("total")
+    ).group_by(CoinLedgerEntry.user_email).subquery()
+    ledger_total = func.coalesce(ledger.c.total, 0)
+    rows = db.query(GameProfile.user_email, GameProfile.resilient_coins, ledger.c.total).outerjoin(
+        ledger, ledger.c.user_email == GameProfile.user_email
+    ).filter(func.coalesce(GameProfile.resilient_coins, 0) != ledger_total).all()
+
+    openings = [
+        {"user_email": email, "delta": balance, "reason": "opening_balance"}
+        for email, balance, total in rows if total is None
+    ]
+    record_entries(db, openings)
+
+    profiles = GameProfile.__table__
+    mismatches = []
+    for email, balance, total in rows:
+        if total is None:
+            continue
+        drift = (balance or 0) - total
+        # La condición sobre el saldo leído evita pisar un movimiento que se haya
+        # confirmado después de la foto: ese perfil se revisa en la próxima corrida.
+        repaired = db.execute(
+            update(profiles).where(
+                profiles.c.user_email == email, func.coalesce(profiles.c.resilient_coins, 0) == (balance or 0)
+            ).values(resilient_coins=total)
+        ).rowcount == 1
+        if repaired:
+            mark_profile_changed(db, email)
+        mismatches.append({"user_email": email, "balance": balance or 0, "ledger": total, "drift": drift, "repaired": repaired})
+        print(f"Reconciliación de monedas: el saldo de {email} es {balance or 0} y su libro suma {total} (diferencia {drift}); {'corregido' if repaired else 'cambió durante la revisión, queda para la próxima'}.")
+    db.commit()
+    return {"opened": len(openings), "repaired": sum(1 for mismatch in mismatches if mismatch["repaired"]), "mismatches": mismatches}
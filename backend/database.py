@@ -1,6 +1,6 @@
 # En: backend/database.py
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Index, inspect, text, literal
 from sqlalchemy.orm import sessionmaker, relationship, declarative_base
 from datetime import datetime
 import json
@@ -22,9 +22,12 @@ class CommunityPost(Base):
     content = Column(Text, nullable=False)
     category = Column(String, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    user_email = Column(String, ForeignKey("users.email"))
+    user_email = Column(String, ForeignKey("users.email"), index=True)
     owner = relationship("User", back_populates="community_posts")
     is_featured = Column(Boolean, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Mismo orden que el feed: destacadas primero y después las más nuevas.
+    __table_args__ = (Index("ix_community_posts_feed", is_featured.desc(), created_at.desc(), id.desc()),)
 
 class CommunityEvent(Base):
     __tablename__ = "community_events"
@@ -33,9 +36,15 @@ class CommunityEvent(Base):
     description = Column(Text)
     event_type = Column(String, index=True)
     location = Column(String)
-    event_date = Column(DateTime, nullable=False)
+    event_date = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
     user_email = Column(String, ForeignKey("users.email"))
     organizer = relationship("User", back_populates="community_events")
+    # Coordenadas del evento (dadas por el cliente o sacadas del nomenclador de geo.py)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geohash = Column(String)
+    __table_args__ = (Index("ix_community_events_geo", "geohash", "event_date"),)
 
 class MarketplaceItem(Base):
     __tablename__ = "marketplace_items"
@@ -44,11 +53,19 @@ class MarketplaceItem(Base):
     description = Column(Text)
     price = Column(Float, nullable=False)
     image_url = Column(String, nullable=True)
+    image_key = Column(String, nullable=True)  # <hash>.<ext>, ver images.py
     is_service = Column(Boolean, default=False)
     status = Column(String, default="available")  # available, reserved, sold
     created_at = Column(DateTime, default=datetime.utcnow)
     user_email = Column(String, ForeignKey("users.email"))
     seller = relationship("User", back_populates="marketplace_items")
+    # Uno por cada orden del listado (ver routers/marketplace.py), con el id como desempate.
+    __table_args__ = (
+        Index("ix_marketplace_items_status_created", "status", "created_at", "id"),
+        Index("ix_marketplace_items_status_price", "status", "price", "id"),
+        Index("ix_marketplace_items_status_service_created", "status", "is_service", "created_at", "id"),
+        Index("ix_marketplace_items_seller_created", "user_email", "created_at", "id"),
+    )
 
 class Transaction(Base):
     __tablename__ = "transactions"
@@ -57,9 +74,11 @@ class Transaction(Base):
     seller_email = Column(String, ForeignKey("users.email"))
     buyer_email = Column(String, ForeignKey("users.email"))
     amount = Column(Float, nullable=False)
-    status = Column(String, default="pending")  # pending, completed, cancelled
+    status = Column(String, default="pending")  # pending, completed, cancelled, expired
     confirmation_code = Column(String, unique=True, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    # Para que el barrido de escrow vencido solo toque las pendientes viejas.
+    __table_args__ = (Index("ix_transactions_status_timestamp", "status", "timestamp"),)
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
@@ -67,7 +86,7 @@ class Subscription(Base):
     user_email = Column(String, ForeignKey("users.email"), unique=True)
     plan_name = Column(String, default="Gratuito")
     start_date = Column(DateTime, default=datetime.utcnow)
-    end_date = Column(DateTime, nullable=True)
+    end_date = Column(DateTime, nullable=True, index=True)
     payment_id = Column(String, nullable=True)
     owner = relationship("User", back_populates="subscription")
 
@@ -152,13 +171,61 @@ class CultivationPlan(Base):
 class GameProfile(Base):
     __tablename__ = "game_profiles"
     user_email = Column(String, ForeignKey("users.email"), primary_key=True, index=True)
-    resi_score = Column(Integer, default=0)
+    resi_score = Column(Integer, default=0, index=True)
     resilient_coins = Column(Integer, default=0)
-    financial_points = Column(Integer, default=0)
-    cultivation_points = Column(Integer, default=0)
-    community_points = Column(Integer, default=0)
+    financial_points = Column(Integer, default=0, index=True)
+    cultivation_points = Column(Integer, default=0, index=True)
+    community_points = Column(Integer, default=0, index=True)
+    # ResiScore ganado en la semana ISO `weekly_score_week` (ej: "2024-W21"); se reinicia al cambiar de semana.
+    weekly_score = Column(Integer, default=0)
+    weekly_score_week = Column(String, nullable=True)
+    __table_args__ = (Index("ix_game_profiles_weekly", "weekly_score_week", "weekly_score"),)
     owner = relationship("User", back_populates="game_profile", uselist=False)
 
+class CoinLedgerEntry(Base):
+    """Registro inmutable de cada movimiento de Monedas Resilientes."""
+    __tablename__ = "coin_ledger"
+    id = Column(Integer, primary_key=True, index=True)
+    user_email = Column(String, ForeignKey("users.email"), nullable=False)
+    delta = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)  # earn, achievement, purchase, escrow_hold, escrow_release, escrow_refund, opening_balance (reconciliation en filas viejas)
+    reference = Column(String, nullable=True)  # ej: "transaction:12"
+    created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("ix_coin_ledger_user_created", "user_email", "created_at"),)
+
+class PaymentEvent(Base):
+    """Evento recibido de una pasarela de pago. (provider, event_id) es único: un reintento no se procesa dos veces."""
+    __tablename__ = "payment_events"
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String, nullable=False)
+    event_id = Column(String, nullable=False)
+    event_type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(String, default="received")  # received, processed, failed
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+    __table_args__ = (
+        Index("ux_payment_events_provider_event", "provider", "event_id", unique=True),
+        Index("ix_payment_events_status_received", "status", "received_at"),
+    )
+
+class LLMUsage(Base):
+    """Consumo agregado de la IA por usuario, función, día y modelo (ver usage.py)."""
+    __tablename__ = "llm_usage"
+    user_email = Column(String, primary_key=True)  # "-" para llamadas sin usuario
+    feature = Column(String, primary_key=True)  # chat, plan_generator, validator, family_plan_generator, expense_parser
+    day = Column(String, primary_key=True)  # "2024-05-21" (UTC)
+    model = Column(String, primary_key=True)
+    requests = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    retries = Column(Integer, default=0, nullable=False)
+    errors = Column(Integer, default=0, nullable=False)
+    latency_ms_total = Column(Float, default=0.0, nullable=False)
+    __table_args__ = (Index("ix_llm_usage_day_feature", "day", "feature"),)
+
 class Achievement(Base):
     __tablename__ = "achievements"
     id = Column(String, primary_key=True, index=True)
@@ -167,6 +234,11 @@ class Achievement(Base):
     icon = Column(String, nullable=True)
     points = Column(Integer, default=0)
     type = Column(String, nullable=False)
+    # Regla declarativa: el logro avanza con cada `event_type` dentro de la ventana
+    # ("total", "month" o "week") hasta llegar a `target` (si es nulo, se usa `points`).
+    event_type = Column(String, nullable=True, index=True)
+    time_window = Column(String, default="total")
+    target = Column(Integer, nullable=True)
 
 class UserAchievement(Base):
     __tablename__ = "user_achievements"
@@ -178,6 +250,13 @@ class UserAchievement(Base):
     owner = relationship("User", back_populates="user_achievements")
     achievement_ref = relationship("Achievement")
 
+class UserEventCounter(Base):
+    __tablename__ = "user_event_counters"
+    user_email = Column(String, ForeignKey("users.email"), primary_key=True)
+    event_type = Column(String, primary_key=True)
+    window_key = Column(String, primary_key=True)  # "total", "2024-05" o "2024-W21"
+    count = Column(Integer, default=0, nullable=False)
+
 class HarvestLog(Base):
     __tablename__ = "harvest_logs"
     id = Column(Integer, primary_key=True, index=True)
@@ -200,4 +279,29 @@ class CultivationTask(Base):
 
 
 def create_db_and_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    ensure_schema()
+
+def ensure_schema():
+    """
+    `create_all` solo crea tablas nuevas: no agrega columnas ni índices a tablas
+    existentes. Como no usamos un sistema de migraciones, completamos acá las
+    columnas (nullable o con default escalar) y los índices que falten.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                default_clause = ""
+                if column.default is not None and column.default.is_scalar:
+                    default_value = literal(column.default.arg).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+                    default_clause = f" DEFAULT {default_value}"
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default_clause}"))
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
\ No newline at end of file
@@ -0,0 +1,100 @@
+# En: backend/entitlements.py
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from database import User, Subscription, CommunityPost
+
+# --- DERECHOS DEL USUARIO (PREMIUM Y CUPOS) ---
+# Ser Premium se deriva de `Subscription.end_date`, no de un flag que nadie
+# apaga: aunque la entrada esté en cache, el vencimiento se evalúa contra la
+# hora actual. El cupo de publicaciones de los usuarios gratuitos se guarda
+# junto y se ajusta en memoria con cada alta o baja, así que publicar no
+# necesita un COUNT. La cache es por instancia; el TTL acota cuánto puede
+# desfasarse un contador por escrituras hechas en otra.
+
+FREE_POST_LIMIT = 5
+CACHE_TTL_SECONDS = 300
+EXPIRY_BATCH_SIZE = 500
+
+
+class Entitlements:
+    __slots__ = ("email", "premium_until", "post_count")
+
+    def __init__(self, email: str, premium_until: Optional[datetime], post_count: int):
+        self.email = email
+        self.premium_until = premium_until
+        self.post_count = post_count
+
+    @property
+    def is_premium(self) -> bool:
+        return self.premium_until is not None and self.premium_until > datetime.utcnow()
+
+    @property
+    def can_create_post(self) -> bool:
+        return self.is_premium or self.post_count < FREE_POST_LIMIT
+
+    @property
+    def can_feature_posts(self) -> bool:
+        return self.is_premium
+
+
+_cache = TTLCache(maxsize=20000, ttl=CACHE_TTL_SECONDS)
+
+
+def _load(db: Session, email: str) -> Entitlements:
+    end_date = select(Subscription.end_date).where(Subscription.user_email == email).scalar_subquery()
+    post_count = select(func.count(CommunityPost.id)).where(CommunityPost.user_email == email).scalar_subquery()
+    premium_until, count = db.query(end_date, post_count).one()
+    return Entitlements(email, premium_until, count or 0)
+
+
+def get(db: Session, email: str) -> Entitlements:
+    return _cache.get_or_set(email, lambda: _load(db, email))
+
+
+def invalidate(email: str):
+    _cache.pop(email)
+
+
+def adjust_post_count(email: str, delta: int):
+    """Ajusta el contador en cache después de commitear un alta (+1) o baja (-1)."""
+    entitlements = _cache.get(email)
+    if entitlements is not None:
+        entitlements.post_count = max(entitlements.post_count + delta, 0)
+
+
+def expire_subscriptions(db: Session, now: datetime = None, batch_size: int = EXPIRY_BATCH_SIZE) -> dict:
+    """
+    Apaga `User.is_premium` (y vuelve el plan a "Gratuito") para las suscripciones
+    vencidas, en lotes por email. Los permisos ya se derivan de la fecha; esto
+    mantiene coherente el flag que leen otras partes.
+    """
+    now = now or datetime.utcnow()
+    expired = 0
+    last_email = ""
+    while True:
+        emails = [email for (email,) in db.query(User.email).outerjoin(
+            Subscription, Subscription.user_email == User.email
+        ).filter(
+            User.is_premium.is_(True),
+            User.email > last_email,
+            (Subscription.end_date.is_(None)) | (Subscription.end_date <= now)
+        ).order_by(User.email).limit(batch_size).all()]
+        if not emails:
+            break
+        db.query(User).filter(User.email.in_(emails)).update({User.is_premium: False}, synchronize_session=False)
+        db.query(Subscription).filter(Subscription.user_email.in_(emails)).update({Subscription.plan_name: "Gratuito"}, synchronize_session=False)
+        db.commit()
+        for email in emails:
+            invalidate(email)
+        expired += len(emails)
+        last_email = emails[-1]
+        if len(emails) < batch_size:
+            break
+    if expired:
+        print(f"Suscripciones Premium vencidas: {expired}")
+    return {"expired": expired}
@@ -0,0 +1,77 @@
+# En: backend/escrow.py
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from database import Transaction, MarketplaceItem
+import coins
+
+# --- VENCIMIENTO DEL ESCROW ---
+# Una compra deja las monedas retenidas y el ítem reservado hasta que el
+# vendedor confirma. Si eso no pasa en ESCROW_TIMEOUT_HOURS, la transacción
+# vence: se devuelven las monedas al comprador (movimiento "escrow_refund" en
+# el libro), el ítem vuelve a estar disponible y la transacción queda "expired".
+
+ESCROW_TIMEOUT_HOURS = int(os.environ.get("ESCROW_TIMEOUT_HOURS", "72"))
+SWEEP_BATCH_SIZE = 200
+
+
+def _expire_one(db: Session, transaction) -> bool:
+    """Vence una transacción. Devuelve False si el vendedor la confirmó mientras tanto."""
+    expired = db.query(Transaction).filter(
+        Transaction.id == transaction.id,
+        Transaction.status == 'pending'
+    ).update({Transaction.status: 'expired'}, synchronize_session=False)
+    if expired != 1:
+        return False
+    coins.apply(db, transaction.buyer_email, coins.coin_price(transaction.amount), "escrow_refund", reference=f"transaction:{transaction.id}")
+    db.query(MarketplaceItem).filter(
+        MarketplaceItem.id == transaction.item_id,
+        MarketplaceItem.status == 'reserved'
+    ).update({MarketplaceItem.status: 'available'}, synchronize_session=False)
+    return True
+
+
+def sweep_expired(db: Session, now: datetime = None, batch_size: int = SWEEP_BATCH_SIZE) -> dict:
+    """
+    Recorre las transacciones pendientes más viejas que el plazo, en lotes por
+    (timestamp, id) sobre el índice (status, timestamp). Cada una se confirma por
+    separado para no retener locks; si una falla se registra y se sigue.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=ESCROW_TIMEOUT_HOURS)
+    summary = {"expired": 0, "skipped": 0, "failed": 0}
+    last = None
+    while True:
+        # Solo columnas: después de cada commit la sesión expira los objetos
+        # cargados y releerlos costaría una consulta por fila.
+        query = db.query(
+            Transaction.id, Transaction.timestamp, Transaction.buyer_email, Transaction.amount, Transaction.item_id
+        ).filter(Transaction.status == 'pending', Transaction.timestamp < cutoff)
+        if last is not None:
+            query = query.filter(or_(
+                Transaction.timestamp > last[0],
+                and_(Transaction.timestamp == last[0], Transaction.id > last[1])
+            ))
+        batch = query.order_by(Transaction.timestamp, Transaction.id).limit(batch_size).all()
+        if not batch:
+            break
+        for transaction in batch:
+            try:
+                if _expire_one(db, transaction):
+                    db.commit()
+                    summary["expired"] += 1
+                else:
+                    db.rollback()
+                    summary["skipped"] += 1
+            except coins.InsufficientFunds as e:
+                db.rollback()
+                summary["failed"] += 1
+                print(f"No se pudo devolver el escrow de la transacción {transaction.id}: {e}")
+        last = (batch[-1].timestamp, batch[-1].id)
+        if len(batch) < batch_size:
+            break
+    if summary["expired"] or summary["failed"]:
+        print(f"Escrow vencido: {summary}")
+    return summary
@@ -0,0 +1,132 @@
+# En: backend/fallbacks.py
+import re
+import unicodedata
+from typing import Iterable, Optional, Tuple
+
+from schemas import ValidateParamsRequest, ValidateParamsResult
+
+# --- RESPUESTAS SIN IA ---
+# Respaldos locales para cuando Gemini no está disponible (cortacircuitos
+# abierto o error). Son más pobres que la IA, pero responden al instante y
+# el usuario no se queda esperando un timeout.
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+# --- REGISTRO DE GASTOS ---
+
+# Acepta "5000", "5.000", "$1.500,50", "1,5 mil", "5k", "2 lucas".
+_AMOUNT = re.compile(r"(\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)\s*(mil|k|lucas?)?\b")
+
+CATEGORY_KEYWORDS = {
+    "Supermercado": ("super", "verduler", "carniceri", "almacen", "chino", "panaderi", "mercado", "compras"),
+    "Kioscos": ("kiosco", "golosina", "cigarrillo", "alfajor", "gaseosa"),
+    "Transporte": ("colectivo", "bondi", "subte", "tren", "sube", "nafta", "combustible", "uber", "taxi", "remis", "peaje", "estacionamiento"),
+    "Servicios Básicos": ("luz", "gas", "agua", "internet", "celular", "telefono", "cable", "factura"),
+    "Vivienda": ("alquiler", "expensas", "hipoteca", "abl"),
+    "Salud": ("farmacia", "remedio", "medic", "prepaga", "obra social", "dentista", "consulta"),
+    "Entretenimiento": ("cine", "netflix", "spotify", "salida", "bar", "recital", "teatro", "boliche"),
+    "Vestimenta": ("ropa", "zapatilla", "remera", "pantalon", "campera", "calzado"),
+    "Mascotas": ("veterinari", "perro", "gato", "alimento balanceado"),
+    "Cuidado Personal": ("peluqueri", "perfume", "shampoo", "maquillaje", "gimnasio"),
+    "Hijos": ("colegio", "escuela", "jardin", "panales", "utiles", "juguete"),
+    "Deudas": ("tarjeta", "resumen"),
+    "Préstamos": ("prestamo", "credito"),
+    "Ahorro": ("ahorro", "ahorre"),
+    "Inversión": ("plazo fijo", "inversion", "acciones", "cedear", "dolares"),
+}
+
+
+def parse_amount(text: str) -> Optional[float]:
+    match = _AMOUNT.search(text.lower())
+    if not match:
+        return None
+    number, multiplier = match.groups()
+    if re.fullmatch(r"\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?", number):
+        number = number.replace(".", "").replace(",", ".")
+    else:
+        number = number.replace(",", ".")
+    amount = float(number)
+    return amount * 1000 if multiplier else amount
+
+
+def parse_expense(text: str, user_categories: Iterable[str] = ()) -> Optional[dict]:
+    """Monto y categoría por reglas. Devuelve None si la frase no tiene un monto."""
+    amount = parse_amount(text)
+    if amount is None or amount <= 0:
+        return None
+    normalized = _normalize(text)
+    category = next((name for name in user_categories if _normalize(name) in normalized), None)
+    if category is None:
+        category = next(
+            (name for name, keywords in CATEGORY_KEYWORDS.items()
+             if any(re.search(rf"\b{re.escape(keyword)}", normalized) for keyword in keywords)),
+            "Otros"
+        )
+    return {"amount": amount, "category": category, "description": text}
+
+
+# --- CULTIVO ---
+
+CULTIVATION_TIPS = (
+    (("plaga", "bicho"),
+     "Para plagas como el pulgón, una solución de agua con jabón potásico es muy efectiva y orgánica. Aplicálo cada 3 días al atardecer.",
+     "Fotografía macro de pulgones en una hoja de tomate."),
+    (("nutrientes", "abono"),
+     "La clave está en el balance. Para crecimiento, más Nitrógeno (N). Para fruto, más Fósforo (P) y Potasio (K). Un compost bien maduro es ideal para orgánico.",
+     "Gráfico simple mostrando los macronutrientes NPK."),
+    (("luz", "sol"),
+     "Hortalizas de fruto como tomates necesitan 6-8 horas de sol directo. Si no las tenés, considerá cultivos de hoja como lechuga o espinaca.",
+     "Ilustración de un balcón con mucho sol vs uno con poco sol."),
+)
+
+
+def cultivation_advice(question: str) -> Optional[Tuple[str, str]]:
+    """(consejo, prompt de imagen) si la pregunta toca un tema conocido."""
+    question = question.lower()
+    for keywords, advice, image_prompt in CULTIVATION_TIPS:
+        if any(keyword in question for keyword in keywords):
+            return advice, image_prompt
+    return None
+
+
+OPTIMAL_RANGES = {
+    "hydroponics": {"ph": (5.5, 6.5, "pH"), "ec": (0.0, None, "EC"), "temp": (18.0, 24.0, "temperatura")},
+    "organic": {"ph": (6.0, 7.0, "pH"), "soilMoisture": (30.0, 60.0, "humedad del suelo")},
+}
+
+
+def validate_parameters(request: ValidateParamsRequest) -> ValidateParamsResult:
+    """Compara los parámetros con los rangos óptimos del validador (ver prompts.py)."""
+    problems = []
+    for field, (low, high, label) in OPTIMAL_RANGES.get(request.method, {}).items():
+        value = getattr(request, field)
+        if value is None:
+            continue
+        too_low = value <= low if high is None else value < low
+        if too_low:
+            ideal = f"más de {low}" if high is None else f"entre {low} y {high}"
+            problems.append(f"{label} está bajo ({value}; lo ideal es {ideal})")
+        elif high is not None and value > high:
+            problems.append(f"{label} está alto ({value}; lo ideal es entre {low} y {high})")
+    if problems:
+        return ValidateParamsResult(isValid=False, advice="Revisá estos valores: " + "; ".join(problems) + ". Corregilos de a poco y volvé a medir en unas horas.")
+    return ValidateParamsResult(isValid=True, advice="¡Todo en rango! Tus plantas están en buenas condiciones, seguí así.")
+
+
+# --- CHAT ---
+
+CHAT_UNAVAILABLE = (
+    "Ahora mismo no me puedo conectar con mi cerebro de IA. Mientras tanto podés registrar gastos, "
+    "revisar tu Planificador y tus Metas de Ahorro. Probá de nuevo en unos minutos."
+)
+
+
+def chat_reply(question: str) -> str:
+    advice = cultivation_advice(question)
+    if advice is not None:
+        return f"{advice[0]} (Es un consejo rápido: ahora mismo no me puedo conectar con mi cerebro de IA.)"
+    return CHAT_UNAVAILABLE
@@ -0,0 +1,108 @@
+# En: backend/feed.py
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from database import CommunityPost
+from schemas import CommunityPostResponse
+
+# --- FEED DE LA COMUNIDAD ---
+# El listado público de publicaciones es lo que más se pide y cambia poco.
+# Las primeras CACHED_POSTS publicaciones se sirven desde memoria, ya
+# serializadas; cualquier alta, destacado o baja invalida la cache en esta
+# instancia y el TTL cubre los cambios hechos en otras. Cada página lleva un
+# ETag (hash del contenido, igual en todas las instancias) y un Last-Modified
+# para que el cliente pueda revalidar y recibir un 304 sin cuerpo.
+# Last-Modified no sale de las publicaciones de la página (si se borra la más
+# nueva iría para atrás) sino de un "último cambio" del feed que invalidate()
+# adelanta. Es por instancia, así que un cambio hecho en otra recién se nota al
+# vencer el TTL; el ETag, que tiene prioridad, sí cambia en todas.
+
+CACHED_POSTS = 100
+CACHE_TTL_SECONDS = 30
+CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+# Coincide con el índice ix_community_posts_feed.
+FEED_ORDER = (CommunityPost.is_featured.desc(), CommunityPost.created_at.desc(), CommunityPost.id.desc())
+
+
+class FeedPage:
+    __slots__ = ("body", "etag", "last_modified")
+
+    def __init__(self, body: bytes, etag: str, last_modified: Optional[datetime]):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+_pages = TTLCache(maxsize=256, ttl=CACHE_TTL_SECONDS)
+_generation = 0
+_last_changed = datetime.utcnow()
+_lock = threading.Lock()
+
+
+def invalidate():
+    """Descarta las páginas en memoria. Llamar después del commit que cambió publicaciones."""
+    global _generation, _last_changed
+    with _lock:
+        _generation += 1
+        _last_changed = max(_last_changed, datetime.utcnow())
+    _pages.clear()
+
+
+def _build_page(db: Session, skip: int, limit: int) -> FeedPage:
+    last_changed = _last_changed
+    posts = db.query(CommunityPost).order_by(*FEED_ORDER).offset(skip).limit(limit).all()
+    items = [CommunityPostResponse.model_validate(post).model_dump(mode="json") for post in posts]
+    body = json.dumps(items, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    timestamps = [post.updated_at or post.created_at for post in posts if post.updated_at or post.created_at]
+    return FeedPage(
+        body=body,
+        etag='"' + hashlib.sha1(body).hexdigest() + '"',
+        last_modified=max([last_changed, *timestamps]),
+    )
+
+
+def get_page(db: Session, skip: int, limit: int) -> FeedPage:
+    if skip + limit > CACHED_POSTS:
+        return _build_page(db, skip, limit)
+    key = (skip, limit)
+    page = _pages.get(key)
+    if page is None:
+        generation = _generation
+        page = _build_page(db, skip, limit)
+        with _lock:
+            # Si hubo una invalidación mientras consultábamos, la página puede
+            # estar vieja: se devuelve pero no se guarda.
+            if generation == _generation:
+                _pages.set(key, page)
+    return page
+
+
+def cache_headers(page: FeedPage) -> Dict[str, str]:
+    headers = {"ETag": page.etag, "Cache-Control": CACHE_CONTROL}
+    if page.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(page.last_modified.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+    return headers
+
+
+def is_not_modified(page: FeedPage, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """Evalúa un GET condicional; If-None-Match tiene prioridad sobre If-Modified-Since."""
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == page.etag for tag in tags)
+    if if_modified_since and page.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return page.last_modified.replace(microsecond=0) <= since
+    return False
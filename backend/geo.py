@@ -0,0 +1,181 @@
+# En: backend/geo.py
+import math
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+# --- GEOLOCALIZACIÓN LOCAL ---
+# Los eventos se cargan con un `location` de texto libre. Para poder buscarlos
+# por cercanía los ubicamos con un nomenclador propio de localidades
+# argentinas (sin servicios externos) y guardamos un geohash: celdas vecinas
+# comparten prefijo, así que "eventos cerca de X" se resuelve con unos pocos
+# rangos sobre un índice común en lugar de recorrer toda la tabla.
+
+EARTH_RADIUS_KM = 6371.0
+GEOHASH_PRECISION = 7  # celdas de ~150 m
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {char: index for index, char in enumerate(_BASE32)}
+
+# (nombre, latitud, longitud). Capitales provinciales, principales ciudades y
+# los departamentos del Gran Mendoza. Los alias apuntan a la misma coordenada.
+LOCALITIES: List[Tuple[str, float, float]] = [
+    ("buenos aires", -34.6037, -58.3816),
+    ("caba", -34.6037, -58.3816),
+    ("capital federal", -34.6037, -58.3816),
+    ("la plata", -34.9214, -57.9544),
+    ("mar del plata", -38.0055, -57.5426),
+    ("bahia blanca", -38.7196, -62.2724),
+    ("tandil", -37.3217, -59.1332),
+    ("cordoba", -31.4201, -64.1888),
+    ("rio cuarto", -33.1232, -64.3493),
+    ("villa carlos paz", -31.4241, -64.4978),
+    ("rosario", -32.9442, -60.6505),
+    ("santa fe", -31.6333, -60.7000),
+    ("parana", -31.7319, -60.5238),
+    ("concordia", -31.3929, -58.0209),
+    ("mendoza", -32.8895, -68.8458),
+    ("godoy cruz", -32.9253, -68.8450),
+    ("guaymallen", -32.9000, -68.7833),
+    ("las heras", -32.8500, -68.8167),
+    ("maipu", -32.9833, -68.7833),
+    ("lujan de cuyo", -33.0333, -68.8833),
+    ("tunuyan", -33.5667, -69.0167),
+    ("san rafael", -34.6177, -68.3301),
+    ("san juan", -31.5375, -68.5364),
+    ("san luis", -33.3017, -66.3378),
+    ("villa mercedes", -33.6757, -65.4578),
+    ("la rioja", -29.4131, -66.8558),
+    ("catamarca", -28.4696, -65.7795),
+    ("san miguel de tucuman", -26.8083, -65.2176),
+    ("tucuman", -26.8083, -65.2176),
+    ("santiago del estero", -27.7951, -64.2615),
+    ("salta", -24.7821, -65.4232),
+    ("san salvador de jujuy", -24.1858, -65.2995),
+    ("jujuy", -24.1858, -65.2995),
+    ("resistencia", -27.4514, -58.9867),
+    ("corrientes", -27.4806, -58.8341),
+    ("formosa", -26.1775, -58.1781),
+    ("posadas", -27.3671, -55.8961),
+    ("puerto iguazu", -25.5991, -54.5736),
+    ("santa rosa", -36.6167, -64.2833),
+    ("neuquen", -38.9516, -68.0591),
+    ("general roca", -39.0333, -67.5833),
+    ("viedma", -40.8135, -62.9967),
+    ("bariloche", -41.1335, -71.3103),
+    ("san carlos de bariloche", -41.1335, -71.3103),
+    ("rawson", -43.3002, -65.1023),
+    ("trelew", -43.2490, -65.3051),
+    ("puerto madryn", -42.7692, -65.0385),
+    ("comodoro rivadavia", -45.8641, -67.4966),
+    ("rio gallegos", -51.6230, -69.2168),
+    ("el calafate", -50.3379, -72.2648),
+    ("ushuaia", -54.8019, -68.3030),
+    ("rio grande", -53.7877, -67.7095),
+]
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+# Los nombres más largos primero: "san carlos de bariloche" gana sobre "bariloche"
+# y "santa fe" no se confunde con un "santa rosa" más corto.
+_GAZETTEER = sorted(((_normalize(name), lat, lon) for name, lat, lon in LOCALITIES), key=lambda entry: -len(entry[0]))
+
+
+def geocode(location: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Devuelve (lat, lon) de la localidad nombrada en el texto, o None si no se reconoce."""
+    if not location:
+        return None
+    padded = f" {_normalize(location)} "
+    for name, lat, lon in _GAZETTEER:
+        if f" {name} " in padded:
+            return lat, lon
+    return None
+
+
+def encode_geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def _cell_size_degrees(precision: int) -> Tuple[float, float]:
+    """(alto, ancho) en grados de una celda de la precisión dada."""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def _precision_for_radius(lat: float, radius_km: float) -> int:
+    """La precisión más fina cuyas celdas miden al menos `radius_km` por lado."""
+    km_per_degree_lon = 111.32 * max(math.cos(math.radians(lat)), 0.01)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size_degrees(precision)
+        if min(height * 111.32, width * km_per_degree_lon) >= radius_km:
+            return precision
+    return 1
+
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> List[str]:
+    """
+    Celdas (prefijos de geohash) que cubren el círculo: la celda del centro y
+    sus 8 vecinas, elegidas de un tamaño mayor o igual al radio.
+    """
+    precision = _precision_for_radius(lat, radius_km)
+    height, width = _cell_size_degrees(precision)
+    cells = set()
+    for d_lat in (-height, 0.0, height):
+        for d_lon in (-width, 0.0, width):
+            cell_lat = max(min(lat + d_lat, 89.999999), -89.999999)
+            cell_lon = (lon + d_lon + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(cell_lat, cell_lon, precision))
+    return sorted(cells)
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Menor cadena mayor que todas las que empiezan con `prefix`, usando el
+    alfabeto del geohash (así el rango funciona con cualquier collation).
+    None si no hay cota (el prefijo es todo "z").
+    """
+    for position in range(len(prefix) - 1, -1, -1):
+        index = _BASE32_INDEX[prefix[position]]
+        if index + 1 < len(_BASE32):
+            return prefix[:position] + _BASE32[index + 1]
+    return None
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def locate(location: Optional[str], latitude: Optional[float] = None, longitude: Optional[float] = None) -> Dict[str, Optional[object]]:
+    """Columnas de ubicación para un evento: usa las coordenadas dadas o, si faltan, el nomenclador."""
+    if latitude is None or longitude is None:
+        coordinates = geocode(location)
+        if coordinates is None:
+            return {"latitude": None, "longitude": None, "geohash": None}
+        latitude, longitude = coordinates
+    return {"latitude": latitude, "longitude": longitude, "geohash": encode_geohash(latitude, longitude)}
@@ -0,0 +1,34 @@
+# En: backend/image_keys.py
+import re
+from typing import Dict, Optional
+
+import storage
+
+# --- CLAVES Y URLS DE IMÁGENES ---
+# Cómo se nombran las imágenes y sus variantes y qué URL tiene cada una. Vive
+# aparte de images.py para que los schemas puedan armar las URLs sin cargar
+# el procesamiento de imágenes (Pillow, pool de procesos).
+
+# Nombre de la variante -> lado máximo en píxeles.
+VARIANTS = {"thumb": 320, "medium": 960}
+
+# Claves válidas: `<hash>.<ext>` para originales y `<hash>_<variante>.webp`.
+KEY_PATTERN = re.compile(r"^(?P<hash>[0-9a-f]{32})(?:_(?P<variant>[a-z]+))?\.(?P<ext>jpg|png|webp)$")
+
+
+def variant_name(key: str, variant: str) -> str:
+    return f"{key.rsplit('.', 1)[0]}_{variant}.webp"
+
+
+def url_for(name: str) -> str:
+    return storage.get_storage().url(name)
+
+
+def urls_for(key: Optional[str]) -> Optional[Dict[str, str]]:
+    """URLs de la imagen original y de cada variante."""
+    if not key:
+        return None
+    urls = {"original": url_for(key)}
+    for variant in VARIANTS:
+        urls[variant] = url_for(variant_name(key, variant))
+    return urls
@@ -0,0 +1,162 @@
+# En: backend/images.py
+import os
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import BinaryIO, Optional
+
+import storage
+from image_keys import VARIANTS, KEY_PATTERN, variant_name, url_for, urls_for
+
+# --- IMÁGENES DEL MARKETPLACE ---
+# La subida se copia por bloques a un archivo temporal (con tope de tamaño),
+# se valida por su firma y no por el nombre ni el content-type que manda el
+# cliente, y se guarda (ver storage.py) con una clave derivada del hash del
+# contenido. Las miniaturas WebP se generan después, en un pool de procesos,
+# sin demorar la respuesta.
+
+UPLOAD_TMP_DIR = os.environ.get("UPLOAD_TMP_DIR", tempfile.gettempdir())
+MAX_UPLOAD_BYTES = int(os.environ.get("IMAGE_MAX_UPLOAD_BYTES", 8 * 1024 * 1024))
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+CHUNK_BYTES = 64 * 1024
+
+WEBP_QUALITY = 80
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+class UnsupportedImage(ValueError):
+    pass
+
+
+def _sniff_extension(head: bytes) -> Optional[str]:
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def receive_upload(source: BinaryIO) -> str:
+    """
+    Guarda la imagen subida y encola la generación de variantes.
+    Devuelve la clave de la imagen: `<hash>.<ext>`. Si el mismo contenido ya
+    estaba guardado, se reutiliza.
+    """
+    os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+    temp = tempfile.NamedTemporaryFile(dir=UPLOAD_TMP_DIR, prefix="upload-", delete=False)
+    try:
+        with temp:
+            while True:
+                chunk = source.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise ImageTooLarge(f"La imagen supera el máximo de {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                digest.update(chunk)
+                temp.write(chunk)
+        extension = _sniff_extension(head)
+        if extension is None:
+            raise UnsupportedImage("Formato no soportado. Subí una imagen JPG, PNG o WebP.")
+        key = f"{digest.hexdigest()[:32]}.{extension}"
+        store = storage.get_storage()
+        if store.exists(key):
+            os.unlink(temp.name)
+            return key
+        store.put_file(key, temp.name, storage.CONTENT_TYPES[extension])
+    except BaseException:
+        if os.path.exists(temp.name):
+            os.unlink(temp.name)
+        raise
+    # El temporal queda para el pool, que lo borra al terminar.
+    _schedule_variants(temp.name, key)
+    return key
+
+
+def original_for_variant(key: str) -> Optional[str]:
+    """Clave del original de una variante, si el original existe."""
+    match = KEY_PATTERN.match(key)
+    if not match or not match.group("variant"):
+        return None
+    store = storage.get_storage()
+    for extension in storage.CONTENT_TYPES:
+        original = f"{match.group('hash')}.{extension}"
+        if store.exists(original):
+            return original
+    return None
+
+
+# --- VARIANTES (corren en el pool de procesos) ---
+
+def _make_variants(source_path: str, key: str) -> int:
+    from PIL import Image, ImageOps
+
+    store = storage.get_storage()
+    created = 0
+    try:
+        with Image.open(source_path) as original:
+            image = ImageOps.exif_transpose(original)
+            if image.mode not in ("RGB", "RGBA"):
+                # En las paletas (P, L) la transparencia va en `info`, no en una banda A.
+                has_alpha = "A" in image.getbands() or "transparency" in image.info
+                image = image.convert("RGBA" if has_alpha else "RGB")
+            for variant, max_side in VARIANTS.items():
+                name = variant_name(key, variant)
+                if store.exists(name):
+                    continue
+                resized = image.copy()
+                resized.thumbnail((max_side, max_side), Image.LANCZOS)
+                rendered = f"{source_path}_{variant}.webp"
+                try:
+                    resized.save(rendered, "WEBP", quality=WEBP_QUALITY, method=4)
+                    store.put_file(name, rendered, storage.CONTENT_TYPES["webp"])
+                finally:
+                    if os.path.exists(rendered):
+                        os.unlink(rendered)
+                created += 1
+    finally:
+        os.unlink(source_path)
+    return created
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+def _report_failure(future, key: str):
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        print(f"Error generando las variantes de la imagen '{key}': {error}")
+
+
+def _schedule_variants(path: str, key: str):
+    future = _get_pool().submit(_make_variants, path, key)
+    future.add_done_callback(lambda done: _report_failure(done, key))
+
+
+def shutdown():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
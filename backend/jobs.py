@@ -0,0 +1,92 @@
+# En: backend/jobs.py
+# Tareas periódicas de mantenimiento. Cada una abre su propia sesión.
+from database import SessionLocal, CommunityEvent
+from scheduler import register_job
+import achievements
+import coins
+import geo
+import escrow
+import entitlements
+import payments
+import usage
+
+
+@register_job("reconcile_coins", interval_seconds=6 * 60 * 60)
+def reconcile_coins():
+    db = SessionLocal()
+    try:
+        return coins.reconcile_balances(db)
+    finally:
+        db.close()
+
+
+@register_job("close_month", interval_seconds=6 * 60 * 60)
+def close_month():
+    """Registra el mes anterior de cada usuario bajo presupuesto; las corridas siguientes no repiten ninguno."""
+    db = SessionLocal()
+    try:
+        return achievements.close_month(db)
+    finally:
+        db.close()
+
+
+@register_job("expire_escrows", interval_seconds=60 * 60)
+def expire_escrows():
+    db = SessionLocal()
+    try:
+        return escrow.sweep_expired(db)
+    finally:
+        db.close()
+
+
+@register_job("expire_premium", interval_seconds=24 * 60 * 60)
+def expire_premium():
+    db = SessionLocal()
+    try:
+        return entitlements.expire_subscriptions(db)
+    finally:
+        db.close()
+
+
+@register_job("process_payment_events", interval_seconds=60)
+def process_payment_events():
+    db = SessionLocal()
+    try:
+        return payments.retry_pending(db)
+    finally:
+        db.close()
+
+
+@register_job("flush_llm_usage", interval_seconds=60)
+def flush_llm_usage():
+    db = SessionLocal()
+    try:
+        return usage.flush(db)
+    finally:
+        db.close()
+
+
+@register_job("geocode_events", interval_seconds=60 * 60)
+def geocode_events(batch_size: int = 500):
+    """Ubica los eventos que todavía no tienen geohash (los creados antes del nomenclador)."""
+    db = SessionLocal()
+    located = 0
+    try:
+        last_id = 0
+        while True:
+            events = db.query(CommunityEvent).filter(
+                CommunityEvent.geohash.is_(None),
+                CommunityEvent.id > last_id
+            ).order_by(CommunityEvent.id).limit(batch_size).all()
+            if not events:
+                break
+            for event in events:
+                location = geo.locate(event.location, event.latitude, event.longitude)
+                if location["geohash"] is not None:
+                    event.latitude, event.longitude, event.geohash = location["latitude"], location["longitude"], location["geohash"]
+                    located += 1
+            db.commit()
+            last_id = events[-1].id
+        return {"located": located}
+    finally:
+        db.close()
@@ -0,0 +1,192 @@
+# En: backend/leaderboard.py
+import time
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from database import engine, GameProfile
+import achievements
+
+# --- RANKINGS EN MEMORIA ---
+# Cada ranking es una lista ordenada de (-puntaje, email): el top N es un slice
+# y la posición de un usuario sale de una búsqueda binaria. Se arma una vez
+# desde la base y después se actualiza solo para los perfiles que cambian
+# (aviso post-commit del motor de logros). Cada REBUILD_SECONDS se rearma
+# completo para absorber cambios hechos por otras instancias; lo rearma un solo
+# pedido y los demás siguen leyendo los rankings anteriores mientras tanto.
+
+BOARDS = {
+    "global": GameProfile.resi_score,
+    "finance": GameProfile.financial_points,
+    "cultivation": GameProfile.cultivation_points,
+    "community": GameProfile.community_points,
+    "weekly": GameProfile.weekly_score,
+}
+REBUILD_SECONDS = 300
+
+
+class Leaderboard:
+    def __init__(self):
+        self._entries: List[Tuple[int, str]] = []
+        self._scores: Dict[str, int] = {}
+
+    def load(self, scores: Dict[str, int]):
+        self._scores = {email: score for email, score in scores.items() if score}
+        self._entries = sorted((-score, email) for email, score in self._scores.items())
+
+    def update(self, email: str, score: int):
+        previous = self._scores.pop(email, None)
+        if previous is not None:
+            index = bisect_left(self._entries, (-previous, email))
+            if index < len(self._entries) and self._entries[index] == (-previous, email):
+                del self._entries[index]
+        if score:
+            self._scores[email] = score
+            insort(self._entries, (-score, email))
+
+    def top(self, limit: int) -> List[Tuple[int, str, int]]:
+        """Devuelve (posición, email, puntaje); los empates comparten posición."""
+        result = []
+        for index, (negative_score, email) in enumerate(self._entries[:limit]):
+            if result and result[-1][2] == -negative_score:
+                rank = result[-1][0]
+            else:
+                rank = index + 1
+            result.append((rank, email, -negative_score))
+        return result
+
+    def rank(self, email: str) -> Optional[Tuple[int, int]]:
+        score = self._scores.get(email)
+        if score is None:
+            return None
+        # Posición = cantidad de usuarios con puntaje estrictamente mayor + 1.
+        return bisect_left(self._entries, (-score, "")) + 1, score
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_boards: Dict[str, Leaderboard] = {}
+_built_at = 0.0
+_built_week: Optional[str] = None
+_lock = threading.Lock()
+# Un solo rearmado a la vez. Mientras corre, los demás pedidos siguen leyendo
+# los rankings anteriores y los perfiles que cambian se anotan en
+# _changed_while_rebuilding para aplicarlos sobre los rankings nuevos.
+_rebuild_lock = threading.Lock()
+_rebuilding = False
+_changed_while_rebuilding: set = set()
+
+
+def _current_week() -> str:
+    return achievements.WINDOW_KEYS["week"](datetime.utcnow())
+
+
+def _read_scores(emails=None) -> List[tuple]:
+    columns = [GameProfile.user_email, GameProfile.weekly_score_week] + list(BOARDS.values())
+    statement = select(*columns)
+    if emails is not None:
+        statement = statement.where(GameProfile.user_email.in_(emails))
+    with engine.connect() as connection:
+        return connection.execute(statement).all()
+
+
+def _scores_by_board(row, week: str) -> Dict[str, int]:
+    values = dict(zip(BOARDS, row[2:]))
+    if row[1] != week:
+        values["weekly"] = 0
+    return {board: value or 0 for board, value in values.items()}
+
+
+def _apply_rows(rows, week: str):
+    """Reubica perfiles ya leídos en cada ranking. Llamar con _lock tomado."""
+    for row in rows:
+        for board, score in _scores_by_board(row, week).items():
+            _boards[board].update(row[0], score)
+
+
+def _is_stale() -> bool:
+    return not _boards or time.monotonic() - _built_at > REBUILD_SECONDS or _built_week != _current_week()
+
+
+def _rebuild():
+    """Rearma todos los rankings. Llamar con _rebuild_lock tomado."""
+    global _boards, _built_at, _built_week, _rebuilding
+    with _lock:
+        _rebuilding = True
+        _changed_while_rebuilding.clear()
+    try:
+        week = _current_week()
+        per_board = {board: {} for board in BOARDS}
+        for row in _read_scores():
+            for board, score in _scores_by_board(row, week).items():
+                per_board[board][row[0]] = score
+        boards = {}
+        for board, scores in per_board.items():
+            boards[board] = Leaderboard()
+            boards[board].load(scores)
+        with _lock:
+            _boards, _built_at, _built_week = boards, time.monotonic(), week
+            changed = list(_changed_while_rebuilding)
+        # Lo que cambió entre la lectura completa y el cambio de rankings se vuelve a leer.
+        if changed:
+            rows = _read_scores(changed)
+            with _lock:
+                _apply_rows(rows, week)
+    finally:
+        with _lock:
+            _rebuilding = False
+            _changed_while_rebuilding.clear()
+
+
+def rebuild():
+    with _rebuild_lock:
+        _rebuild()
+
+
+def _ensure_fresh():
+    if not _is_stale():
+        return
+    # Sin rankings no hay nada que servir y se espera al primer armado. Con
+    # rankings, solo un pedido rearma y el resto sirve los anteriores.
+    if not _rebuild_lock.acquire(blocking=not _boards):
+        return
+    try:
+        if _is_stale():
+            _rebuild()
+    finally:
+        _rebuild_lock.release()
+
+
+def top(board: str, limit: int) -> List[Tuple[int, str, int]]:
+    _ensure_fresh()
+    with _lock:
+        return _boards[board].top(limit)
+
+
+def rank(board: str, email: str) -> Optional[Tuple[int, int]]:
+    _ensure_fresh()
+    with _lock:
+        return _boards[board].rank(email)
+
+
+def size(board: str) -> int:
+    _ensure_fresh()
+    with _lock:
+        return len(_boards[board])
+
+
+@achievements.on_profile_change
+def refresh_profiles(emails):
+    """Vuelve a leer solo los perfiles que cambiaron y los reubica en cada ranking."""
+    with _lock:
+        if _rebuilding:
+            _changed_while_rebuilding.update(emails)
+        if not _boards:
+            return
+    rows = _read_scores(list(emails))
+    with _lock:
+        _apply_rows(rows, _built_week)
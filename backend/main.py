@@ -3,49 +3,103 @@ import os
 import io
 import textwrap
 import json
+import math
+import hmac
 import asyncio
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, status, Request
+from fastapi import FastAPI, UploadFile, File, Depends, Header, HTTPException, status, Request, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from google.cloud import speech
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from database import create_db_and_tables, User, Expense, ChatMessage, BudgetItem, FamilyPlan, GameProfile, Achievement, UserAchievement, CultivationPlan
+from database import engine, create_db_and_tables, SessionLocal, User, Expense, ChatMessage, BudgetItem, FamilyPlan, GameProfile, Achievement, UserAchievement, CultivationPlan
 from schemas import TextInput, AIChatInput, OnboardingData, ChatMessageResponse, CultivationPlanResponse, CultivationPlanResult, HarvestLogInput, HarvestLogResponse, CultivationTaskInput, CultivationTaskResponse, FamilyPlanRequest, FamilyPlanResponse
-from dependencies import get_db, get_user_or_create, parse_expense_with_gemini, award_achievement, generate_plan_with_gemini, validate_parameters_with_gemini, generate_family_plan_with_gemini
-from dependencies import model_chat
+from dependencies import get_db, get_user_or_create, email_from_authorization, parse_expense_with_gemini, award_achievement, record_event, generate_plan_with_gemini, validate_parameters_with_gemini, generate_family_plan_with_gemini
 from routers import finance, cultivation, family, market_data, gamification, community, marketplace, subscription # IMPORTAMOS NUEVOS ROUTERS
+from routers import media, payments as payments_router, admin
 from fastapi.staticfiles import StaticFiles # <-- Añade esta línea
-import routers.services as services
+from transcription import StreamLimitExceeded, UnsupportedEncoding, MAX_STREAM_BYTES
+import clients
+import achievements
+import scheduler
+import search
+import images
+import payments
+import auth
+from ratelimit import RateLimitMiddleware
+import ratelimit
+import metrics
+from metrics import MetricsMiddleware
+import tracing
+import usage
+import fallbacks
+import circuit
+import jobs  # registra las tareas periódicas
 
 app = FastAPI(title="Resi API", version="6.0.0") # Versión actualizada
 
-# --- Variables Globales para los Clientes ---
-speech_client = None
-
 @app.on_event("startup")
 def startup_event():
     """
     Esta función se ejecuta una sola vez cuando la aplicación arranca.
     """
-    global speech_client
-    
-    # 1. Crear tablas de la base de datos
+    # 1. Crear tablas de la base de datos e índices de búsqueda
     create_db_and_tables()
-    
-    # 2. Inicializar cliente de Google Speech
-    speech_client = speech.SpeechClient()
+    search.ensure_search_indexes()
+
+    # 2. Cargar el catálogo base de logros y sus reglas
+    db = SessionLocal()
+    try:
+        achievements.seed_catalog(db)
+    finally:
+        db.close()
+
+    # Los clientes de IA y de voz se crean en el primer uso (ver clients.py y /warmup).
 
     os.makedirs("static/images", exist_ok=True)
 
+    if not auth.is_configured():
+        if auth.INSECURE_DEV:
+            print("AVISO: AUTH_INSECURE_DEV=1, el bearer se toma como email sin verificar (solo para desarrollo local).")
+        else:
+            print("ERROR: sin AUTH_JWT_SECRET/NEXTAUTH_SECRET ni AUTH_JWKS_URL se rechazan todos los pedidos autenticados.")
+    if not metrics.METRICS_TOKEN and not metrics.METRICS_INSECURE_DEV:
+        print("AVISO: sin METRICS_TOKEN, /metrics responde 401 a todos los pedidos.")
+
+@app.on_event("startup")
+async def start_scheduler():
+    scheduler.start()
+    payments.start_worker()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    scheduler.stop()
+    payments.stop_worker()
+    db = SessionLocal()
+    try:
+        usage.flush(db)
+    finally:
+        db.close()
+    clients.shutdown()
+    tracing.shutdown()
+    images.shutdown()
+
 # Montar directorio estático después de la inicialización de la app
+# (las imágenes nuevas se sirven desde /media; esto queda para las URLs viejas)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 origins = [
     "http://localhost:3000",
     "https://resi-argentina.vercel.app",
 ]
-app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+# El rate limit va antes que CORS para que los 429 también lleven los headers CORS.
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"], expose_headers=["X-Next-Cursor", "Retry-After", "X-RateLimit-Limit", "X-RateLimit-Remaining"])
+# Métricas por fuera de todo, así también miden los 429 y las respuestas CORS.
+app.add_middleware(MetricsMiddleware)
+metrics.install_db_hooks(engine)
+tracing.setup(app, engine)
 
 app.include_router(finance.router)
 app.include_router(finance.goals_router)
@@ -56,60 +110,210 @@ app.include_router(gamification.router)
 app.include_router(community.router) # AÑADIMOS EL NUEVO ROUTER AQUÍ
 app.include_router(marketplace.router) # AÑADIDO
 app.include_router(subscription.router) # AÑADIDO
+app.include_router(media.router)
+app.include_router(payments_router.router)
+app.include_router(admin.router)
 
 @app.get("/")
 def read_root():
-    return {"status": "ok", "version": "5.0.0"}
+    return {"status": "ok", "version": "5.0.0", "circuits": circuit.states()}
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request):
+    """Métricas en formato de texto de Prometheus. Pide el bearer METRICS_TOKEN (ver metrics.py)."""
+    if metrics.METRICS_TOKEN:
+        # Se comparan bytes: compare_digest con str falla si el header trae algo fuera de ASCII.
+        # Starlette decodifica los headers como latin-1, así que así se recuperan los bytes originales.
+        authorized = hmac.compare_digest((request.headers.get("authorization") or "").encode("latin-1"), f"Bearer {metrics.METRICS_TOKEN}".encode())
+    else:
+        authorized = metrics.METRICS_INSECURE_DEV
+    if not authorized:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="No autorizado.")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Token interno para el startup probe y los scripts de deploy, que no tienen usuario.
+WARMUP_TOKEN = os.environ.get("WARMUP_TOKEN")
+
+def require_warmup_caller(authorization: Optional[str] = Header(None)):
+    """El bearer WARMUP_TOKEN o un administrador (ADMIN_EMAILS)."""
+    # Bytes, como en /metrics: con str, un header fuera de ASCII hace fallar a compare_digest.
+    if WARMUP_TOKEN and authorization and hmac.compare_digest(authorization.encode("latin-1"), f"Bearer {WARMUP_TOKEN}".encode()):
+        return
+    try:
+        user_email = email_from_authorization(authorization)
+    except HTTPException:
+        user_email = None
+    if user_email not in admin.ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Solo para uso interno.")
+
+@app.post("/warmup", dependencies=[Depends(require_warmup_caller)])
+def warmup(include_speech: bool = True):
+    """
+    Inicializa los clientes pesados por adelantado.
+    Pensado para el startup probe de Cloud Run (con el header
+    `Authorization: Bearer $WARMUP_TOKEN`) o para llamarlo después de un deploy.
+    """
+    return {"status": "ok", "timings_ms": clients.warm_up(include_speech=include_speech)}
+
+def register_expense_from_text(text: str, db: Session, user: User):
+    """
+    Categoriza un texto libre con la IA y, si se pudo, lo guarda como gasto.
+    Compartido por la carga por texto y por voz.
+    """
+    parsed_data = parse_expense_with_gemini(text, db, user.email)
+    if parsed_data:
+        new_expense = Expense(user_email=user.email, **parsed_data)
+        db.add(new_expense)
+        record_event(user, "expense_created", db)
+        db.commit()
+        return {"status": "Gasto registrado con éxito", "data": parsed_data}
+    return {"status": "No se pudo categorizar el gasto", "data": {"description": text}}
 
-# ... (el resto del archivo main.py permanece sin cambios, incluyendo transcribe_audio, process_text, ai_chat, etc.)
 @app.post("/transcribe")
 def transcribe_audio(audio_file: UploadFile = File(...), db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
     try:
-        wav_audio_content = audio_file.read()
-        
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=44100,
-            language_code="es-AR",
-            audio_channel_count=1
-        )
-        audio_source = speech.RecognitionAudio(content=wav_audio_content)
-        
-        response = speech_client.recognize(config=config, audio=audio_source)
-        
-        transcripts = [result.alternatives[0].transcript for result in response.results]
-        if not transcripts:
+        # En un endpoint síncrono hay que leer el archivo subyacente: `audio_file.read()` es una corrutina.
+        wav_audio_content = audio_file.file.read(MAX_STREAM_BYTES + 1)
+        if len(wav_audio_content) > MAX_STREAM_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="El audio es demasiado largo. Probá con /transcribe/stream.")
+
+        full_transcript = clients.get_speech_backend().transcribe(wav_audio_content).strip()
+        if not full_transcript:
             raise HTTPException(status_code=400, detail="No se pudo entender el audio.")
+
+        return register_expense_from_text(full_transcript, db, user)
             
-        full_transcript = " ".join(transcripts)
-        parsed_data = parse_expense_with_gemini(full_transcript, db, user.email)
-        
-        if parsed_data:
-            new_expense = Expense(user_email=user.email, **parsed_data)
-            db.add(new_expense)
-            db.commit()
-            db.refresh(new_expense)
-            award_achievement(user, "first_expense", db)
-            return {"status": "Gasto registrado con éxito", "data": parsed_data}
-        else:
-            return {"status": "No se pudo categorizar el gasto", "data": {"description": full_transcript}}
-            
+    except HTTPException:
+        raise
+    except circuit.CircuitOpen as e:
+        raise HTTPException(status_code=503, detail="El reconocimiento de voz no está disponible. Probá cargar el gasto por texto.", headers={"Retry-After": str(max(1, int(e.retry_after)))})
     except Exception as e:
         print(f"Error detallado en la transcripción: {e}")
         raise HTTPException(status_code=400, detail=f"Error en la transcripción: No se pudo procesar el audio.")
 
+@app.websocket("/transcribe/stream")
+async def transcribe_audio_stream(websocket: WebSocket):
+    """
+    Transcripción en streaming para el registro de gastos por voz.
+    Protocolo:
+    - El token viaja en el header Authorization o en `?token=`.
+    - Primer mensaje (texto, opcional): {"encoding": "LINEAR16" | "WEBM_OPUS" | "OGG_OPUS", "sample_rate_hertz": 48000}
+      Con el motor local (whisper) solo se acepta LINEAR16; otra codificación cierra con 1003.
+    - Luego, fragmentos binarios de audio a medida que se graban.
+    - Para terminar, el mensaje de texto {"event": "end"}.
+    El servidor responde con {"type": "interim" | "final_segment", "transcript": ...} mientras
+    reconoce, y al final con {"type": "result", "status": ..., "data": ...}.
+    """
+    authorization = websocket.headers.get("authorization")
+    if not authorization and websocket.query_params.get("token"):
+        authorization = f"Bearer {websocket.query_params['token']}"
+    try:
+        user_email = await run_in_threadpool(email_from_authorization, authorization)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    retry_after = await ratelimit.check_websocket(websocket.url.path, user_email)
+    if retry_after is not None:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=f"Hiciste demasiados pedidos seguidos. Probá de nuevo en {max(1, math.ceil(retry_after))} segundos.")
+        return
+
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    speech_backend = await run_in_threadpool(clients.get_speech_backend)
+    session = None
+
+    async def receive_audio():
+        nonlocal session
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                if session is None:
+                    session = speech_backend.open_stream("LINEAR16", 44100, loop)
+                    session.start()
+                await session.feed(message["bytes"])
+                continue
+            payload = json.loads(message.get("text") or "{}")
+            if payload.get("event") == "end":
+                break
+            if session is None:
+                session = speech_backend.open_stream(
+                    payload.get("encoding", "LINEAR16"),
+                    int(payload.get("sample_rate_hertz", 44100)),
+                    loop
+                )
+                session.start()
+        if session is not None:
+            await session.close()
+
+    receiver = asyncio.create_task(receive_audio())
+    close_code = status.WS_1000_NORMAL_CLOSURE
+    try:
+        # Reenviamos los resultados parciales mientras el cliente sigue subiendo audio.
+        while True:
+            if session is None:
+                await asyncio.wait({receiver}, timeout=0.05)
+                if receiver.done() and session is None:
+                    receiver.result()
+                    await websocket.send_json({"type": "error", "detail": "No se recibió audio."})
+                    return
+                continue
+            if receiver.done() and receiver.exception() is not None:
+                raise receiver.exception()
+            get_result = asyncio.ensure_future(session.results.get())
+            waiters = {get_result} if receiver.done() else {get_result, receiver}
+            done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            if get_result not in done:
+                get_result.cancel()
+                continue
+            message = get_result.result()
+            if message["type"] == "done":
+                break
+            await websocket.send_json(message)
+            if message["type"] == "error":
+                return
+
+        transcript = session.transcript
+        if not transcript:
+            await websocket.send_json({"type": "error", "detail": "No se pudo entender el audio."})
+            return
+
+        def persist():
+            db = SessionLocal()
+            try:
+                user = get_user_or_create(user_email=user_email, db=db)
+                return register_expense_from_text(transcript, db, user)
+            finally:
+                db.close()
+
+        result = await run_in_threadpool(persist)
+        await websocket.send_json({"type": "result", **result})
+    except StreamLimitExceeded as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+    except UnsupportedEncoding as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        close_code = status.WS_1003_UNSUPPORTED_DATA
+    except circuit.CircuitOpen:
+        await websocket.send_json({"type": "error", "detail": "El reconocimiento de voz no está disponible. Probá cargar el gasto por texto."})
+        close_code = status.WS_1013_TRY_AGAIN_LATER
+    except usage.BudgetExceeded as e:
+        await websocket.send_json({"type": "error", "detail": e.detail})
+    except (WebSocketDisconnect, json.JSONDecodeError, ValueError) as e:
+        print(f"Sesión de transcripción interrumpida: {e}")
+    finally:
+        if not receiver.done():
+            receiver.cancel()
+        if session is not None:
+            await session.close()
+        try:
+            await websocket.close(code=close_code)
+        except RuntimeError:
+            pass
+
 @app.post("/process-text")
 def process_text(input_data: TextInput, db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
-    parsed_data = parse_expense_with_gemini(input_data.text, db, user.email)
-    if parsed_data:
-        new_expense = Expense(user_email=user.email, **parsed_data)
-        db.add(new_expense)
-        db.commit()
-        db.refresh(new_expense)
-        award_achievement(user, "first_expense", db)
-        return {"status": "Gasto registrado con éxito", "data": parsed_data}
-    else:
-        return {"status": "No se pudo categorizar el gasto", "data": {"description": input_data.text}}
+    return register_expense_from_text(input_data.text, db, user)
 
 @app.get("/chat/history", response_model=List[ChatMessageResponse])
 def get_chat_history(db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
@@ -122,13 +326,15 @@ def ai_chat(request: AIChatInput, db: Session = Depends(get_db), user: User = De
     db.commit()
 
     try:
-        dolar_data = market_data.get_dolar_prices()
+        with tracing.span("chat.dolar_prices"):
+            dolar_data = market_data.get_dolar_prices()
         real_time_context = f"CONTEXTO EN TIEMPO REAL: El Dólar Blue está a ${dolar_data['blue']['venta']} para la venta. El Dólar Oficial está a ${dolar_data['oficial']['venta']}."
     except Exception as e:
         print(f"ALERTA: No se pudo obtener datos del dólar. Causa: {e}")
         real_time_context = "CONTEXTO EN TIEMPO REAL: La cotización del dólar no está disponible en este momento."
 
-    summary_data = finance.get_dashboard_summary(db=db, user=user)
+    with tracing.span("chat.dashboard_summary"):
+        summary_data = finance.get_dashboard_summary(db=db, user=user)
     financial_context = f"Contexto financiero del usuario: Su ingreso es de ${summary_data['income']:,.0f} y ya gastó ${summary_data['total_spent']:,.0f} este mes."
     risk_profile = user.risk_profile or "no definido"
     long_term_goals = user.long_term_goals or "no definidas"
@@ -145,7 +351,8 @@ def ai_chat(request: AIChatInput, db: Session = Depends(get_db), user: User = De
 
     full_context = f"{real_time_context}\n{financial_context}\n{profile_context}"
 
-    chat_history_db = db.query(ChatMessage).filter(ChatMessage.user_email == user.email).order_by(ChatMessage.timestamp.desc()).limit(10).all()
+    with tracing.span("chat.load_history"):
+        chat_history_db = db.query(ChatMessage).filter(ChatMessage.user_email == user.email).order_by(ChatMessage.timestamp.desc()).limit(10).all()
     chat_history_db.reverse()
     history_for_ia = [
         {"role": "user", "parts": [full_context]},
@@ -155,7 +362,7 @@ def ai_chat(request: AIChatInput, db: Session = Depends(get_db), user: User = De
         role = "user" if msg.sender == "user" else "model"
         history_for_ia.append({"role": role, "parts": [msg.message]})
 
-    chat = model_chat.start_chat(history=history_for_ia)
+    chat = clients.get_model("chat").start_chat(history=history_for_ia, user_email=user.email)
     
     try:
         response_model = chat.send_message(request.question)
@@ -163,9 +370,12 @@ def ai_chat(request: AIChatInput, db: Session = Depends(get_db), user: User = De
         db.add(ChatMessage(user_email=user.email, sender="ai", message=ai_response_text))
         db.commit()
         return {"response": ai_response_text}
+    except usage.BudgetExceeded:
+        raise
     except Exception as e:
-        print(f"Error al procesar la solicitud con la IA: {e}")
-        raise HTTPException(status_code=500, detail=f"Error al procesar la solicitud con la IA: {e}")
+        # La respuesta de respaldo no se guarda en el historial para no ensuciar el contexto de la IA.
+        print(f"Error al procesar la solicitud con la IA, se responde sin IA: {e}")
+        return {"response": fallbacks.chat_reply(request.question), "degraded": True}
 
 @app.get("/check-onboarding")
 def check_onboarding_status(db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
@@ -0,0 +1,160 @@
+# En: backend/metrics.py
+import os
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+# --- MÉTRICAS ---
+# Histogramas en memoria expuestos en /metrics con el formato de texto de
+# Prometheus. Por cada pedido se mide la latencia por ruta (la plantilla, no
+# la URL con ids), cuántas consultas SQL hizo y cuánto tardaron (un número de
+# consultas alto en una ruta es la firma de un N+1), y cada llamada a un
+# servicio externo (Gemini, Speech, dolarapi) se mide con `track_upstream`.
+# Los valores son por proceso: con varios workers, Prometheus los suma.
+
+# /metrics pide el bearer METRICS_TOKEN. Sin token configurado queda cerrado,
+# salvo en desarrollo local con METRICS_INSECURE_DEV=1.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+METRICS_INSECURE_DEV = os.environ.get("METRICS_INSECURE_DEV") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str], buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(series[0]), series[1], series[2]) for key, series in self._series.items()]
+        for key, bucket_counts, total, count in snapshot:
+            pairs = list(zip(self.labels, key))
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', repr(float(bound)))])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {count}")
+        return lines
+
+
+REGISTRY: List[Histogram] = []
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "resi_http_request_duration_seconds", "Latencia de los pedidos HTTP.", ("method", "route", "status"))
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "resi_http_request_db_queries", "Consultas SQL por pedido HTTP.", ("method", "route"), QUERY_COUNT_BUCKETS)
+HTTP_REQUEST_DB_SECONDS = Histogram(
+    "resi_http_request_db_seconds", "Tiempo total en la base por pedido HTTP.", ("method", "route"))
+DB_QUERY_SECONDS = Histogram(
+    "resi_db_query_seconds", "Duración de cada consulta SQL.", ("operation",))
+UPSTREAM_SECONDS = Histogram(
+    "resi_upstream_request_duration_seconds", "Duración de las llamadas a servicios externos.", ("upstream", "operation", "outcome"))
+
+
+def render() -> str:
+    lines = []
+    for histogram in REGISTRY:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- CONSULTAS SQL ---
+# [cantidad, segundos] del pedido en curso. El objeto es mutable para que las
+# consultas hechas en el threadpool (que copia el contexto) sumen al mismo pedido.
+_request_db_stats: ContextVar[Optional[list]] = ContextVar("request_db_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started_at")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    words = statement.lstrip().split(None, 1)
+    DB_QUERY_SECONDS.observe(elapsed, operation=words[0].lower() if words else "")
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def install_db_hooks(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- SERVICIOS EXTERNOS ---
+
+@contextmanager
+def track_upstream(upstream: str, operation: str = "call"):
+    """Mide una llamada a un servicio externo: `with track_upstream("gemini", "chat"): ...`."""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, upstream=upstream, operation=operation, outcome=outcome)
+
+
+# --- MIDDLEWARE ---
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        stats = [0, 0.0]
+        token = _request_db_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db_stats.reset(token)
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route_path, status=status_code)
+            HTTP_REQUEST_DB_QUERIES.observe(stats[0], method=request.method, route=route_path)
+            HTTP_REQUEST_DB_SECONDS.observe(stats[1], method=request.method, route=route_path)
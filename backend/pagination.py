@@ -0,0 +1,59 @@
+# En: backend/pagination.py
+import json
+import base64
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+# Cursores opacos para paginar por clave (keyset) en vez de OFFSET: el cliente
+# recibe `next_cursor` y lo devuelve tal cual para pedir la página siguiente.
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[list]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación inválido.")
+
+
+def keyset_page(query, column, id_column, descending: bool, cursor: Optional[str], limit: int,
+                parse_value: Callable[[Any], Any] = lambda value: value, skip: int = 0) -> Tuple[List[Any], Optional[str]]:
+    """
+    Pagina `query` ordenando por (`column`, `id_column`) en la misma dirección.
+    El id desempata, así que ninguna fila se repite ni se saltea entre páginas.
+    `skip` es el OFFSET de los clientes viejos: solo se usa si no hay cursor.
+    Devuelve (filas, next_cursor).
+    """
+    position = decode_cursor(cursor, 2)
+    if position is not None:
+        try:
+            value, last_id = parse_value(position[0]), int(position[1])
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación inválido.")
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, id_column < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, id_column > last_id)))
+    order = (column.desc(), id_column.desc()) if descending else (column.asc(), id_column.asc())
+    query = query.order_by(*order)
+    if position is None and skip:
+        query = query.offset(skip)
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), getattr(last, id_column.key))
+    return rows, next_cursor
@@ -0,0 +1,246 @@
+# En: backend/payments.py
+import os
+import hmac
+import json
+import time
+import queue
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, User, Subscription, PaymentEvent
+import coins
+import entitlements
+
+# --- PAGOS ---
+# Las pasarelas avisan por webhook. Recibir un aviso es barato: se verifica la
+# firma, se inserta el evento (único por proveedor + id, así un reintento es un
+# no-op) y se responde enseguida. El trabajo contra la base lo hace un hilo de
+# fondo; si la instancia se cae antes, la tarea periódica `process_payment_events`
+# retoma los eventos que quedaron sin procesar.
+#
+# Firma: header `X-Payment-Signature: t=<unix>,v1=<hex>`, donde v1 es
+# HMAC-SHA256 de "<t>.<cuerpo>" con el secreto del proveedor
+# (variable PAYMENT_WEBHOOK_SECRET_<PROVEEDOR>).
+
+SIGNATURE_TOLERANCE_SECONDS = 300
+MAX_ATTEMPTS = 5
+RETRY_AFTER_SECONDS = 30
+RETRY_BATCH_SIZE = 500
+QUEUE_SIZE = 10000
+
+
+class UnknownProvider(Exception):
+    pass
+
+
+class InvalidSignature(Exception):
+    pass
+
+
+class InvalidPayload(Exception):
+    pass
+
+
+def _secret_for(provider: str) -> Optional[str]:
+    return os.environ.get(f"PAYMENT_WEBHOOK_SECRET_{provider.upper()}")
+
+
+def sign(secret: str, body: bytes, timestamp: Optional[int] = None) -> str:
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(secret: str, body: bytes, header: Optional[str]):
+    if not header:
+        raise InvalidSignature("Falta la firma.")
+    parts = dict(part.strip().split("=", 1) for part in header.split(",") if "=" in part)
+    try:
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        raise InvalidSignature("Firma mal formada.")
+    if abs(time.time() - timestamp) > SIGNATURE_TOLERANCE_SECONDS:
+        raise InvalidSignature("Firma vencida.")
+    expected = sign(secret, body, timestamp).split("v1=", 1)[1]
+    if not hmac.compare_digest(expected.encode(), parts.get("v1", "").encode("latin-1", "replace")):
+        raise InvalidSignature("Firma inválida.")
+
+
+# Cada proveedor manda su propio formato; el adaptador lo lleva a
+# (id del evento, tipo, datos). Sin adaptador se espera {"id", "type", "data"}.
+def _parse_default(payload: dict) -> Tuple[str, str, dict]:
+    return str(payload["id"]), str(payload["type"]), dict(payload.get("data") or {})
+
+
+PROVIDER_PARSERS: Dict[str, Callable[[dict], Tuple[str, str, dict]]] = {}
+
+
+def ingest(db: Session, provider: str, body: bytes, signature: Optional[str]) -> Tuple[str, Optional[int]]:
+    """
+    Verifica y guarda un evento. Devuelve ("accepted", id) o ("duplicate", None).
+    No procesa nada: eso lo hace el worker.
+    """
+    secret = _secret_for(provider)
+    if not secret:
+        raise UnknownProvider(provider)
+    verify_signature(secret, body, signature)
+    try:
+        event_id, event_type, data = PROVIDER_PARSERS.get(provider, _parse_default)(json.loads(body))
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidPayload(str(e))
+
+    event = PaymentEvent(provider=provider, event_id=event_id, event_type=event_type, payload=json.dumps(data))
+    db.add(event)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return "duplicate", None
+    return "accepted", event.id
+
+
+# --- EFECTOS DE UN PAGO ---
+# Los usan tanto los webhooks como los endpoints simulados de /subscriptions.
+# No commitean.
+
+def grant_premium(db: Session, user_email: str, days: int, payment_id: Optional[str], plan_name: str = "Premium"):
+    """Activa o extiende la suscripción: si sigue vigente, los días se suman al final."""
+    now = datetime.utcnow()
+    subscription = db.query(Subscription).filter(Subscription.user_email == user_email).with_for_update().first()
+    if not subscription:
+        subscription = Subscription(user_email=user_email)
+        db.add(subscription)
+    if subscription.end_date and subscription.end_date > now:
+        start = subscription.end_date
+    else:
+        start = now
+        subscription.start_date = now
+    subscription.end_date = start + timedelta(days=days)
+    subscription.plan_name = plan_name
+    subscription.payment_id = payment_id
+    db.query(User).filter(User.email == user_email).update({User.is_premium: True}, synchronize_session=False)
+
+
+def grant_coins(db: Session, user_email: str, amount: int, reference: Optional[str]):
+    coins.apply(db, user_email, amount, "purchase", reference=reference)
+
+
+def _handle_subscription(db: Session, event: PaymentEvent, data: dict):
+    grant_premium(db, data["user_email"], int(data.get("days", 30)), data.get("payment_id") or event.event_id, data.get("plan", "Premium"))
+
+
+def _handle_coins(db: Session, event: PaymentEvent, data: dict):
+    amount = int(data["amount"])
+    if amount <= 0:
+        raise InvalidPayload("La cantidad de monedas debe ser positiva.")
+    grant_coins(db, data["user_email"], amount, reference=f"payment:{event.provider}:{event.event_id}")
+
+
+HANDLERS: Dict[str, Callable[[Session, PaymentEvent, dict], None]] = {
+    "subscription.activated": _handle_subscription,
+    "subscription.renewed": _handle_subscription,
+    "coins.purchased": _handle_coins,
+}
+
+
+def process_event(event_pk: int) -> str:
+    """
+    Aplica un evento guardado. El paso a "processed" es un UPDATE condicional en
+    la misma transacción que los efectos: si dos procesos toman el mismo evento,
+    uno solo lo aplica.
+    """
+    db = SessionLocal()
+    try:
+        event = db.query(PaymentEvent).filter(PaymentEvent.id == event_pk).first()
+        if event is None or event.status == "processed":
+            return "skipped"
+        claimed = db.query(PaymentEvent).filter(
+            PaymentEvent.id == event_pk,
+            PaymentEvent.status != "processed"
+        ).update({
+            PaymentEvent.status: "processed",
+            PaymentEvent.attempts: PaymentEvent.attempts + 1,
+            PaymentEvent.processed_at: datetime.utcnow(),
+        }, synchronize_session=False)
+        if claimed != 1:
+            db.rollback()
+            return "skipped"
+        data = json.loads(event.payload)
+        try:
+            handler = HANDLERS.get(event.event_type)
+            if handler is not None:
+                handler(db, event, data)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            db.query(PaymentEvent).filter(PaymentEvent.id == event_pk).update({
+                PaymentEvent.status: "failed",
+                PaymentEvent.attempts: PaymentEvent.attempts + 1,
+                PaymentEvent.last_error: str(e)[:1000],
+            }, synchronize_session=False)
+            db.commit()
+            print(f"Error procesando el evento de pago {event_pk}: {e}")
+            return "failed"
+        if data.get("user_email"):
+            entitlements.invalidate(data["user_email"])
+        return "processed" if handler is not None else "ignored"
+    finally:
+        db.close()
+
+
+def retry_pending(db: Session, now: datetime = None) -> dict:
+    """Procesa los eventos que quedaron sin aplicar (caída del worker o error transitorio)."""
+    cutoff = (now or datetime.utcnow()) - timedelta(seconds=RETRY_AFTER_SECONDS)
+    pending = [event_pk for (event_pk,) in db.query(PaymentEvent.id).filter(
+        PaymentEvent.status.in_(("received", "failed")),
+        PaymentEvent.attempts < MAX_ATTEMPTS,
+        PaymentEvent.received_at < cutoff
+    ).order_by(PaymentEvent.received_at).limit(RETRY_BATCH_SIZE).all()]
+    summary: Dict[str, int] = {}
+    for event_pk in pending:
+        outcome = process_event(event_pk)
+        summary[outcome] = summary.get(outcome, 0) + 1
+    return summary
+
+
+# --- WORKER ---
+
+_queue: "queue.Queue[Optional[int]]" = queue.Queue(maxsize=QUEUE_SIZE)
+_thread: Optional[threading.Thread] = None
+
+
+def enqueue(event_pk: int):
+    try:
+        _queue.put_nowait(event_pk)
+    except queue.Full:
+        # El evento ya está guardado; lo retoma process_payment_events.
+        pass
+
+
+def _run_worker():
+    while True:
+        event_pk = _queue.get()
+        if event_pk is None:
+            return
+        try:
+            process_event(event_pk)
+        except Exception as e:
+            print(f"Error en el worker de pagos: {e}")
+
+
+def start_worker():
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _thread = threading.Thread(target=_run_worker, name="payments-worker", daemon=True)
+    _thread.start()
+
+
+def stop_worker():
+    if _thread is not None and _thread.is_alive():
+        _queue.put(None)
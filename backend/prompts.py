@@ -0,0 +1,192 @@
+# En: backend/prompts.py
+import json
+import textwrap
+
+from schemas import ExpenseData, CultivationPlanResult, FamilyPlanResponse, ValidateParamsResult
+
+# --- PROMPTS DE LOS GENERADORES ---
+# Lo fijo de cada generador (rol, formato, reglas) va en la instrucción de
+# sistema del modelo (ver MODEL_SPECS en clients.py). La forma del JSON no se
+# describe con texto: se pasa como `response_schema`, derivado de los modelos
+# de Pydantic. En cada pedido solo viajan los datos del usuario, armados con
+# plantillas que se preparan una vez al importar.
+
+
+def response_schema(model, exclude=()) -> dict:
+    """
+    Traduce un modelo de Pydantic al subconjunto de OpenAPI que acepta Gemini
+    (sin $ref, títulos ni defaults). Todos los campos que no admiten None
+    quedan obligatorios, para que la IA no omita listas con valor por defecto.
+    `exclude` saca campos de primer nivel que no tiene que generar la IA.
+    """
+    schema = model.model_json_schema()
+    schema["properties"] = {name: value for name, value in schema["properties"].items() if name not in exclude}
+    definitions = schema.get("$defs", {})
+
+    def convert(node: dict) -> dict:
+        if "$ref" in node:
+            return convert(definitions[node["$ref"].rsplit("/", 1)[-1]])
+        if "anyOf" in node:
+            options = [option for option in node["anyOf"] if option.get("type") != "null"]
+            converted = convert(options[0])
+            if len(options) < len(node["anyOf"]):
+                converted["nullable"] = True
+            if "description" in node:
+                converted["description"] = node["description"]
+            return converted
+        converted = {"type": node["type"]}
+        if "description" in node:
+            converted["description"] = node["description"]
+        if "enum" in node:
+            converted["enum"] = node["enum"]
+        if node["type"] == "object":
+            properties = {name: convert(value) for name, value in node.get("properties", {}).items()}
+            converted["properties"] = properties
+            converted["required"] = [name for name, value in properties.items() if not value.get("nullable")]
+        elif node["type"] == "array":
+            converted["items"] = convert(node["items"])
+        return converted
+
+    return convert(schema)
+
+
+def json_output(model) -> dict:
+    """`generation_config` para respuestas JSON con la forma de `model`."""
+    return {"response_mime_type": "application/json", "response_schema": response_schema(model)}
+
+
+# --- REGISTRO DE GASTOS ---
+
+EXPENSE_SYSTEM_INSTRUCTION = textwrap.dedent("""
+    Tu única tarea es analizar una frase de un usuario en Argentina sobre un gasto y devolver un objeto JSON con dos claves: "amount" y "category".
+    - amount: el monto como número, sin símbolos de moneda.
+    - category: una de las categorías permitidas. No inventes categorías. Si no estás seguro, usa "Otros".
+""").strip()
+
+EXPENSE_CATEGORIES = [
+    "Vivienda", "Servicios Básicos", "Supermercado", "Kioscos", "Transporte", "Salud",
+    "Deudas", "Préstamos", "Entretenimiento", "Hijos", "Mascotas", "Cuidado Personal",
+    "Vestimenta", "Ahorro", "Inversión", "Otros"
+]
+
+_EXPENSE_SCHEMA = response_schema(ExpenseData, exclude=("description",))
+
+
+def expense_output(user_categories) -> dict:
+    """El schema fijo con las categorías del usuario como `enum` de `category`."""
+    categories = list(dict.fromkeys(EXPENSE_CATEGORIES + list(user_categories)))
+    schema = dict(_EXPENSE_SCHEMA, properties=dict(_EXPENSE_SCHEMA["properties"], category={"type": "string", "enum": categories}))
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+
+def expense(text: str) -> str:
+    return f"Analiza esta frase: '{text}'"
+
+
+# --- PLAN DE CULTIVO ---
+
+PLAN_SYSTEM_INSTRUCTION = textwrap.dedent("""
+    Tu única tarea es actuar como un experto en cultivo casero en Argentina y diseñar el plan de cultivo ideal para los datos del usuario, en formato JSON.
+    - crop: cultivo recomendado (ej: 'Lechuga y Rúcula', 'Tomates Cherry').
+    - system: sistema de cultivo (ej: 'Sistema DWC casero', 'Bancal elevado').
+    - materials: materiales esenciales y para qué sirve cada uno.
+    - projectedSavings: ahorro mensual estimado, conectado con el gasto en vegetales del usuario (ej: 'Con este plan, podrías ahorrar un 20% de tus gastos en la verdulería, unos $5.000 al mes.').
+    - tips: un consejo específico según su ubicación, experiencia y método.
+    - imagePrompt: un prompt en inglés para generar una imagen del plan.
+    Sé creativo, pero mantente realista.
+""").strip()
+
+_PLAN_PROMPT = textwrap.dedent("""
+    Datos del usuario:
+    - Método: {method}
+    - Espacio: {space}
+    - Experiencia: {experience}
+    - Presupuesto inicial: ${initial_budget:,.0f}
+    - Gasto mensual en vegetales: ${supermarket_spending:,.0f}
+    - Tipo de luz: {light}
+    - Tipo de suelo: {soil_type}
+    - Ubicación: {location}
+""").strip()
+
+
+def cultivation_plan(request) -> str:
+    return _PLAN_PROMPT.format(
+        method=request.method,
+        space=request.space,
+        experience=request.experience,
+        initial_budget=request.initialBudget or 0,
+        supermarket_spending=request.supermarketSpending or 0,
+        light=request.light if request.method == "hydroponics" else "N/A",
+        soil_type=request.soilType if request.method == "organic" else "N/A",
+        location=request.location,
+    )
+
+
+# --- VALIDACIÓN DE PARÁMETROS ---
+
+VALIDATOR_SYSTEM_INSTRUCTION = textwrap.dedent("""
+    Tu única tarea es analizar los parámetros de cultivo de un usuario y generar un JSON con recomendaciones específicas, rápidas y prácticas. DEBES responder solo con el JSON y nada más.
+    Rangos óptimos:
+    - Hidropónico: pH 5.5 a 6.5, EC mayor a 0, temperatura 18°C a 24°C.
+    - Orgánico: pH 6.0 a 7.0, humedad del suelo 30% a 60%.
+    - isValid: si todos los parámetros informados están en rango.
+    - advice: un consejo claro. Si hay un problema, explicá por qué y qué hacer; si todo está bien, da un mensaje de ánimo.
+""").strip()
+
+_VALIDATOR_PROMPT = textwrap.dedent("""
+    Parámetros de cultivo:
+    - Método: {method}
+    - pH: {ph}
+    - Conductividad Eléctrica (EC): {ec}
+    - Temperatura: {temp}
+    - Humedad del suelo: {soil_moisture}
+""").strip()
+
+
+def validate_parameters(request) -> str:
+    return _VALIDATOR_PROMPT.format(
+        method=request.method, ph=request.ph, ec=request.ec, temp=request.temp, soil_moisture=request.soilMoisture
+    )
+
+
+# --- PLAN FAMILIAR ---
+
+FAMILY_PLAN_SYSTEM_INSTRUCTION = textwrap.dedent("""
+    Tu única tarea es actuar como un experto en planificación familiar en Argentina y crear un plan semanal de comidas, ahorro y ocio en formato JSON.
+    - mealPlan: un día por elemento, de Lunes a Domingo. Comidas caseras y económicas, adecuadas a la cantidad y edades de los miembros y a sus preferencias.
+      - tags: 2 o 3 etiquetas cortas (ej: "rápido", "económico").
+      - ingredients: cada ingrediente con su medida (ej: "1 taza de lentejas cocidas").
+      - instructions: 3 a 5 pasos detallados, cada uno empezando con "Paso N:".
+    - budgetSuggestion: un consejo de presupuesto específico y accionable, basado en el ingreso mensual y las metas financieras.
+    - leisureSuggestion: una actividad acorde a la familia, con su costo estimado ("nulo", "bajo" o "medio") y una breve descripción.
+    Tené en cuenta los detalles adicionales y las metas del usuario.
+""").strip()
+
+_FAMILY_PLAN_PROMPT = textwrap.dedent("""
+    Datos familiares:
+    - Miembros de la familia: {members}
+    - Preferencias dietarias: {dietary_preferences}
+    - Estilo de cocina: {cooking_style}
+    - Metas financieras: {financial_goals}
+    - Actividades de ocio: {leisure_activities}
+    - Ingreso mensual familiar: ${income:,.0f}
+    - Detalles adicionales del usuario: {long_term_goals} y {risk_profile}
+""").strip()
+
+
+def family_plan(request, income: float, user) -> str:
+    return _FAMILY_PLAN_PROMPT.format(
+        members=json.dumps([member.dict() for member in request.familyMembers], ensure_ascii=False),
+        dietary_preferences=", ".join(request.dietaryPreferences),
+        cooking_style=request.cookingStyle,
+        financial_goals=request.financialGoals,
+        leisure_activities=", ".join(request.leisureActivities),
+        income=income,
+        long_term_goals=user.long_term_goals,
+        risk_profile=user.risk_profile,
+    )
+
+
+PLAN_OUTPUT = json_output(CultivationPlanResult)
+VALIDATOR_OUTPUT = json_output(ValidateParamsResult)
+FAMILY_PLAN_OUTPUT = json_output(FamilyPlanResponse)
@@ -0,0 +1,211 @@
+# En: backend/ratelimit.py
+import os
+import math
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from cache import TTLCache
+
+# --- LÍMITE DE PEDIDOS A LAS RUTAS CON IA ---
+# Cada ruta que llama a Gemini tiene un balde de fichas por usuario: se gasta
+# una por pedido y se recarga a ritmo constante, así se permiten ráfagas cortas
+# pero no un uso sostenido que agote la cuota de todos. Los usuarios Premium
+# tienen un balde más grande. RATE_LIMIT_BACKEND elige dónde viven los baldes:
+# - "memory": en el proceso (cada instancia cuenta por su lado).
+# - "redis": compartidos entre instancias (REDIS_URL).
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+
+class Limit:
+    """`burst` fichas como máximo, recargadas a `per_minute` por minuto."""
+    __slots__ = ("burst", "per_minute")
+
+    def __init__(self, burst: int, per_minute: float):
+        self.burst = burst
+        self.per_minute = per_minute
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.per_minute / 60.0
+
+
+class Policy:
+    __slots__ = ("name", "free", "premium")
+
+    def __init__(self, name: str, free: Limit, premium: Limit):
+        self.name = name
+        self.free = free
+        self.premium = premium
+
+
+# (método, ruta) -> política. Las rutas que comparten cuota comparten nombre.
+POLICIES: Dict[Tuple[str, str], Policy] = {
+    ("POST", "/chat"): Policy("chat", free=Limit(5, 10), premium=Limit(15, 40)),
+    ("POST", "/cultivation/chat"): Policy("chat", free=Limit(5, 10), premium=Limit(15, 40)),
+    ("POST", "/process-text"): Policy("expense_parse", free=Limit(10, 20), premium=Limit(30, 60)),
+    ("POST", "/transcribe"): Policy("expense_parse", free=Limit(10, 20), premium=Limit(30, 60)),
+    ("POST", "/cultivation/generate-plan"): Policy("plan", free=Limit(2, 2), premium=Limit(5, 10)),
+    # Validar parámetros es una llamada corta: no gasta la cuota de los planes.
+    ("POST", "/cultivation/validate-parameters"): Policy("validate", free=Limit(5, 10), premium=Limit(15, 30)),
+    ("POST", "/family-plan/generate"): Policy("plan", free=Limit(2, 2), premium=Limit(5, 10)),
+    # Los WebSockets no pasan por el middleware: el handler llama a check_websocket.
+    ("WEBSOCKET", "/transcribe/stream"): Policy("expense_parse", free=Limit(10, 20), premium=Limit(30, 60)),
+}
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int = 100000):
+        # Un balde que no se usa se llena solo: vence justo cuando estaría lleno.
+        self._buckets = TTLCache(maxsize=maxsize, ttl=None)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit) -> Tuple[bool, float, int]:
+        """Intenta gastar una ficha. Devuelve (permitido, segundos a esperar, fichas restantes)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (float(limit.burst), now))
+            tokens = min(limit.burst, tokens + (now - updated_at) * limit.refill_per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets.set(key, (tokens, now), ttl=(limit.burst - tokens) / limit.refill_per_second)
+        retry_after = 0.0 if allowed else (1 - tokens) / limit.refill_per_second
+        return allowed, retry_after, int(tokens)
+
+
+class RedisBackend:
+    # El balde se lee, recarga y descuenta en un solo script: atómico entre instancias.
+    SCRIPT = """
+    local burst = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str = REDIS_URL):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def take(self, key: str, limit: Limit) -> Tuple[bool, float, int]:
+        allowed, tokens = self._script(keys=[f"ratelimit:{key}"], args=[limit.burst, limit.refill_per_second, time.time()])
+        tokens = float(tokens)
+        retry_after = 0.0 if allowed else (1 - tokens) / limit.refill_per_second
+        return bool(allowed), retry_after, int(tokens)
+
+
+RATE_LIMIT_BACKENDS = {
+    "memory": MemoryBackend,
+    "redis": RedisBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if RATE_LIMIT_BACKEND not in RATE_LIMIT_BACKENDS:
+                    raise ValueError(f"Backend de rate limit desconocido: '{RATE_LIMIT_BACKEND}'. Opciones: {list(RATE_LIMIT_BACKENDS)}")
+                _backend = RATE_LIMIT_BACKENDS[RATE_LIMIT_BACKEND]()
+    return _backend
+
+
+def _identity(authorization: Optional[str], client_host: Optional[str]) -> Tuple[str, Optional[str]]:
+    """(clave del balde, email si hay usuario). Sin usuario se limita por IP."""
+    from dependencies import email_from_authorization
+    try:
+        email = email_from_authorization(authorization)
+    except Exception:
+        email = None
+    if email:
+        return f"user:{email}", email
+    return f"ip:{client_host or 'unknown'}", None
+
+
+def _is_premium(email: str) -> bool:
+    from database import SessionLocal
+    import entitlements
+    db = SessionLocal()
+    try:
+        return entitlements.get(db, email).is_premium
+    finally:
+        db.close()
+
+
+def check(policy: Policy, identity: str, email: Optional[str]) -> Tuple[bool, float, int, Limit]:
+    try:
+        premium = bool(email) and _is_premium(email)
+    except Exception as e:
+        # Si no se puede consultar la base se aplica el límite gratuito en vez de fallar.
+        print(f"No se pudo consultar el plan de {email} para el rate limit: {e}")
+        premium = False
+    limit = policy.premium if premium else policy.free
+    try:
+        allowed, retry_after, remaining = get_backend().take(f"{policy.name}:{identity}", limit)
+    except Exception as e:
+        # Si el backend compartido no responde preferimos atender a cortar el servicio.
+        print(f"Rate limit no disponible, se deja pasar el pedido: {e}")
+        return True, 0.0, limit.burst, limit
+    return allowed, retry_after, remaining, limit
+
+
+def check_request(policy: Policy, authorization: Optional[str], client_host: Optional[str]) -> Tuple[bool, float, int, Limit]:
+    # Verificar el token puede bajar las claves de Google (JWKS) y ver si es
+    # Premium consulta la base: todo esto corre en el threadpool, nunca en el event loop.
+    identity, email = _identity(authorization, client_host)
+    return check(policy, identity, email)
+
+
+async def check_websocket(path: str, email: str) -> Optional[float]:
+    """Gasta una ficha al abrir un WebSocket limitado. Devuelve los segundos a esperar si no hay fichas."""
+    policy = POLICIES.get(("WEBSOCKET", path)) if RATE_LIMIT_ENABLED else None
+    if policy is None:
+        return None
+    allowed, retry_after, _, _ = await run_in_threadpool(check, policy, f"user:{email}", email)
+    return None if allowed else retry_after
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        policy = POLICIES.get((request.method, request.url.path)) if RATE_LIMIT_ENABLED else None
+        if policy is None:
+            return await call_next(request)
+
+        allowed, retry_after, remaining, limit = await run_in_threadpool(
+            check_request, policy, request.headers.get("authorization"), request.client.host if request.client else None
+        )
+        headers = {"X-RateLimit-Limit": str(limit.burst), "X-RateLimit-Remaining": str(remaining)}
+        if not allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Hiciste demasiados pedidos seguidos. Probá de nuevo en unos segundos."},
+                headers=headers
+            )
+        response = await call_next(request)
+        response.headers.update(headers)
+        return response
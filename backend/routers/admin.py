@@ -0,0 +1,71 @@
+# En: backend/routers/admin.py
+import os
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, desc
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from database import LLMUsage
+from schemas import LLMUsageRow
+from dependencies import get_db, get_current_user_email
+import usage
+
+# Emails separados por coma con acceso a los reportes internos.
+ADMIN_EMAILS = {email.strip() for email in os.environ.get("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+LLM_USAGE_GROUPS = {
+    "feature": LLMUsage.feature,
+    "user": LLMUsage.user_email,
+    "day": LLMUsage.day,
+    "model": LLMUsage.model,
+}
+
+def require_admin(user_email: Optional[str] = Depends(get_current_user_email)) -> str:
+    if not user_email or user_email not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Solo para administradores.")
+    return user_email
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)]
+)
+
+@router.get("/llm-usage", response_model=List[LLMUsageRow])
+def get_llm_usage(
+    days: int = Query(7, ge=1, le=90),
+    group_by: str = Query("feature", enum=list(LLM_USAGE_GROUPS)),
+    user_email: Optional[str] = None,
+    feature: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Consumo de la IA de los últimos `days` días, agrupado y ordenado por tokens."""
+    usage.flush(db)  # incluye lo que esta instancia todavía no volcó
+    group_column = LLM_USAGE_GROUPS[group_by]
+    total_tokens = func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens)
+    since = (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    query = db.query(
+        group_column,
+        func.sum(LLMUsage.requests),
+        func.sum(LLMUsage.prompt_tokens),
+        func.sum(LLMUsage.completion_tokens),
+        total_tokens,
+        func.sum(LLMUsage.retries),
+        func.sum(LLMUsage.errors),
+        func.sum(LLMUsage.latency_ms_total),
+    ).filter(LLMUsage.day >= since)
+    if user_email:
+        query = query.filter(LLMUsage.user_email == user_email)
+    if feature:
+        query = query.filter(LLMUsage.feature == feature)
+    rows = query.group_by(group_column).order_by(desc(total_tokens)).limit(limit).all()
+    return [
+        LLMUsageRow(
+            key=key, requests=requests, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+            total_tokens=tokens, retries=retries, errors=errors,
+            avg_latency_ms=round(latency_ms / requests, 2) if requests else 0.0
+        )
+        for key, requests, prompt_tokens, completion_tokens, tokens, retries, errors, latency_ms in rows
+    ]
@@ -1,12 +1,17 @@
 # En: backend/routers/community.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import func, and_, or_
+from typing import List, Optional
+from datetime import datetime, timezone
 
 from database import User, CommunityPost, CommunityEvent
-from schemas import CommunityPostCreate, CommunityPostResponse, CommunityEventCreate, CommunityEventResponse
-from dependencies import get_db, get_user_or_create
+from schemas import CommunityPostCreate, CommunityPostResponse, CommunityPostSearchResponse, CommunityEventCreate, CommunityEventResponse, CommunityEventNearbyResponse
+from dependencies import get_db, get_user_or_create, record_event
+import search
+import feed
+import geo
+import entitlements
 
 router = APIRouter(
     prefix="/community",
@@ -20,24 +25,25 @@ def create_community_post(post: CommunityPostCreate, db: Session = Depends(get_d
     - Los usuarios gratuitos tienen un límite de 5 publicaciones activas.
     - Los usuarios premium no tienen límite.
     """
-    if not user.is_premium:
-        post_count = db.query(CommunityPost).filter(CommunityPost.user_email == user.email).count()
-        if post_count >= 5:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Alcanzaste el límite de 5 publicaciones. Hacete Premium para publicar sin límites."
-            )
+    if not entitlements.get(db, user.email).can_create_post:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Alcanzaste el límite de {entitlements.FREE_POST_LIMIT} publicaciones. Hacete Premium para publicar sin límites."
+        )
     
     new_post = CommunityPost(**post.dict(), user_email=user.email)
     db.add(new_post)
+    record_event(user, "community_post_created", db)
     db.commit()
+    feed.invalidate()
+    entitlements.adjust_post_count(user.email, +1)
     db.refresh(new_post)
     return new_post
 
 @router.post("/posts/{post_id}/feature", response_model=CommunityPostResponse)
 def feature_community_post(post_id: int, db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
     """Destaca una publicación. Solo para usuarios Premium."""
-    if not user.is_premium:
+    if not entitlements.get(db, user.email).can_feature_posts:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Solo los miembros Premium pueden destacar publicaciones.")
     
     post_to_feature = db.query(CommunityPost).filter(CommunityPost.id == post_id, CommunityPost.user_email == user.email).first()
@@ -46,32 +52,116 @@ def feature_community_post(post_id: int, db: Session = Depends(get_db), user: Us
         
     post_to_feature.is_featured = True
     db.commit()
+    feed.invalidate()
     db.refresh(post_to_feature)
     return post_to_feature
 
 @router.get("/posts", response_model=List[CommunityPostResponse])
-def get_community_posts(skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
+def get_community_posts(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     """
     Obtiene las publicaciones, mostrando primero las destacadas (Premium).
+    Las primeras páginas salen de memoria; con If-None-Match / If-Modified-Since
+    se responde 304 si no hubo cambios.
     """
-    posts = db.query(CommunityPost).order_by(CommunityPost.is_featured.desc(), CommunityPost.created_at.desc()).offset(skip).limit(limit).all()
-    return posts
+    page = feed.get_page(db, skip, limit)
+    headers = feed.cache_headers(page)
+    if feed.is_not_modified(page, if_none_match, if_modified_since):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=page.body, media_type="application/json", headers=headers)
+
+@router.get("/search", response_model=CommunityPostSearchResponse)
+def search_community_posts(
+    q: str = Query(..., min_length=2, max_length=200),
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca publicaciones por texto (título, contenido y categoría), ordenadas por relevancia.
+    Para la página siguiente, enviá el `next_cursor` recibido.
+    """
+    filters = []
+    if category:
+        filters.append(CommunityPost.category == category)
+    posts, next_cursor = search.search(db, search.POSTS, q, filters, cursor, limit)
+    return {"items": posts, "next_cursor": next_cursor}
 
 @router.post("/events", response_model=CommunityEventResponse)
 def create_community_event(event: CommunityEventCreate, db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
-    """Crea un nuevo evento comunitario (feria, trueque, etc.)."""
-    new_event = CommunityEvent(**event.dict(), user_email=user.email)
+    """
+    Crea un nuevo evento comunitario (feria, trueque, etc.).
+    Si no se mandan coordenadas, se ubica a partir de la localidad en `location`.
+    """
+    location = geo.locate(event.location, event.latitude, event.longitude)
+    new_event = CommunityEvent(**event.dict(exclude={"latitude", "longitude"}), **location, user_email=user.email)
     db.add(new_event)
+    record_event(user, "community_event_created", db)
     db.commit()
     db.refresh(new_event)
     return new_event
 
 @router.get("/events", response_model=List[CommunityEventResponse])
 def get_community_events(skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
-    """Obtiene los próximos eventos comunitarios."""
-    events = db.query(CommunityEvent).order_by(CommunityEvent.event_date.asc()).offset(skip).limit(limit).all()
+    """Obtiene los próximos eventos comunitarios (los que ya pasaron no se listan)."""
+    events = db.query(CommunityEvent).filter(CommunityEvent.event_date >= datetime.utcnow()).order_by(CommunityEvent.event_date.asc()).offset(skip).limit(limit).all()
     return events
 
+@router.get("/events/nearby", response_model=List[CommunityEventNearbyResponse])
+def get_nearby_events(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(25, gt=0, le=500, description="Radio en kilómetros"),
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Próximos eventos dentro de `radius` km de (lat, lon), ordenados por fecha.
+    Solo se consultan las celdas de geohash que cubren el radio, así que el costo
+    no depende de cuántos eventos haya en el resto del país.
+    """
+    now = datetime.utcnow()
+    if from_date is not None and from_date.tzinfo is not None:
+        from_date = from_date.astimezone(timezone.utc).replace(tzinfo=None)
+    start = max(from_date or now, now)
+
+    cell_ranges = []
+    for cell in geo.covering_cells(lat, lon, radius):
+        condition = CommunityEvent.geohash >= cell
+        upper = geo.prefix_upper_bound(cell)
+        if upper is not None:
+            condition = and_(condition, CommunityEvent.geohash < upper)
+        cell_ranges.append(condition)
+
+    # Primero solo id y coordenadas; las celdas cubren más que el círculo, así
+    # que se filtra por distancia real y se corta apenas hay `limit` eventos.
+    candidates = db.query(CommunityEvent.id, CommunityEvent.latitude, CommunityEvent.longitude).filter(
+        or_(*cell_ranges),
+        CommunityEvent.event_date >= start
+    ).order_by(CommunityEvent.event_date.asc(), CommunityEvent.id.asc()).yield_per(200)
+    distances = {}
+    for event_id, event_lat, event_lon in candidates:
+        distance = geo.haversine_km(lat, lon, event_lat, event_lon)
+        if distance <= radius:
+            distances[event_id] = distance
+            if len(distances) >= limit:
+                break
+    if not distances:
+        return []
+
+    events = db.query(CommunityEvent).filter(CommunityEvent.id.in_(distances)).order_by(CommunityEvent.event_date.asc(), CommunityEvent.id.asc()).all()
+    return [
+        {**CommunityEventResponse.model_validate(event).model_dump(), "distance_km": round(distances[event.id], 2)}
+        for event in events
+    ]
+
 @router.delete("/posts/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_community_post(post_id: int, db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
     """
@@ -91,4 +181,6 @@ def delete_community_post(post_id: int, db: Session = Depends(get_db), user: Use
 
     db.delete(post_to_delete)
     db.commit()
+    feed.invalidate()
+    entitlements.adjust_post_count(user.email, -1)
     return
\ No newline at end of file
@@ -8,8 +8,9 @@ from typing import Optional, List
 
 from database import User, CultivationPlan, HarvestLog, CultivationTask
 from schemas import CultivationPlanRequest, AIChatInput, ValidateParamsRequest, CultivationPlanResponse, CultivationPlanResult, HarvestLogInput, HarvestLogResponse, CultivationTaskInput, CultivationTaskResponse
-from dependencies import get_db, get_user_or_create, generate_plan_with_gemini, award_achievement, validate_parameters_with_gemini
+from dependencies import get_db, get_user_or_create, generate_plan_with_gemini, record_event, validate_parameters_with_gemini
 from datetime import datetime, timedelta
+import fallbacks
 
 router = APIRouter(
     prefix="/cultivation",
@@ -36,26 +37,16 @@ def generate_cultivation_plan(request: CultivationPlanRequest, db: Session = Dep
     new_plan = CultivationPlan(user_email=user.email, plan_data=ai_plan_result.json())
     db.add(new_plan)
     user.last_cultivation_plan = ai_plan_result.json()
+    record_event(user, "cultivation_plan_created", db)
     db.commit()
-    db.refresh(new_plan)
-    
-    award_achievement(user, "first_cultivation_plan", db)
 
     return ai_plan_result
 
 @router.post("/chat")
 def cultivation_chat(request: AIChatInput, user: User = Depends(get_user_or_create)):
-    question = request.question.lower()
-    response, image_prompt = "", ""
-    if "plaga" in question or "bicho" in question:
-        response = "Para plagas como el pulgón, una solución de agua con jabón potásico es muy efectiva y orgánica. Aplicálo cada 3 días al atardecer."
-        image_prompt = "Fotografía macro de pulgones en una hoja de tomate."
-    elif "nutrientes" in question or "abono" in question:
-        response = "La clave está en el balance. Para crecimiento, más Nitrógeno (N). Para fruto, más Fósforo (P) y Potasio (K). Un compost bien maduro es ideal para orgánico."
-        image_prompt = "Gráfico simple mostrando los macronutrientes NPK."
-    elif "luz" in question or "sol" in question:
-        response = "Hortalizas de fruto como tomates necesitan 6-8 horas de sol directo. Si no las tenés, considerá cultivos de hoja como lechuga o espinaca."
-        image_prompt = "Ilustración de un balcón con mucho sol vs uno con poco sol."
+    advice = fallbacks.cultivation_advice(request.question)
+    if advice is not None:
+        response, image_prompt = advice
     else:
         response = "Es una excelente pregunta. Para darte una respuesta más precisa, ¿podrías darme más detalle sobre tu planta?"
         image_prompt = "Icono de un cerebro de IA con signos de pregunta."
@@ -63,7 +54,7 @@ def cultivation_chat(request: AIChatInput, user: User = Depends(get_user_or_crea
 
 @router.post("/validate-parameters")
 def validate_cultivation_parameters(request: ValidateParamsRequest, user: User = Depends(get_user_or_create)):
-    return validate_parameters_with_gemini(request)
+    return validate_parameters_with_gemini(request, user.email)
 
 # --- RUTAS PARA EL REGISTRO DE COSECHAS ---
 @router.get("/harvests", response_model=List[HarvestLogResponse])
@@ -75,10 +66,9 @@ def get_harvest_logs(db: Session = Depends(get_db), user: User = Depends(get_use
 def create_harvest_log(log_input: HarvestLogInput, db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
     new_log = HarvestLog(user_email=user.email, crop_name=log_input.crop_name, quantity=log_input.quantity, unit=log_input.unit)
     db.add(new_log)
+    record_event(user, "harvest_logged", db)
     db.commit()
     db.refresh(new_log)
-    # Ejemplo de logro: si se registra la primera cosecha
-    award_achievement(user, "first_harvest", db)
     return new_log
 
 @router.delete("/harvests/{log_id}")
@@ -6,7 +6,7 @@ from typing import Optional
 
 from database import User, FamilyPlan
 from schemas import FamilyPlanRequest, FamilyPlanResponse, MealPlanItem, LeisureSuggestion
-from dependencies import get_db, get_user_or_create, generate_family_plan_with_gemini
+from dependencies import get_db, get_user_or_create, generate_family_plan_with_gemini, record_event
 
 router = APIRouter(
     prefix="/family-plan",
@@ -50,6 +50,7 @@ def generate_family_plan(request: FamilyPlanRequest, db: Session = Depends(get_d
     db.add(new_plan)
     
     user.last_family_plan = response_data.json()
+    record_event(user, "family_plan_created", db)
     
     db.commit()
 
@@ -1,12 +1,15 @@
 # En: backend/routers/gamification.py
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
 
 from database import User, GameProfile, Achievement, UserAchievement
-from schemas import GameProfileResponse, UserAchievementSchema, AchievementSchema
+from schemas import GameProfileResponse, UserAchievementSchema, AchievementSchema, LeaderboardEntry, LeaderboardResponse
 from dependencies import get_db, get_user_or_create
+import achievements
+import leaderboard
+from cache import TTLCache
 
 router = APIRouter(
     prefix="/gamification",
@@ -42,53 +45,103 @@ class GameProfileResponse(BaseModel):
     class Config:
         from_attributes = True
 
-@router.get("/", response_model=GameProfileResponse)
-def get_game_profile(user: User = Depends(get_user_or_create), db: Session = Depends(get_db)):
-    user_with_data = db.query(User).options(
-        joinedload(User.game_profile),
-        joinedload(User.user_achievements).joinedload(UserAchievement.achievement_ref)
-    ).filter(User.email == user.email).first()
+# Perfil ya armado por usuario; se invalida cuando cambian sus puntos, monedas o logros.
+_profile_cache = TTLCache(maxsize=10000, ttl=120)
 
-    if not user_with_data:
-        raise HTTPException(status_code=404, detail="User not found while fetching game profile")
+@achievements.on_profile_change
+def _invalidate_profiles(emails):
+    for email in emails:
+        _profile_cache.pop(email)
 
-    if not user_with_data.game_profile:
-        # Si el usuario es nuevo y no tiene perfil, se crea uno.
-        new_profile = GameProfile(user_email=user.email)
-        db.add(new_profile)
-        db.commit()
-        db.refresh(new_profile)
-        user_with_data.game_profile = new_profile
-
-    profile = user_with_data.game_profile
-
-    achievements_list = [
-        UserAchievementSchema(
-            achievement=AchievementSchema.from_orm(ua.achievement_ref),
-            progress=ua.progress,
-            is_completed=ua.is_completed,
-            completion_date=ua.completion_date.isoformat() if ua.completion_date else None
-        )
-        for ua in user_with_data.user_achievements
-    ]
+def _load_game_profile(db: Session, user_email: str) -> Optional[GameProfileResponse]:
+    """
+    Una sola consulta angosta: columnas del perfil + progreso de logros (LEFT JOIN).
+    Los datos de cada logro salen del catálogo en memoria, no de la base.
+    """
+    rows = db.query(
+        GameProfile.resi_score, GameProfile.resilient_coins, GameProfile.financial_points,
+        GameProfile.cultivation_points, GameProfile.community_points,
+        UserAchievement.achievement_id, UserAchievement.progress,
+        UserAchievement.is_completed, UserAchievement.completion_date
+    ).outerjoin(
+        UserAchievement, UserAchievement.user_email == GameProfile.user_email
+    ).filter(GameProfile.user_email == user_email).all()
+    if not rows:
+        return None
+
+    catalog = achievements.get_catalog(db)
+    achievements_list = []
+    for row in rows:
+        definition = catalog.by_id.get(row.achievement_id) if row.achievement_id else None
+        if definition is None:
+            continue
+        achievements_list.append(UserAchievementSchema(
+            achievement=AchievementSchema(
+                id=definition.id, name=definition.name, description=definition.description,
+                icon=definition.icon, points=definition.points, type=definition.type
+            ),
+            progress=row.progress or 0,
+            is_completed=bool(row.is_completed),
+            completion_date=row.completion_date.isoformat() if row.completion_date else None
+        ))
 
+    first = rows[0]
     return GameProfileResponse(
-        resi_score=profile.resi_score,
-        resilient_coins=profile.resilient_coins,
-        financial_points=profile.financial_points,
-        cultivation_points=profile.cultivation_points,
-        community_points=profile.community_points,
+        resi_score=first.resi_score or 0,
+        resilient_coins=first.resilient_coins or 0,
+        financial_points=first.financial_points or 0,
+        cultivation_points=first.cultivation_points or 0,
+        community_points=first.community_points or 0,
         achievements=achievements_list
     )
 
+@router.get("/", response_model=GameProfileResponse)
+def get_game_profile(user: User = Depends(get_user_or_create), db: Session = Depends(get_db)):
+    cached = _profile_cache.get(user.email)
+    if cached is not None:
+        return cached
+
+    profile = _load_game_profile(db, user.email)
+    if profile is None:
+        # Si el usuario es nuevo y no tiene perfil, se crea uno.
+        db.add(GameProfile(user_email=user.email))
+        db.commit()
+        profile = _load_game_profile(db, user.email)
+
+    _profile_cache.set(user.email, profile)
+    return profile
+
 @router.post("/earn-coins")
-def earn_coins(coins_to_add: int, user: User = Depends(get_user_or_create), db: Session = Depends(get_db)):
+def earn_coins(coins_to_add: int = Query(..., gt=0), user: User = Depends(get_user_or_create), db: Session = Depends(get_db)):
     profile = db.query(GameProfile).filter(GameProfile.user_email == user.email).first()
     
     if profile:
-        profile.resilient_coins += coins_to_add
-        profile.resi_score += coins_to_add * 2
+        achievements.apply_profile_deltas(db, {user.email: {"resilient_coins": coins_to_add, "resi_score": coins_to_add * 2}}, reason="earn")
         db.commit()
-        db.refresh(profile)
         return {"message": f"Ganaste {coins_to_add} monedas y tu ResiScore aumentó."}
-    return {"message": "Perfil de juego no encontrado."}
\ No newline at end of file
+    return {"message": "Perfil de juego no encontrado."}
+
+def _display_name(email: str) -> str:
+    """No exponemos emails en el ranking: solo el comienzo del usuario."""
+    local_part = email.split("@")[0]
+    return f"{local_part[:3]}***"
+
+@router.get("/leaderboard", response_model=LeaderboardResponse)
+def get_leaderboard(
+    board: str = Query("global", enum=list(leaderboard.BOARDS)),
+    limit: int = Query(10, ge=1, le=100),
+    user: User = Depends(get_user_or_create)
+):
+    """
+    Ranking de usuarios: global (ResiScore), por dominio (finance, cultivation, community) o semanal.
+    Incluye la posición del usuario aunque no esté en el top.
+    """
+    top = [
+        LeaderboardEntry(rank=rank, display_name=_display_name(email), score=score, is_me=email == user.email)
+        for rank, email, score in leaderboard.top(board, limit)
+    ]
+    me = None
+    position = leaderboard.rank(board, user.email)
+    if position:
+        me = LeaderboardEntry(rank=position[0], display_name=_display_name(user.email), score=position[1], is_me=True)
+    return LeaderboardResponse(board=board, total_players=leaderboard.size(board), top=top, me=me)
@@ -1,8 +1,13 @@
 # En: backend/routers/market_data.py
+import time
 import httpx
 from fastapi import APIRouter, HTTPException
 from httpx import Client, ConnectTimeout, ReadTimeout
 
+from cache import TTLCache
+from metrics import track_upstream
+import circuit
+
 router = APIRouter(
     prefix="/market-data",
     tags=["Market Data"]
@@ -10,44 +15,85 @@ router = APIRouter(
 
 DOLAR_API_URL = "https://dolarapi.com/v1/dolares"
 
+# Las cotizaciones se piden como mucho una vez por minuto (el /chat las usa en
+# cada mensaje). Si dolarapi falla o su cortacircuitos está abierto, se sirve
+# la última cotización buena de hasta un día, marcada como desactualizada.
+QUOTES_FRESH_SECONDS = 60
+QUOTES_STALE_MAX_SECONDS = 24 * 60 * 60
+
+_quotes = TTLCache(maxsize=1, ttl=QUOTES_FRESH_SECONDS)
+_last_good = None  # (cotizaciones, time.monotonic() de cuando se obtuvieron)
+
+
+def _fetch_dolar_prices() -> dict:
+    # CORRECCIÓN: Se utiliza el cliente síncrono de httpx
+    with httpx.Client(timeout=5.0) as client:
+        with track_upstream("dolarapi", "dolares"):
+            response = client.get(DOLAR_API_URL)
+        response.raise_for_status()
+
+        data = response.json()
+
+        dolar_oficial = next((item for item in data if item.get('casa') == 'oficial'), None)
+        dolar_blue = next((item for item in data if item.get('casa') == 'blue'), None)
+
+        if not dolar_oficial or not dolar_blue:
+            raise HTTPException(status_code=503, detail="El servicio de cotizaciones no devolvió los datos esperados.")
+
+        return {
+            "oficial": {
+                "nombre": "Dólar Oficial",
+                "compra": dolar_oficial.get('compra'),
+                "venta": dolar_oficial.get('venta')
+            },
+            "blue": {
+                "nombre": "Dólar Blue",
+                "compra": dolar_blue.get('compra'),
+                "venta": dolar_blue.get('venta')
+            }
+        }
+
+
+def _stale_quotes():
+    if _last_good is None:
+        return None
+    quotes, fetched_at = _last_good
+    if time.monotonic() - fetched_at > QUOTES_STALE_MAX_SECONDS:
+        return None
+    return dict(quotes, desactualizado=True)
+
+
 @router.get("/dolar")
 def get_dolar_prices():
     """
     Obtiene las cotizaciones del dólar (oficial, blue, mep) desde una API externa.
     """
+    global _last_good
+    quotes = _quotes.get("dolar")
+    if quotes is not None:
+        return quotes
+
     try:
-        # CORRECCIÓN: Se utiliza el cliente síncrono de httpx
-        with httpx.Client(timeout=5.0) as client:
-            response = client.get(DOLAR_API_URL)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            dolar_oficial = next((item for item in data if item.get('casa') == 'oficial'), None)
-            dolar_blue = next((item for item in data if item.get('casa') == 'blue'), None)
-            
-            if not dolar_oficial or not dolar_blue:
-                raise HTTPException(status_code=503, detail="El servicio de cotizaciones no devolvió los datos esperados.")
-
-            return {
-                "oficial": {
-                    "nombre": "Dólar Oficial",
-                    "compra": dolar_oficial.get('compra'),
-                    "venta": dolar_oficial.get('venta')
-                },
-                "blue": {
-                    "nombre": "Dólar Blue",
-                    "compra": dolar_blue.get('compra'),
-                    "venta": dolar_blue.get('venta')
-                }
-            }
-            
-    # CORRECCIÓN: Se manejan los errores de timeout y de conexión de forma síncrona
-    except (ConnectTimeout, ReadTimeout):
-        raise HTTPException(status_code=503, detail="El servicio de cotizaciones tardó demasiado en responder.")
-    except httpx.RequestError as exc:
-        print(f"Error al llamar a la API de Dolar: {exc}")
-        raise HTTPException(status_code=503, detail="El servicio de cotizaciones no está disponible en este momento.")
+        with circuit.DOLARAPI.guard():
+            quotes = _fetch_dolar_prices()
     except Exception as e:
+        stale = _stale_quotes()
+        if stale is not None:
+            print(f"Cotizaciones no disponibles, se usa la última conocida: {e}")
+            return stale
+        if isinstance(e, HTTPException):
+            raise
+        if isinstance(e, circuit.CircuitOpen):
+            raise HTTPException(status_code=503, detail="El servicio de cotizaciones no está disponible en este momento.", headers={"Retry-After": str(max(1, int(e.retry_after)))})
+        # CORRECCIÓN: Se manejan los errores de timeout y de conexión de forma síncrona
+        if isinstance(e, (ConnectTimeout, ReadTimeout)):
+            raise HTTPException(status_code=503, detail="El servicio de cotizaciones tardó demasiado en responder.")
+        if isinstance(e, httpx.RequestError):
+            print(f"Error al llamar a la API de Dolar: {e}")
+            raise HTTPException(status_code=503, detail="El servicio de cotizaciones no está disponible en este momento.")
         print(f"Error inesperado al procesar los datos del dólar: {e}")
-        raise HTTPException(status_code=500, detail=f"Error interno: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error interno: {e}")
+
+    _quotes.set("dolar", quotes)
+    _last_good = (quotes, time.monotonic())
+    return quotes
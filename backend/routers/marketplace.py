@@ -1,15 +1,17 @@
 # En: backend/routers/marketplace.py
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import uuid
-import shutil
-import os
 from datetime import datetime
 
 from database import User, MarketplaceItem, Transaction, GameProfile
-from schemas import MarketplaceItemCreate, MarketplaceItemResponse, TransactionResponse
+from schemas import MarketplaceItemCreate, MarketplaceItemResponse, MarketplaceItemSearchResponse, TransactionResponse
 from dependencies import get_db, get_user_or_create
+from pagination import keyset_page
+import coins
+import search
+import images
 
 router = APIRouter(
     prefix="/market",
@@ -20,63 +22,149 @@ router = APIRouter(
 def create_marketplace_item(item: MarketplaceItemCreate = Depends(), file: UploadFile = File(None), db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
     """
     Crea un nuevo item en el marketplace.
-    Ahora maneja la subida de la imagen a una carpeta estática local.
+    La imagen (JPG, PNG o WebP) se guarda por su hash y las miniaturas WebP se
+    generan en segundo plano; la respuesta trae las URLs en `image_urls`.
     """
-    image_url = None
+    image_key = None
     if file and file.filename:
-        # Definimos una ruta segura para guardar el archivo
-        file_location = f"static/images/{user.email.split('@')[0]}_{datetime.utcnow().timestamp()}_{file.filename}"
-        
-        with open(file_location, "wb+") as file_object:
-            shutil.copyfileobj(file.file, file_object)
-        
-        # En producción, esta URL base debería venir de una variable de entorno
-        BASE_URL = os.environ.get("BACKEND_URL", "http://localhost:8000")
-        image_url = f"{BASE_URL}/{file_location}"
+        try:
+            image_key = images.receive_upload(file.file)
+        except images.ImageTooLarge as e:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+        except images.UnsupportedImage as e:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
 
     new_item_data = item.dict()
-    new_item_data['image_url'] = image_url
+    new_item_data['image_key'] = image_key
+    new_item_data['image_url'] = images.url_for(image_key) if image_key else None
     new_item = MarketplaceItem(**new_item_data, user_email=user.email)
     db.add(new_item)
     db.commit()
     db.refresh(new_item)
     return new_item
 
-@router.get("/items", response_model=List[MarketplaceItemResponse])
-def get_marketplace_items(skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
-    """Obtiene los items del marketplace que están disponibles."""
-    items = db.query(MarketplaceItem).filter(MarketplaceItem.status == 'available').order_by(MarketplaceItem.created_at.desc()).offset(skip).limit(limit).all()
+# Orden -> (columna, descendente, cómo leer el valor guardado en el cursor).
+# Cada uno tiene su índice compuesto en MarketplaceItem.
+ITEM_SORTS = {
+    "recent": (MarketplaceItem.created_at, True, datetime.fromisoformat),
+    "price_asc": (MarketplaceItem.price, False, float),
+    "price_desc": (MarketplaceItem.price, True, float),
+}
+
+def _item_filters(min_price: Optional[float], max_price: Optional[float], is_service: Optional[bool]) -> list:
+    filters = []
+    if min_price is not None:
+        filters.append(MarketplaceItem.price >= min_price)
+    if max_price is not None:
+        filters.append(MarketplaceItem.price <= max_price)
+    if is_service is not None:
+        filters.append(MarketplaceItem.is_service == is_service)
+    return filters
+
+def _items_page(query, sort: str, cursor: Optional[str], limit: int, response: Response, skip: int = 0) -> list:
+    column, descending, parse_value = ITEM_SORTS[sort]
+    items, next_cursor = keyset_page(query, column, MarketplaceItem.id, descending, cursor, limit, parse_value, skip=skip)
+    # La respuesta sigue siendo una lista; el cursor de la página siguiente va en un header.
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return items
 
+@router.get("/items", response_model=List[MarketplaceItemResponse])
+def get_marketplace_items(
+    response: Response,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    is_service: Optional[bool] = None,
+    seller: Optional[str] = Query(None, description="Email del vendedor"),
+    sort: str = Query("recent", enum=list(ITEM_SORTS)),
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True, description="Solo para clientes viejos; se ignora si hay cursor"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Obtiene los items del marketplace que están disponibles, con filtros y orden.
+    Si hay más resultados, el header `X-Next-Cursor` trae el cursor de la página siguiente.
+    """
+    query = db.query(MarketplaceItem).filter(MarketplaceItem.status == 'available', *_item_filters(min_price, max_price, is_service))
+    if seller:
+        query = query.filter(MarketplaceItem.user_email == seller)
+    return _items_page(query, sort, cursor, limit, response, skip=skip)
+
+@router.get("/my-items", response_model=List[MarketplaceItemResponse])
+def get_my_marketplace_items(
+    response: Response,
+    item_status: Optional[str] = Query(None, alias="status", enum=["available", "reserved", "sold"]),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_user_or_create)
+):
+    """Obtiene los items publicados por el usuario, en cualquier estado, del más nuevo al más viejo."""
+    query = db.query(MarketplaceItem).filter(MarketplaceItem.user_email == user.email)
+    if item_status:
+        query = query.filter(MarketplaceItem.status == item_status)
+    return _items_page(query, "recent", cursor, limit, response)
+
+@router.get("/search", response_model=MarketplaceItemSearchResponse)
+def search_marketplace_items(
+    q: str = Query(..., min_length=2, max_length=200),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    is_service: Optional[bool] = None,
+    item_status: str = Query("available", alias="status", enum=["available", "reserved", "sold"]),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca items del marketplace por nombre y descripción, ordenados por relevancia.
+    Para la página siguiente, enviá el `next_cursor` recibido.
+    """
+    filters = [MarketplaceItem.status == item_status] + _item_filters(min_price, max_price, is_service)
+    items, next_cursor = search.search(db, search.ITEMS, q, filters, cursor, limit)
+    return {"items": items, "next_cursor": next_cursor}
+
 @router.post("/items/{item_id}/buy", response_model=TransactionResponse)
 def buy_item(item_id: int, db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
     """
     Inicia la compra de un item (escrow).
     Verifica fondos, retiene las monedas, reserva el ítem y crea la transacción.
+    La fila del ítem se bloquea (FOR UPDATE) y tanto la reserva como el débito son
+    UPDATEs condicionales, así dos compradores simultáneos no pueden llevarse el mismo ítem.
     """
-    item = db.query(MarketplaceItem).filter(MarketplaceItem.id == item_id).first()
+    item = db.query(MarketplaceItem).filter(MarketplaceItem.id == item_id).with_for_update().first()
     if not item or item.status != 'available':
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ítem no disponible o ya fue reservado.")
 
     if item.user_email == user.email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No puedes comprar tu propio ítem.")
 
-    buyer_profile = db.query(GameProfile).filter(GameProfile.user_email == user.email).first()
-    if not buyer_profile or buyer_profile.resilient_coins < item.price:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes suficientes Monedas Resilientes para esta compra.")
+    cost = coins.coin_price(item.price)
+    reserved = db.query(MarketplaceItem).filter(
+        MarketplaceItem.id == item_id, MarketplaceItem.status == 'available'
+    ).update({MarketplaceItem.status: 'reserved'}, synchronize_session=False)
+    if reserved != 1:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ítem no disponible o ya fue reservado.")
 
-    # Lógica de Escrow
-    buyer_profile.resilient_coins -= item.price
-    item.status = 'reserved'
-    
     new_transaction = Transaction(
         item_id=item.id,
         seller_email=item.user_email,
         buyer_email=user.email,
-        amount=item.price,
+        amount=cost,
         confirmation_code=str(uuid.uuid4()) # Código único para el QR
     )
     db.add(new_transaction)
+    db.flush()
+
+    # Lógica de Escrow
+    try:
+        coins.apply(db, user.email, -cost, "escrow_hold", reference=f"transaction:{new_transaction.id}")
+    except coins.InsufficientFunds:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No tienes suficientes Monedas Resilientes para esta compra.")
+
     db.commit()
     db.refresh(new_transaction)
 
@@ -88,22 +176,27 @@ def confirm_transaction(transaction_id: int, db: Session = Depends(get_db), user
     Confirma una transacción (Apretón de Manos Digital).
     Libera las monedas al vendedor. Solo el vendedor puede ejecutar esta acción.
     """
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
-    
-    if not transaction or transaction.seller_email != user.email or transaction.status != 'pending':
+    # El cambio de estado es condicional: una doble confirmación no libera dos veces.
+    confirmed = db.query(Transaction).filter(
+        Transaction.id == transaction_id,
+        Transaction.seller_email == user.email,
+        Transaction.status == 'pending'
+    ).update({Transaction.status: 'completed'}, synchronize_session=False)
+    if confirmed != 1:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transacción no válida para confirmar.")
 
-    seller_profile = db.query(GameProfile).filter(GameProfile.user_email == user.email).first()
-    if not seller_profile:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil del vendedor no encontrado.")
+    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
 
     # Liberar fondos al vendedor
-    seller_profile.resilient_coins += transaction.amount
-    transaction.status = 'completed'
-    
-    item = db.query(MarketplaceItem).filter(MarketplaceItem.id == transaction.item_id).first()
-    if item:
-        item.status = 'sold'
+    try:
+        coins.apply(db, user.email, coins.coin_price(transaction.amount), "escrow_release", reference=f"transaction:{transaction.id}")
+    except coins.InsufficientFunds:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil del vendedor no encontrado.")
+
+    db.query(MarketplaceItem).filter(MarketplaceItem.id == transaction.item_id).update(
+        {MarketplaceItem.status: 'sold'}, synchronize_session=False
+    )
 
     db.commit()
     db.refresh(transaction)
@@ -0,0 +1,59 @@
+# En: backend/routers/media.py
+from fastapi import APIRouter, HTTPException, status, Header, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+import images
+import storage
+
+router = APIRouter(
+    prefix="/media",
+    tags=["Media"]
+)
+
+# Mientras se generan las miniaturas se sirve el original, pero con un cache
+# corto para que el cliente vuelva a pedir la variante cuando exista.
+FALLBACK_CACHE_CONTROL = "public, max-age=60"
+
+
+@router.get("/{key}")
+def get_media(
+    key: str,
+    range_header: Optional[str] = Header(None, alias="range"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Sirve un archivo subido. Las claves dependen del contenido, así que la
+    respuesta es inmutable; soporta pedidos parciales (`Range`).
+    """
+    if not images.KEY_PATTERN.match(key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Archivo no encontrado.")
+
+    store = storage.get_storage()
+    info = store.stat(key)
+    cache_control = storage.IMMUTABLE_CACHE_CONTROL
+    if info is None:
+        original = images.original_for_variant(key)
+        if original is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Archivo no encontrado.")
+        key, info, cache_control = original, store.stat(original), FALLBACK_CACHE_CONTROL
+
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": cache_control, "ETag": f'"{key}"'}
+    if if_none_match and headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        byte_range = storage.parse_range(range_header, info.size)
+    except storage.RangeNotSatisfiable:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{info.size}"}
+        )
+
+    if byte_range is None:
+        start, end, status_code = 0, info.size - 1, status.HTTP_200_OK
+    else:
+        (start, end), status_code = byte_range, status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(store.iter_bytes(key, start, end), status_code=status_code, media_type=info.content_type, headers=headers)
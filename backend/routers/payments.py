@@ -0,0 +1,37 @@
+# En: backend/routers/payments.py
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+
+from dependencies import get_db
+import payments
+
+router = APIRouter(
+    prefix="/payments",
+    tags=["Payments"]
+)
+
+@router.post("/webhooks/{provider}")
+async def receive_payment_webhook(
+    provider: str,
+    request: Request,
+    x_payment_signature: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Recibe un evento de una pasarela de pago. Solo verifica la firma y lo guarda;
+    se procesa en segundo plano. Un evento repetido responde "duplicate" sin efectos.
+    """
+    body = await request.body()
+    try:
+        outcome, event_pk = await run_in_threadpool(payments.ingest, db, provider, body, x_payment_signature)
+    except payments.UnknownProvider:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Proveedor de pagos desconocido.")
+    except payments.InvalidSignature as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+    except payments.InvalidPayload:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Evento mal formado.")
+    if event_pk is not None:
+        payments.enqueue(event_pk)
+    return {"status": outcome}
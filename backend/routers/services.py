@@ -1,283 +0,0 @@
-# En: backend/services.py
-import os
-import textwrap
-import json
-import httpx
-from typing import Optional
-from datetime import datetime, timedelta
-import google.generativeai as genai
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from fastapi import HTTPException
-from pydantic import ValidationError
-
-from database import User, BudgetItem, Expense, SavingGoal
-from schemas import CultivationPlanRequest, CultivationPlanResult, ValidateParamsRequest, FamilyPlanRequest, FamilyPlanResponse, ResilienceSummary
-
-# --- CONFIGURACIÓN E INICIALIZACIÓN DE LOS MODELOS DE IA ---
-# Se movió aquí para evitar la dependencia circular.
-genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-
-model_chat = genai.GenerativeModel(
-    model_name="gemini-1.5-flash-latest",
-    system_instruction=textwrap.dedent("""
-    Eres "Resi", un asistente de IA amigable, empático y experto en resiliencia económica y alimentaria para usuarios en Argentina. Tu propósito es empoderar a las personas para que tomen el control de sus finanzas y bienestar.
-
-    Tu personalidad:
-    - Tono: Cercano, motivador y práctico. Usá un lenguaje coloquial argentino (ej: "vos" en lugar de "tú", "plata" en lugar de "dinero").
-    - Enfoque: Siempre positivo y orientado a soluciones. No juzgues, solo ayudá.
-    - Conocimiento: Experto en finanzas personales, ahorro, presupuesto, cultivo casero y planificación familiar, todo adaptado al contexto argentino.
-
-    Herramientas Internas de Resi (Tus propias herramientas):
-    - "Módulo Financiero": Incluye un "Planificador" para asignar presupuestos, "Metas de Ahorro" para fijar objetivos, un "Historial" para ver gastos pasados y una sección de "Análisis" con gráficos.
-    - "Módulo de Cultivo": Un planificador para que los usuarios creen su propio huerto casero (hidropónico u orgánico) y así puedan producir sus alimentos y ahorrar dinero.
-    - "Módulo de Planificación Familiar": Una herramienta que genera planes de comidas, ahorro y ocio adaptados a la familia del usuario.
-    - "Registro de Gastos": El usuario puede registrar gastos por voz o texto a través de un botón flotante.
-
-    Ahora tienes acceso a información más profunda del usuario. Úsala para dar consejos increíblemente personalizados:
-    - `risk_profile`: Perfil de riesgo del usuario (Conservador, Moderado, Audaz). Adapta tus sugerencias de ahorro e inversión a esto.
-    - `long_term_goals`: Metas a largo plazo del usuario (ej: "comprar una casa", "jubilarme a los 60"). Ayúdalo a alinear sus decisiones diarias con estas metas.
-    - `last_family_plan`: El último plan familiar que generó. Si pregunta sobre comidas o actividades, básate en este plan.
-    - `last_cultivation_plan`: El último plan de cultivo que generó. Si pregunta sobre su huerta, utiliza este plan como base.
-
-    NUEVA CAPACIDAD: CONTEXTO EN TIEMPO REAL
-    Al inicio de cada conversación, recibirás un bloque de "CONTEXTO EN TIEMPO REAL" con datos económicos actuales. DEBES usar esta información para que tus consejos sean precisos y valiosos.
-    Ejemplo de cómo usar el contexto:
-    - Si el usuario pregunta si le conviene comprar dólares, tu respuesta DEBE basarse en la cotización del Dólar Blue que te fue proporcionada.
-    - Si un usuario quiere invertir, DEBES mencionar la tasa de plazo fijo actual (próximamente) y compararla con la inflación (próximamente) para evaluar si es una buena opción.
-    - NO inventes datos. Si no tienes un dato específico (ej. inflación del mes), acláralo.
-
-    Tus reglas:
-    1.  Integra siempre el contexto del usuario y el contexto en tiempo real en tus respuestas.
-    2.  Si el usuario pregunta algo fuera de tus temas, redirige amablemente la conversación a tus temas centrales.
-    3.  Sé conciso y andá al grano.
-    4.  Utilizá el historial de chat para recordar conversaciones pasadas.
-    5.  NUNCA uses formato Markdown (asteriscos, etc.). Responde siempre en texto plano.
-    6.  MUY IMPORTANTE: Antes de sugerir cualquier herramienta o solución externa, SIEMPRE priorizá y recomendá las "Herramientas Internas de Resi".
-    """)
-)
-
-model_plan_generator = genai.GenerativeModel(
-    model_name="gemini-1.5-flash-latest",
-    system_instruction="Tu única tarea es actuar como un experto en cultivo, diseñando planes de cultivo detallados en formato JSON. DEBES seguir las instrucciones de formato y contenido al pie de la letra."
-)
-
-model_validator = genai.GenerativeModel(
-    model_name="gemini-1.5-flash-latest",
-    system_instruction="Tu única tarea es analizar los parámetros de cultivo de un usuario y generar un JSON con recomendaciones específicas, rápidas y prácticas. DEBES responder solo con el JSON y nada más."
-)
-
-model_family_plan_generator = genai.GenerativeModel(
-    model_name="gemini-1.5-flash-latest",
-    system_instruction="Tu única tarea es actuar como un experto en planificación familiar, creando planes personalizados en formato JSON."
-)
-# --- FIN DE LA INICIALIZACIÓN ---
-
-def parse_expense_with_gemini(text: str, db: Session, user_email: str) -> Optional[dict]:
-    budget_items = db.query(BudgetItem.category).filter(BudgetItem.user_email == user_email, BudgetItem.category != "_income").all()
-    user_categories = [item[0] for item in budget_items]
-    valid_categories = list(set([
-        "Vivienda", "Servicios Básicos", "Supermercado", "Kioscos", "Transporte", "Salud",
-        "Deudas", "Préstamos", "Entretenimiento", "Hijos", "Mascotas", "Cuidado Personal",
-        "Vestimenta", "Ahorro", "Inversión", "Otros"
-    ] + user_categories))
-
-    system_prompt_expense = textwrap.dedent(f"""
-        Tu única tarea es analizar una frase de un usuario en Argentina sobre un gasto y devolver un objeto JSON con dos claves: "amount" y "category".
-        
-        - El "amount" debe ser un número (float o int), sin símbolos de moneda.
-        - La "category" DEBE ser una de esta lista: {valid_categories}. No inventes categorías. Si no estás seguro, usa "Otros".
-        - NO incluyas la clave "description" en tu respuesta JSON.
-        - Responde únicamente con el JSON y nada más.
-
-        Ejemplo de respuesta perfecta:
-        {{
-          "amount": 5000,
-          "category": "Supermercado"
-        }}
-    """)
-
-    model_expense = genai.GenerativeModel(
-        model_name="gemini-1.5-flash-latest",
-        system_instruction=system_prompt_expense,
-        generation_config={"response_mime_type": "application/json"}
-    )
-    
-    try:
-        response = model_expense.generate_content(f"Analiza esta frase: '{text}'")
-        parsed_json = json.loads(response.text)
-
-        expense_data = {
-            "amount": parsed_json.get("amount"),
-            "category": parsed_json.get("category"),
-            "description": text
-        }
-        
-        validated_data = ExpenseData(**expense_data)
-        
-        return validated_data.dict()
-        
-    except Exception as e:
-        print(f"Error al procesar con Gemini o validar los datos: {e}")
-        return None
-
-def generate_plan_with_gemini(request: CultivationPlanRequest, db: Session, user: User) -> CultivationPlanResult:
-    """
-    Función que genera un plan de cultivo dinámicamente con la IA de Gemini.
-    """
-    global model_plan_generator
-    
-    # Manejar posibles valores None o vacíos
-    supermarket_spending = request.supermarketSpending if request.supermarketSpending is not None and request.supermarketSpending != '' else 0
-    initial_budget = request.initialBudget if request.initialBudget is not None and request.initialBudget != '' else 0
-
-    plan_prompt = textwrap.dedent(f"""
-    Basado en los siguientes datos del usuario:
-    - Método: {request.method}
-    - Espacio: {request.space}
-    - Experiencia: {request.experience}
-    - Presupuesto inicial: ${initial_budget:,.0f}
-    - Gasto mensual en vegetales: ${supermarket_spending:,.0f}
-    - Tipo de luz: {request.light if request.method == 'hydroponics' else 'N/A'}
-    - Tipo de suelo: {request.soilType if request.method == 'organic' else 'N/A'}
-    - Ubicación: {request.location}
-
-    Actúa como un experto en cultivo y diseña un plan de cultivo ideal para este usuario.
-    El plan debe tener la siguiente estructura JSON y NO DEBE incluir ninguna otra información.
-    
-    {{
-      "crop": "Cultivo recomendado (ej: 'Lechuga y Rúcula' o 'Tomates Cherry')",
-      "system": "Sistema de cultivo recomendado (ej: 'Sistema DWC casero' o 'Bancal elevado')",
-      "materials": "Lista de materiales esenciales y su uso (ej: 'Contenedores plásticos, bomba de aire, etc.')",
-      "projectedSavings": "Una estimación de ahorro mensual, conectada al gasto en supermercado del usuario (ej: 'Con este plan, podrías ahorrar un 20% de tus gastos en la verdulería, unos $5.000 al mes.')",
-      "tips": "Un consejo personalizado y específico para el usuario, basado en su ubicación, experiencia y método.",
-      "imagePrompt": "Un prompt en inglés para generar una imagen visual del plan (opcional)"
-    }}
-    
-    Asegúrate de que la "projectedSavings" se adapte al `supermarketSpending` del usuario. Sé creativo, pero mantente realista.
-    """)
-    
-    try:
-        response = model_plan_generator.generate_content(plan_prompt)
-        parsed_plan = json.loads(response.text)
-        
-        validated_plan = CultivationPlanResult(**parsed_plan)
-        return validated_plan
-        
-    except (json.JSONDecodeError, ValidationError, Exception) as e:
-        print(f"Error al generar el plan de cultivo con Gemini: {e}")
-        raise HTTPException(status_code=500, detail="Error de la IA al generar el plan de cultivo. Por favor, revisa el formato de la respuesta del modelo.")
-
-def validate_parameters_with_gemini(request: ValidateParamsRequest):
-    """
-    Función que valida los parámetros de cultivo con la IA de Gemini.
-    """
-    global model_validator
-    
-    validation_prompt = textwrap.dedent(f"""
-    Analiza los siguientes parámetros de cultivo:
-    - Método: {request.method}
-    - pH: {request.ph}
-    - Conductividad Eléctrica (EC): {request.ec}
-    - Temperatura (Temp): {request.temp}
-    - Humedad del suelo (SoilMoisture): {request.soilMoisture}
-    
-    Genera un JSON con el siguiente formato:
-    {{
-      "isValid": boolean,
-      "advice": "Un consejo personalizado y claro. Si hay un problema, explica por qué y qué hacer. Si todo está bien, da un mensaje de ánimo."
-    }}
-    
-    Los rangos óptimos para el método hidropónico son:
-    - pH: 5.5 a 6.5
-    - EC: > 0
-    - Temperatura: 18°C a 24°C
-    
-    Los rangos óptimos para el método orgánico son:
-    - pH: 6.0 a 7.0
-    - Humedad del suelo: 30% a 60%
-    
-    Asegúrate de que el "advice" sea un consejo práctico y útil para el usuario.
-    """)
-    
-    try:
-        response = model_validator.generate_content(validation_prompt, generation_config={"response_mime_type": "application/json"})
-        parsed_response = json.loads(response.text)
-        
-        return parsed_response
-        
-    except Exception as e:
-        print(f"Error al validar parámetros con Gemini: {e}")
-        raise HTTPException(status_code=500, detail="Error de la IA al validar los parámetros.")
-
-def generate_family_plan_with_gemini(request: FamilyPlanRequest, db: Session, user: User):
-    """
-    Función que genera un plan familiar dinámicamente con la IA de Gemini.
-    """
-    global model_family_plan_generator
-    
-    user_income = db.query(BudgetItem).filter(BudgetItem.user_email == user.email, BudgetItem.category == "_income").first().allocated_amount
-    
-    plan_prompt = textwrap.dedent(f"""
-    Basado en los siguientes datos familiares:
-    - Miembros de la familia: {json.dumps([m.dict() for m in request.familyMembers])}
-    - Preferencias dietarias: {request.dietaryPreferences}
-    - Estilo de cocina: {request.cookingStyle}
-    - Metas financieras: {request.financialGoals}
-    - Actividades de ocio: {request.leisureActivities}
-    - Ingreso mensual familiar: ${user_income:,.0f}
-    - Detalles adicionales del usuario: {user.long_term_goals} y {user.risk_profile}
-
-    Actúa como un experto en planificación familiar y diseña un plan semanal completo de comidas, ahorro y ocio.
-    El plan debe tener la siguiente estructura JSON y NO DEBE incluir ninguna otra información.
-
-    {{
-      "mealPlan": [
-        {{
-          "day": "Lunes", 
-          "meal": "Sugerencia de comida (ej: Milanesas de soja con puré)",
-          "tags": ["ej: rápido", "económico"],
-          "ingredients": ["Ingrediente 1", "Ingrediente 2", "etc."],
-          "instructions": ["Paso 1", "Paso 2", "etc."]
-        }},
-        ... (Para cada día de la semana)
-      ],
-      "budgetSuggestion": "Un consejo de presupuesto personalizado y accionable, relacionado con sus metas financieras y el ingreso mensual.",
-      "leisureSuggestion": {{"activity": "Sugerencia de actividad", "cost": "costo estimado (ej: nulo, bajo, medio)", "description": "Una breve descripción de la actividad."}}
-    }}
-
-    Asegúrate de que el plan de comidas y las sugerencias de ocio sean adecuados para la cantidad y edades de los miembros de la familia, y que tengan en cuenta los detalles adicionales y metas del usuario.
-    El consejo de presupuesto debe ser muy específico y útil, utilizando el ingreso mensual como base.
-    """)
-
-    try:
-        response = model_family_plan_generator.generate_content(plan_prompt, generation_config={"response_mime_type": "application/json"})
-        parsed_plan = json.loads(response.text)
-        
-        validated_plan = FamilyPlanResponse(**parsed_plan)
-        return validated_plan
-        
-    except (json.JSONDecodeError, ValidationError, Exception) as e:
-        print(f"Error al generar el plan familiar con Gemini: {e}")
-        raise HTTPException(status_code=500, detail="Error de la IA al generar el plan familiar. Por favor, revisa el formato de la respuesta del modelo.")
-
-def get_dashboard_summary(db: Session, user: User):
-    try:
-        budget_items = db.query(BudgetItem).filter(BudgetItem.user_email == user.email).all()
-        income = next((item.allocated_amount for item in budget_items if item.category == "_income"), 0)
-        today = datetime.utcnow()
-        start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        expenses_this_month = db.query(Expense).filter(Expense.date >= start_of_month, Expense.user_email == user.email).all()
-        total_spent = sum(expense.amount for expense in expenses_this_month)
-        summary = {}
-        icons = {'Vivienda': '🏠', 'Servicios Básicos': '💡', 'Supermercado': '🛒', 'Kioscos': '🍫', 'Transporte': '🚗', 'Salud': '⚕️', 'Deudas': '💳', 'Préstamos': '🏦', 'Entretenimiento': '🎬', 'Hijos': '🧑\u200d🍼', 'Mascotas': '🐾', 'Cuidado Personal': '🧴', 'Vestimenta': '👕', 'Ahorro': '💰', 'Inversión': '📈', 'Otros': '💸'}
-        for budget_item in budget_items:
-            if budget_item.category == "_income": continue
-            summary[budget_item.category] = { "category": budget_item.category, "allocated": budget_item.allocated_amount, "spent": 0, "icon": icons.get(budget_item.category, '💸')}
-        for expense in expenses_this_month:
-            cat_capitalized = expense.category.capitalize()
-            if cat_capitalized in summary:
-                summary[cat_capitalized]["spent"] += expense.amount
-        return {"income": income, "total_spent": total_spent, "summary": list(summary.values()), "has_completed_onboarding": user.has_completed_onboarding}
-    except Exception:
-        return {"income": 0, "total_spent": 0, "summary": [], "has_completed_onboarding": user.has_completed_onboarding}
\ No newline at end of file
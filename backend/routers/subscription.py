@@ -1,9 +1,21 @@
+import os
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
 
-from database import User, Subscription
+from database import User
 from dependencies import get_db, get_user_or_create
+import coins
+import entitlements
+import payments
+
+# Estos endpoints simulan un pago confirmado desde el cliente. Con una pasarela
+# real los pagos entran por /payments/webhooks/{proveedor}; en producción
+# conviene apagarlos con PAYMENTS_ALLOW_SIMULATED=0.
+ALLOW_SIMULATED_PAYMENTS = os.environ.get("PAYMENTS_ALLOW_SIMULATED", "1") == "1"
+
+def _require_simulated_payments():
+    if not ALLOW_SIMULATED_PAYMENTS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Los pagos se confirman solo desde la pasarela.")
 
 router = APIRouter(
     prefix="/subscriptions",
@@ -14,25 +26,15 @@ router = APIRouter(
 def upgrade_to_premium(db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
     """
     Actualiza el estado de un usuario a Premium.
-    En un caso real, esto sería llamado por un webhook de una pasarela de pago.
+    Con una pasarela real, lo mismo lo hace el webhook (evento "subscription.activated").
     """
-    if user.is_premium:
+    _require_simulated_payments()
+    if entitlements.get(db, user.email).is_premium:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El usuario ya es Premium.")
 
-    user.is_premium = True
-    
-    # Crear o actualizar el registro de suscripción
-    subscription = db.query(Subscription).filter(Subscription.user_email == user.email).first()
-    if not subscription:
-        subscription = Subscription(user_email=user.email)
-        db.add(subscription)
-    
-    subscription.plan_name = "Premium"
-    subscription.start_date = datetime.utcnow()
-    subscription.end_date = datetime.utcnow() + timedelta(days=30) # Suscripción de 30 días
-    subscription.payment_id = "simulated_payment_id_premium" # Placeholder
-
+    payments.grant_premium(db, user.email, days=30, payment_id="simulated_payment_id_premium")
     db.commit()
+    entitlements.invalidate(user.email)
     
     return {"status": "success", "message": "¡Felicitaciones! Ahora eres un miembro Premium."}
 
@@ -40,13 +42,16 @@ def upgrade_to_premium(db: Session = Depends(get_db), user: User = Depends(get_u
 def buy_coins(amount: int, db: Session = Depends(get_db), user: User = Depends(get_user_or_create)):
     """
     Añade monedas resilientes a la cuenta del usuario.
-    En un caso real, esto sería llamado por un webhook de una pasarela de pago.
+    Con una pasarela real, lo mismo lo hace el webhook (evento "coins.purchased").
     """
-    profile = user.game_profile
-    if not profile:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil de juego no encontrado.")
+    _require_simulated_payments()
+    if amount <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La cantidad de monedas debe ser positiva.")
 
-    profile.resilient_coins += amount
+    try:
+        payments.grant_coins(db, user.email, amount, reference=None)
+    except coins.InsufficientFunds:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil de juego no encontrado.")
     db.commit()
     
     return {"status": "success", "message": f"Se han añadido {amount} Monedas Resilientes a tu billetera."}
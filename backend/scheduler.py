@@ -0,0 +1,60 @@
+# En: backend/scheduler.py
+import os
+import asyncio
+from typing import Callable, Dict
+
+from starlette.concurrency import run_in_threadpool
+
+# --- TAREAS PERIÓDICAS ---
+# Tareas de mantenimiento que corren dentro del proceso de la API. Cada instancia
+# corre las suyas, así que toda tarea registrada tiene que ser idempotente y
+# segura frente a ejecuciones concurrentes. En Cloud Run la CPU se limita fuera
+# de los requests: para garantizar la ejecución se puede llamar a cada tarea
+# desde Cloud Scheduler con `python scripts/run_job.py <nombre>`.
+
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "1") == "1"
+
+
+class Job:
+    def __init__(self, name: str, interval_seconds: float, func: Callable[[], object]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+
+
+JOBS: Dict[str, Job] = {}
+_tasks = []
+
+
+def register_job(name: str, interval_seconds: float):
+    """Decorador: registra una función sin argumentos como tarea periódica."""
+    def decorator(func):
+        JOBS[name] = Job(name, interval_seconds, func)
+        return func
+    return decorator
+
+
+def run_job(name: str):
+    return JOBS[name].func()
+
+
+async def _loop(job: Job):
+    while True:
+        await asyncio.sleep(job.interval_seconds)
+        try:
+            await run_in_threadpool(job.func)
+        except Exception as e:
+            print(f"Error en la tarea periódica '{job.name}': {e}")
+
+
+def start():
+    if not SCHEDULER_ENABLED or _tasks:
+        return
+    for job in JOBS.values():
+        _tasks.append(asyncio.create_task(_loop(job), name=f"job:{job.name}"))
+
+
+def stop():
+    for task in _tasks:
+        task.cancel()
+    _tasks.clear()
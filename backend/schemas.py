@@ -1,8 +1,10 @@
 # En: backend/schemas.py
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, computed_field
+from typing import Dict, List, Optional
 from datetime import datetime
 
+import image_keys
+
 class TextInput(BaseModel): text: str
 class BudgetItemInput(BaseModel): category: str; allocated_amount: float; is_custom: bool
 class BudgetInput(BaseModel): income: float; items: List[BudgetItemInput]
@@ -24,6 +26,8 @@ class AIChatInput(BaseModel): question: str
 class ValidateParamsRequest(BaseModel):
     method: str; ph: Optional[float] = None; ec: Optional[float] = None
     temp: Optional[float] = None; soilMoisture: Optional[float] = None
+class ValidateParamsResult(BaseModel):
+    isValid: bool; advice: str
 class ResilienceSummary(BaseModel):
     title: str; message: str; suggestion: str; supermarket_spending: float
     class Config:
@@ -96,6 +100,18 @@ class GameProfileResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class LeaderboardEntry(BaseModel):
+    rank: int
+    display_name: str
+    score: int
+    is_me: bool = False
+
+class LeaderboardResponse(BaseModel):
+    board: str
+    total_players: int
+    top: List[LeaderboardEntry]
+    me: Optional[LeaderboardEntry] = None
+
 # --- Schemas de Cultivo ---
 class CultivationPlanResult(BaseModel):
     crop: str
@@ -156,6 +172,10 @@ class CommunityPostResponse(CommunityPostBase):
     class Config:
         from_attributes = True
 
+class CommunityPostSearchResponse(BaseModel):
+    items: List[CommunityPostResponse]
+    next_cursor: Optional[str] = None
+
 class CommunityEventBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -164,14 +184,21 @@ class CommunityEventBase(BaseModel):
     event_date: datetime
 
 class CommunityEventCreate(CommunityEventBase):
-    pass
+    # Opcionales: si no vienen, se ubica el evento a partir de `location`.
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 class CommunityEventResponse(CommunityEventBase):
     id: int
     user_email: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     class Config:
         from_attributes = True
 
+class CommunityEventNearbyResponse(CommunityEventResponse):
+    distance_km: float
+
 class MarketplaceItemBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -186,9 +213,20 @@ class MarketplaceItemResponse(MarketplaceItemBase):
     id: int
     user_email: str
     status: str
+    image_key: Optional[str] = Field(None, exclude=True)
     class Config:
         from_attributes = True
 
+    @computed_field
+    @property
+    def image_urls(self) -> Optional[Dict[str, str]]:
+        """Original y miniaturas WebP (las miniaturas pueden tardar unos segundos en existir)."""
+        return image_keys.urls_for(self.image_key)
+
+class MarketplaceItemSearchResponse(BaseModel):
+    items: List[MarketplaceItemResponse]
+    next_cursor: Optional[str] = None
+
 class TransactionResponse(BaseModel):
     id: int
     item_id: int
@@ -201,4 +239,13 @@ class TransactionResponse(BaseModel):
     class Config:
         from_attributes = True
 
-        
\ No newline at end of file
+        
+class LLMUsageRow(BaseModel):
+    key: str
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    retries: int
+    errors: int
+    avg_latency_ms: float
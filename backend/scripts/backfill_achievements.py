@@ -0,0 +1,35 @@
+# En: backend/scripts/backfill_achievements.py
+"""
+Recalcula los contadores de eventos y el progreso de logros de todos los usuarios.
+
+Es una migración para correr una sola vez: al instalar el motor de logros o
+después de agregar o cambiar una regla en el catálogo (las reglas nuevas no
+tienen contadores hasta entonces). Borra y reescribe todos los contadores, así
+que hay que correrlo sin tráfico: los eventos que lleguen mientras corre se
+pierden. Los meses cerrados bajo presupuesto no necesitan este script: los
+registra la tarea periódica "close_month" (ver jobs.py).
+
+Uso (desde backend/):
+    python scripts/backfill_achievements.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal, create_db_and_tables
+import achievements
+
+
+def main():
+    create_db_and_tables()
+    db = SessionLocal()
+    try:
+        result = achievements.backfill(db)
+    finally:
+        db.close()
+    print(f"Contadores recalculados: {result['counters']} | usuarios con progreso: {result['users']} | logros desbloqueados: {result['unlocked']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# En: backend/scripts/bench_prompts.py
+"""
+Compara el tamaño de los prompts de los generadores antes y después de
+compactarlos (instrucción de sistema + response_schema, ver prompts.py).
+
+- caracteres: del prompt de cada pedido y de la instrucción de sistema.
+- tokens: con GEMINI_API_KEY, `count_tokens` de la instrucción de sistema más el prompt.
+- armado: cuánto tarda construir el prompt (dedent + f-string vs. plantilla ya preparada).
+- con --live N: genera N respuestas por variante y toma los tokens de entrada
+  facturados (usage_metadata, que sí incluye el response_schema) y la latencia.
+
+Uso (desde backend/):
+    python scripts/bench_prompts.py
+    python scripts/bench_prompts.py --live 3
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import statistics
+import textwrap
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemas import CultivationPlanRequest, ValidateParamsRequest, FamilyPlanRequest, FamilyMember
+import prompts
+from clients import GEMINI_MODEL_NAME
+
+SAMPLE_USER = SimpleNamespace(long_term_goals="comprar una casa", risk_profile="Moderado")
+SAMPLE_INCOME = 850000
+SAMPLE_PLAN = CultivationPlanRequest(
+    method="hydroponics", space="balcón", experience="principiante", light="natural",
+    location="Rosario, Santa Fe", initialBudget=60000, supermarketSpending=45000
+)
+SAMPLE_VALIDATION = ValidateParamsRequest(method="hydroponics", ph=7.1, ec=1.2, temp=26)
+SAMPLE_FAMILY = FamilyPlanRequest(
+    familyMembers=[FamilyMember(age="38", role="madre"), FamilyMember(age="40", role="padre"), FamilyMember(age="7", role="hijo")],
+    dietaryPreferences=["sin TACC"], cookingStyle="rápido", leisureActivities=["aire libre"],
+    financialGoals="ahorrar para las vacaciones"
+)
+
+
+# --- PROMPTS ANTERIORES (copia textual de dependencies.py antes de la compactación) ---
+
+LEGACY_SYSTEM_INSTRUCTIONS = {
+    "plan_generator": "Tu única tarea es actuar como un experto en cultivo, diseñando planes de cultivo detallados en formato JSON. DEBES seguir las instrucciones de formato y contenido al pie de la letra.",
+    "validator": "Tu única tarea es analizar los parámetros de cultivo de un usuario y generar un JSON con recomendaciones específicas, rápidas y prácticas. DEBES responder solo con el JSON y nada más.",
+    "family_plan_generator": "Tu única tarea es actuar como un experto en planificación familiar, creando planes personalizados en formato JSON.",
+}
+
+
+def legacy_cultivation_plan(request):
+    supermarket_spending = request.supermarketSpending if request.supermarketSpending is not None and request.supermarketSpending != '' else 0
+    initial_budget = request.initialBudget if request.initialBudget is not None and request.initialBudget != '' else 0
+
+    return textwrap.dedent(f"""
+    Basado en los siguientes datos del usuario:
+    - Método: {request.method}
+    - Espacio: {request.space}
+    - Experiencia: {request.experience}
+    - Presupuesto inicial: ${initial_budget:,.0f}
+    - Gasto mensual en vegetales: ${supermarket_spending:,.0f}
+    - Tipo de luz: {request.light if request.method == 'hydroponics' else 'N/A'}
+    - Tipo de suelo: {request.soilType if request.method == 'organic' else 'N/A'}
+    - Ubicación: {request.location}
+
+    Actúa como un experto en cultivo y diseña un plan de cultivo ideal para este usuario.
+    El plan debe tener la siguiente estructura JSON y NO DEBE incluir ninguna otra información.
+    
+    {{
+      "crop": "Cultivo recomendado (ej: 'Lechuga y Rúcula' o 'Tomates Cherry')",
+      "system": "Sistema de cultivo recomendado (ej: 'Sistema DWC casero' o 'Bancal elevado')",
+      "materials": "Lista de materiales esenciales y su uso (ej: 'Contenedores plásticos, bomba de aire, etc.')",
+      "projectedSavings": "Una estimación de ahorro mensual, conectada al gasto en supermercado del usuario (ej: 'Con este plan, podrías ahorrar un 20% de tus gastos en la verdulería, unos $5.000 al mes.')",
+      "tips": "Un consejo personalizado y específico para el usuario, basado en su ubicación, experiencia y método.",
+      "imagePrompt": "Un prompt en inglés para generar una imagen visual del plan (opcional)"
+    }}
+    
+    Asegúrate de que la "projectedSavings" se adapte al `supermarketSpending` del usuario. Sé creativo, pero mantente realista.
+    """)
+
+
+def legacy_validate_parameters(request):
+    return textwrap.dedent(f"""
+    Analiza los siguientes parámetros de cultivo:
+    - Método: {request.method}
+    - pH: {request.ph}
+    - Conductividad Eléctrica (EC): {request.ec}
+    - Temperatura (Temp): {request.temp}
+    - Humedad del suelo (SoilMoisture): {request.soilMoisture}
+    
+    Genera un JSON con el siguiente formato:
+    {{
+      "isValid": boolean,
+      "advice": "Un consejo personalizado y claro. Si hay un problema, explica por qué y qué hacer. Si todo está bien, da un mensaje de ánimo."
+    }}
+    
+    Los rangos óptimos para el método hidropónico son:
+    - pH: 5.5 a 6.5
+    - EC: > 0
+    - Temperatura: 18°C a 24°C
+    
+    Los rangos óptimos para el método orgánico son:
+    - pH: 6.0 a 7.0
+    - Humedad del suelo: 30% a 60%
+    
+    Asegúrate de que el "advice" sea un consejo práctico y útil para el usuario.
+    """)
+
+
+def legacy_family_plan(request, user_income, user):
+    return textwrap.dedent(f"""
+    Basado en los siguientes datos familiares:
+    - Miembros de la familia: {json.dumps([m.dict() for m in request.familyMembers])}
+    - Preferencias dietarias: {request.dietaryPreferences}
+    - Estilo de cocina: {request.cookingStyle}
+    - Metas financieras: {request.financialGoals}
+    - Actividades de ocio: {request.leisureActivities}
+    - Ingreso mensual familiar: ${user_income:,.0f}
+    - Detalles adicionales del usuario: {user.long_term_goals} y {user.risk_profile}
+
+    Actúa como un experto en planificación familiar y diseña un plan semanal completo de comidas, ahorro y ocio.
+    El plan debe tener la siguiente estructura JSON y NO DEBE incluir ninguna otra información.
+    
+    {{
+      "mealPlan": [
+        {{
+          "day": "Lunes", 
+          "meal": "Sugerencia de comida (ej: Milanesas de soja con puré)",
+          "tags": ["ej: rápido", "económico"],
+          "ingredients": [
+            "Medida y nombre de ingrediente 1", 
+            "Medida y nombre de ingrediente 2", 
+            "etc."
+          ],
+          "instructions": [
+            "Paso 1: Instrucción detallada para la preparación", 
+            "Paso 2: Instrucción detallada para la preparación", 
+            "etc."
+          ]
+        }},
+        {{
+          "day": "Martes", 
+          "meal": "Sugerencia de comida (ej: Ensalada de lentejas y arroz)",
+          "tags": ["ej: saludable", "rápido"],
+          "ingredients": [
+            "1 taza de lentejas cocidas",
+            "1/2 taza de arroz integral",
+            "1 tomate picado",
+            "1/2 cebolla morada en juliana",
+            "Hojas de espinaca fresca",
+            "Aderezo: aceite de oliva, jugo de limón, sal y pimienta"
+          ],
+          "instructions": [
+            "Paso 1: En un bowl grande, mezclar las lentejas, el arroz, el tomate y la cebolla.",
+            "Paso 2: Añadir las hojas de espinaca y el aderezo.",
+            "Paso 3: Mezclar bien y servir fría."
+          ]
+        }},
+        {{
+          "day": "Miércoles", 
+          "meal": "Sugerencia de comida (ej: Salteado de pollo y verduras)",
+          "tags": ["ej: proteico", "versátil"],
+          "ingredients": [
+            "2 pechugas de pollo en tiras",
+            "1 pimiento rojo en tiras",
+            "1 cebolla en juliana",
+            "1 calabacín en tiras",
+            "Aceite de girasol",
+            "Salsa de soja y jengibre"
+          ],
+          "instructions": [
+            "Paso 1: Calentar aceite en un wok. Saltear el pollo hasta que esté dorado.",
+            "Paso 2: Agregar las verduras y saltear por unos minutos hasta que estén tiernas pero crujientes.",
+            "Paso 3: Incorporar la salsa de soja y el jengibre. Cocinar por un minuto más y servir."
+          ]
+        }},
+        {{
+          "day": "Jueves", 
+          "meal": "Sugerencia de comida (ej: Tarta de acelga y queso)",
+          "tags": ["ej: clásico", "casero"],
+          "ingredients": [
+            "1 tapa de masa para tarta",
+            "1 atado de acelga hervida y escurrida",
+            "200g de queso cremoso",
+            "2 huevos",
+            "1 cebolla picada",
+            "Nuez moscada, sal y pimienta"
+          ],
+          "instructions": [
+            "Paso 1: Sofreír la cebolla, agregar la acelga y condimentar.",
+            "Paso 2: Batir los huevos y mezclarlos con la acelga, el queso en cubos y la nuez moscada.",
+            "Paso 3: Rellenar la tarta y hornear a 180°C por 30 minutos o hasta que esté dorada."
+          ]
+        }},
+        {{
+          "day": "Viernes", 
+          "meal": "Sugerencia de comida (ej: Empanadas de carne y papa)",
+          "tags": ["ej: fin de semana", "económico"],
+          "ingredients": [
+            "12 tapas de empanada",
+            "300g de carne picada",
+            "2 papas medianas hervidas",
+            "1 cebolla picada",
+            "Condimentos al gusto"
+          ],
+          "instructions": [
+            "Paso 1: Rehogar la cebolla, agregar la carne y cocinar.",
+            "Paso 2: Incorporar las papas pisadas y los condimentos. Dejar enfriar.",
+            "Paso 3: Rellenar las tapas de empanada, cerrar y hornear a 200°C por 15-20 minutos."
+          ]
+        }}
+        ... (y así para cada día de la semana)
+      ],
+      "budgetSuggestion": "Un consejo de presupuesto personalizado y accionable, relacionado con sus metas financieras y el ingreso mensual.",
+      "leisureSuggestion": {{"activity": "Sugerencia de actividad", "cost": "costo estimado (ej: nulo, bajo, medio)", "description": "Una breve descripción de la actividad."}}
+    }}
+
+    Asegúrate de que el plan de comidas y las sugerencias de ocio sean adecuados para la cantidad y edades de los miembros de la familia, y que tengan en cuenta los detalles adicionales y metas del usuario.
+    El consejo de presupuesto debe ser muy específico y útil, utilizando el ingreso mensual como base.
+    """)
+
+
+# --- VARIANTES ---
+
+VARIANTS = {
+    "plan_generator": {
+        "antes": (LEGACY_SYSTEM_INSTRUCTIONS["plan_generator"], {"response_mime_type": "application/json"}, lambda: legacy_cultivation_plan(SAMPLE_PLAN)),
+        "después": (prompts.PLAN_SYSTEM_INSTRUCTION, prompts.PLAN_OUTPUT, lambda: prompts.cultivation_plan(SAMPLE_PLAN)),
+    },
+    "validator": {
+        "antes": (LEGACY_SYSTEM_INSTRUCTIONS["validator"], {"response_mime_type": "application/json"}, lambda: legacy_validate_parameters(SAMPLE_VALIDATION)),
+        "después": (prompts.VALIDATOR_SYSTEM_INSTRUCTION, prompts.VALIDATOR_OUTPUT, lambda: prompts.validate_parameters(SAMPLE_VALIDATION)),
+    },
+    "family_plan_generator": {
+        "antes": (LEGACY_SYSTEM_INSTRUCTIONS["family_plan_generator"], {"response_mime_type": "application/json"}, lambda: legacy_family_plan(SAMPLE_FAMILY, SAMPLE_INCOME, SAMPLE_USER)),
+        "después": (prompts.FAMILY_PLAN_SYSTEM_INSTRUCTION, prompts.FAMILY_PLAN_OUTPUT, lambda: prompts.family_plan(SAMPLE_FAMILY, SAMPLE_INCOME, SAMPLE_USER)),
+    },
+}
+
+
+def build_us(build) -> float:
+    runs = 2000
+    return timeit.timeit(build, number=runs) / runs * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", type=int, default=0, help="Generaciones reales por variante (consume cuota).")
+    args = parser.parse_args()
+
+    genai = None
+    if os.environ.get("GEMINI_API_KEY"):
+        import google.generativeai as genai
+        genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    elif args.live:
+        parser.error("--live necesita GEMINI_API_KEY.")
+
+    for generator, variants in VARIANTS.items():
+        print(f"\n{generator}")
+        for label, (system_instruction, generation_config, build) in variants.items():
+            prompt = build()
+            schema_chars = len(json.dumps(generation_config.get("response_schema"), ensure_ascii=False)) if "response_schema" in generation_config else 0
+            line = (f"  {label:>8}: prompt {len(prompt):5d} car. | sistema {len(system_instruction):5d} car. | "
+                    f"schema {schema_chars:5d} car. | armado {build_us(build):6.1f} µs")
+            if genai is not None:
+                model = genai.GenerativeModel(model_name=GEMINI_MODEL_NAME, system_instruction=system_instruction, generation_config=generation_config)
+                line += f" | count_tokens {model.count_tokens(prompt).total_tokens:5d}"
+                if args.live:
+                    input_tokens, latencies = [], []
+                    for _ in range(args.live):
+                        started = time.perf_counter()
+                        response = model.generate_content(prompt)
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        input_tokens.append(response.usage_metadata.prompt_token_count)
+                    line += f" | facturados {statistics.median(input_tokens):7.0f} | latencia {statistics.median(latencies):7.0f} ms"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
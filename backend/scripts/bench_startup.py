@@ -0,0 +1,69 @@
+# En: backend/scripts/bench_startup.py
+"""
+Mide el costo de un arranque en frío de la API.
+
+Cada medición corre en un intérprete nuevo para que no haya módulos en caché:
+- import: cuánto tarda `import main`.
+- primer pedido: cuánto tarda el primer GET / (incluye el startup de FastAPI).
+- warmup: cuánto tarda POST /warmup en crear los clientes de IA y de voz.
+
+Uso (desde backend/):
+    python scripts/bench_startup.py --runs 5
+    python scripts/bench_startup.py --runs 5 --warmup
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    client.get("/")
+    first_request = time.perf_counter()
+    warmup_ms = None
+    if WARMUP:
+        client.post("/warmup", params={"include_speech": INCLUDE_SPEECH}, headers={"Authorization": "Bearer bench"})
+        warmup_ms = (time.perf_counter() - first_request) * 1000
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (first_request - ready) * 1000,
+    "warmup_ms": warmup_ms,
+}))
+"""
+
+
+def run_once(warmup: bool, include_speech: bool) -> dict:
+    code = PROBE.replace("WARMUP", str(warmup)).replace("INCLUDE_SPEECH", str(include_speech))
+    env = dict(os.environ, WARMUP_TOKEN="bench")
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="También mide POST /warmup.")
+    parser.add_argument("--no-speech", action="store_true", help="No incluir el motor de voz en el warmup.")
+    args = parser.parse_args()
+
+    samples = [run_once(args.warmup, not args.no_speech) for _ in range(args.runs)]
+    for metric in ("import_ms", "startup_ms", "first_request_ms", "warmup_ms"):
+        values = [sample[metric] for sample in samples if sample[metric] is not None]
+        if not values:
+            continue
+        print(f"{metric:>18}: mediana {statistics.median(values):8.1f} ms | min {min(values):8.1f} ms | max {max(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
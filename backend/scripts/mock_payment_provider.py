@@ -0,0 +1,79 @@
+# En: backend/scripts/mock_payment_provider.py
+"""
+Pasarela de pagos de prueba: manda eventos firmados a /payments/webhooks/<proveedor>.
+
+Sirve para probar el flujo completo sin una pasarela real, incluyendo
+reintentos (el mismo evento varias veces) y ráfagas (muchos eventos juntos).
+La API tiene que tener el mismo secreto en PAYMENT_WEBHOOK_SECRET_<PROVEEDOR>.
+
+Uso (desde backend/):
+    PAYMENT_WEBHOOK_SECRET_MOCK=secreto python scripts/mock_payment_provider.py \\
+        --email ana@example.com coins --amount 100 --repeat 3
+    python scripts/mock_payment_provider.py --secret secreto --email ana@example.com \\
+        premium --days 30 --burst 200
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import statistics
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payments import sign
+
+
+def build_event(args) -> dict:
+    if args.kind == "coins":
+        event_type, data = "coins.purchased", {"amount": args.amount}
+    else:
+        event_type, data = "subscription.activated", {"days": args.days, "plan": "Premium"}
+    data["user_email"] = args.email
+    data["payment_id"] = f"mock_{uuid.uuid4().hex[:12]}"
+    return {"id": f"evt_{uuid.uuid4().hex}", "type": event_type, "data": data}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--provider", default="mock")
+    parser.add_argument("--secret", default=None, help="Por defecto, PAYMENT_WEBHOOK_SECRET_<PROVEEDOR>.")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--repeat", type=int, default=1, help="Veces que se reenvía cada evento (reintentos).")
+    parser.add_argument("--burst", type=int, default=1, help="Cantidad de eventos distintos.")
+    subparsers = parser.add_subparsers(dest="kind", required=True)
+    coins_parser = subparsers.add_parser("coins")
+    coins_parser.add_argument("--amount", type=int, default=100)
+    premium_parser = subparsers.add_parser("premium")
+    premium_parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    secret = args.secret or os.environ.get(f"PAYMENT_WEBHOOK_SECRET_{args.provider.upper()}")
+    if not secret:
+        parser.error("Falta el secreto (--secret o PAYMENT_WEBHOOK_SECRET_<PROVEEDOR>).")
+
+    endpoint = f"{args.url}/payments/webhooks/{args.provider}"
+    latencies, outcomes = [], {}
+    with httpx.Client(timeout=10) as client:
+        for _ in range(args.burst):
+            body = json.dumps(build_event(args)).encode()
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = client.post(endpoint, content=body, headers={
+                    "Content-Type": "application/json",
+                    "X-Payment-Signature": sign(secret, body),
+                })
+                latencies.append((time.perf_counter() - started) * 1000)
+                outcome = response.json().get("status", response.status_code) if response.is_success else response.status_code
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    print(f"Respuestas: {outcomes}")
+    print(f"Latencia: mediana {statistics.median(latencies):.1f} ms | max {max(latencies):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# En: backend/scripts/run_job.py
+"""
+Corre una tarea periódica una sola vez (por ejemplo, desde Cloud Scheduler o cron).
+
+Uso (desde backend/):
+    python scripts/run_job.py --list
+    python scripts/run_job.py reconcile_coins
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import create_db_and_tables
+import scheduler
+import jobs  # registra las tareas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("job", nargs="?")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args()
+
+    if args.list or not args.job:
+        for name, job in scheduler.JOBS.items():
+            print(f"{name}: cada {job.interval_seconds:.0f} s")
+        return
+
+    if args.job not in scheduler.JOBS:
+        parser.error(f"Tarea desconocida: {args.job}")
+    create_db_and_tables()
+    print(scheduler.run_job(args.job))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# En: backend/search.py
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text, select, func, literal_column, table, column, or_, and_
+from sqlalchemy.orm import Session
+
+from database import engine, CommunityPost, MarketplaceItem
+from pagination import encode_cursor, decode_cursor
+
+# --- BÚSQUEDA DE TEXTO COMPLETO ---
+# Postgres: índice GIN sobre una expresión `to_tsvector('spanish', ...)`; el
+# motor lo mantiene solo en cada INSERT/UPDATE/DELETE y la consulta usa la
+# misma expresión para que el planner lo aproveche.
+# SQLite (desarrollo local): tabla virtual FTS5 con contenido externo,
+# sincronizada por triggers.
+
+
+class SearchSpec:
+    def __init__(self, model, fields: List[str]):
+        self.model = model
+        self.table = model.__tablename__
+        self.fields = fields
+        self.fts_table = f"{self.table}_fts"
+        document = " || ' ' || ".join(f"coalesce({field}, '')" for field in fields)
+        self.pg_vector = f"to_tsvector('spanish'::regconfig, {document})"
+
+
+POSTS = SearchSpec(CommunityPost, ["title", "content", "category"])
+ITEMS = SearchSpec(MarketplaceItem, ["name", "description"])
+SPECS = [POSTS, ITEMS]
+
+
+def _is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def _sqlite_ddl(spec: SearchSpec) -> List[str]:
+    fields = ", ".join(spec.fields)
+    new_values = ", ".join(f"new.{field}" for field in spec.fields)
+    old_values = ", ".join(f"old.{field}" for field in spec.fields)
+    return [
+        f"CREATE VIRTUAL TABLE {spec.fts_table} USING fts5({fields}, content='{spec.table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {spec.fts_table}_ai AFTER INSERT ON {spec.table} BEGIN INSERT INTO {spec.fts_table}(rowid, {fields}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER {spec.fts_table}_ad AFTER DELETE ON {spec.table} BEGIN INSERT INTO {spec.fts_table}({spec.fts_table}, rowid, {fields}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER {spec.fts_table}_au AFTER UPDATE ON {spec.table} BEGIN INSERT INTO {spec.fts_table}({spec.fts_table}, rowid, {fields}) VALUES ('delete', old.id, {old_values}); INSERT INTO {spec.fts_table}(rowid, {fields}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {spec.fts_table}({spec.fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def ensure_search_indexes():
+    """Crea los índices de búsqueda si faltan. Se llama al arrancar, después de crear las tablas."""
+    with engine.begin() as connection:
+        for spec in SPECS:
+            if _is_postgres():
+                connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{spec.table}_search ON {spec.table} USING GIN ({spec.pg_vector})"))
+            elif engine.dialect.name == "sqlite":
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": spec.fts_table}
+                ).first()
+                if not exists:
+                    for statement in _sqlite_ddl(spec):
+                        connection.execute(text(statement))
+
+
+def _fts5_query(query: str) -> str:
+    """Convierte texto libre en una consulta FTS5 segura: cada palabra como prefijo, todas requeridas."""
+    terms = re.findall(r"\w+", query, flags=re.UNICODE)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search(db: Session, spec: SearchSpec, query: str, filters: list, cursor: Optional[str], limit: int) -> Tuple[list, Optional[str]]:
+    """
+    Devuelve (resultados, next_cursor) ordenados por relevancia.
+    El orden es `rank` ascendente (bm25 en SQLite, -ts_rank en Postgres) y luego id
+    descendente; el cursor guarda ese par para paginar sin OFFSET.
+    """
+    model = spec.model
+    if _is_postgres():
+        vector = literal_column(spec.pg_vector)
+        tsquery = func.websearch_to_tsquery(literal_column("'spanish'::regconfig"), query)
+        rank = -func.ts_rank(vector, tsquery)
+        inner = select(model.id.label("id"), rank.label("rank")).where(vector.op("@@")(tsquery), *filters)
+    else:
+        match_query = _fts5_query(query)
+        if not match_query:
+            return [], None
+        fts = table(spec.fts_table, column("rowid"))
+        rank = literal_column(f"bm25({spec.fts_table})")
+        inner = select(model.id.label("id"), rank.label("rank")).join(fts, fts.c.rowid == model.id).where(
+            literal_column(spec.fts_table).op("MATCH")(match_query), *filters
+        )
+
+    ranked = inner.subquery()
+    statement = select(ranked.c.id, ranked.c.rank)
+    position = decode_cursor(cursor, 2)
+    if position:
+        last_rank, last_id = float(position[0]), int(position[1])
+        statement = statement.where(or_(ranked.c.rank > last_rank, and_(ranked.c.rank == last_rank, ranked.c.id < last_id)))
+    statement = statement.order_by(ranked.c.rank.asc(), ranked.c.id.desc()).limit(limit + 1)
+
+    page = db.execute(statement).all()
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1].rank, page[-1].id)
+
+    ids = [row.id for row in page]
+    if not ids:
+        return [], None
+    by_id = {obj.id: obj for obj in db.query(model).filter(model.id.in_(ids))}
+    return [by_id[i] for i in ids if i in by_id], next_cursor
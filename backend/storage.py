@@ -0,0 +1,172 @@
+# En: backend/storage.py
+import os
+import shutil
+import threading
+from typing import Iterator, Optional, Tuple
+
+# --- ALMACENAMIENTO DE ARCHIVOS SUBIDOS ---
+# Las imágenes se guardan con claves derivadas de su contenido, así que un
+# objeto nunca cambia: se puede cachear para siempre en el navegador y en una
+# CDN. STORAGE_BACKEND elige dónde viven:
+# - "local": disco del contenedor (desarrollo; se pierde en cada deploy).
+# - "s3": cualquier servicio compatible con S3. S3_ENDPOINT_URL permite
+#   apuntar a un MinIO local para probar sin AWS.
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "local")
+LOCAL_STORAGE_DIR = os.environ.get("STORAGE_LOCAL_DIR", "static/images")
+S3_BUCKET = os.environ.get("S3_BUCKET")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+S3_PREFIX = os.environ.get("S3_PREFIX", "uploads/")
+# Si el bucket (o la CDN delante) es público, las URLs apuntan directo ahí
+# y la API no tiene que pasar los bytes.
+S3_PUBLIC_URL = os.environ.get("S3_PUBLIC_URL")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_BYTES = 64 * 1024
+
+
+class ObjectInfo:
+    __slots__ = ("size", "content_type")
+
+    def __init__(self, size: int, content_type: str):
+        self.size = size
+        self.content_type = content_type
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpreta un header `Range: bytes=...` y devuelve (inicio, fin) inclusivos.
+    None si no hay rango (o si pide varios: se responde el objeto entero).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text == "":
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(size - suffix, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+class Storage:
+    def put_file(self, key: str, path: str, content_type: str):
+        raise NotImplementedError
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        raise NotImplementedError
+
+    def iter_bytes(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        """Bytes de `start` a `end` inclusive, en bloques."""
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        base_url = os.environ.get("BACKEND_URL", "http://localhost:8000")
+        return f"{base_url}/media/{key}"
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+
+CONTENT_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: str = LOCAL_STORAGE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def put_file(self, key: str, path: str, content_type: str):
+        target = self._path(key)
+        partial = f"{target}.partial"
+        shutil.copyfile(path, partial)
+        os.replace(partial, target)
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            size = os.stat(self._path(key)).st_size
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(size, CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream"))
+
+    def iter_bytes(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as file:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = file.read(min(CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+class S3Storage(Storage):
+    def __init__(self, bucket: Optional[str] = S3_BUCKET, endpoint_url: Optional[str] = S3_ENDPOINT_URL, prefix: str = S3_PREFIX, public_url: Optional[str] = S3_PUBLIC_URL):
+        if not bucket:
+            raise ValueError("Falta la variable S3_BUCKET para usar STORAGE_BACKEND=s3.")
+        import boto3
+        from botocore.exceptions import ClientError
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._client_error = ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url.rstrip("/") if public_url else None
+
+    def put_file(self, key: str, path: str, content_type: str):
+        self._client.upload_file(path, self.bucket, self.prefix + key, ExtraArgs={
+            "ContentType": content_type,
+            "CacheControl": IMMUTABLE_CACHE_CONTROL,
+        })
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            head = self._client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return ObjectInfo(head["ContentLength"], head.get("ContentType", "application/octet-stream"))
+
+    def iter_bytes(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        response = self._client.get_object(Bucket=self.bucket, Key=self.prefix + key, Range=f"bytes={start}-{end}")
+        yield from response["Body"].iter_chunks(CHUNK_BYTES)
+
+    def url(self, key: str) -> str:
+        if self.public_url:
+            return f"{self.public_url}/{self.prefix}{key}"
+        return super().url(key)
+
+
+STORAGE_BACKENDS = {
+    "local": LocalStorage,
+    "s3": S3Storage,
+}
+
+_storage: Optional[Storage] = None
+_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    global _storage
+    if _storage is None:
+        with _lock:
+            if _storage is None:
+                if STORAGE_BACKEND not in STORAGE_BACKENDS:
+                    raise ValueError(f"Almacenamiento desconocido: '{STORAGE_BACKEND}'. Opciones: {list(STORAGE_BACKENDS)}")
+                _storage = STORAGE_BACKENDS[STORAGE_BACKEND]()
+    return _storage
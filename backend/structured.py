@@ -0,0 +1,121 @@
+# En: backend/structured.py
+import re
+import json
+import time
+import random
+from typing import Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+# --- RESPUESTAS JSON DE LA IA ---
+# Los modelos que responden JSON tienen un response_schema (ver prompts.py),
+# así que una respuesta mal formada es rara. Cuando pasa, casi siempre es una
+# respuesta cortada o con ```json alrededor: antes de volver a llamar a la IA
+# se intenta arreglarla acá. Solo se reintenta la llamada si el arreglo no
+# alcanza, o si el error fue transitorio (cuota, 5xx, timeout), y en ese caso
+# con espera exponencial.
+
+MAX_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 4.0
+
+
+class InvalidModelOutput(Exception):
+    pass
+
+
+def _is_transient(error: Exception) -> bool:
+    try:
+        from google.api_core import exceptions as google_exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    ))
+
+
+def repair_json(text: str) -> str:
+    """Arreglos locales: saca los ``` y el texto alrededor, comas colgadas y cierra lo que quedó abierto."""
+    text = re.sub(r"```(?:json)?", "", text).strip()
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if not starts:
+        return text
+    text = text[min(starts):]
+    text = re.sub(r",\s*([}\]])", r"\1", text)
+
+    closers = []
+    in_string = escaped = False
+    end = len(text)
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if closers:
+                closers.pop()
+            if not closers:
+                end = index + 1
+                break
+    text = text[:end]
+    if closers:
+        # Respuesta cortada: se cierra el string abierto y se descarta una coma o clave a medias.
+        if in_string:
+            text += '"'
+        text = re.sub(r',\s*("[^"]*"\s*:?\s*)?$', "", text.rstrip())
+        text += "".join(reversed(closers))
+    return text
+
+
+def parse(text: str, result_model: Type[BaseModel], extra_fields: Optional[dict] = None) -> BaseModel:
+    """Valida `text` contra `result_model`; si no es JSON válido, lo intenta arreglar antes de rendirse."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            data = json.loads(repair_json(text))
+        except json.JSONDecodeError as e:
+            raise InvalidModelOutput(f"JSON inválido: {e}")
+    if not isinstance(data, dict):
+        raise InvalidModelOutput("Se esperaba un objeto JSON.")
+    try:
+        return result_model.model_validate({**data, **(extra_fields or {})})
+    except ValidationError as e:
+        raise InvalidModelOutput(str(e))
+
+
+def generate_json(model, contents, result_model: Type[BaseModel], user_email: Optional[str] = None,
+                  extra_fields: Optional[dict] = None, max_attempts: int = MAX_ATTEMPTS, **kwargs) -> BaseModel:
+    """
+    Llama a `model.generate_content` y devuelve la respuesta validada como `result_model`.
+    `extra_fields` completa campos que no genera la IA. Levanta InvalidModelOutput si
+    ningún intento dio una respuesta válida, o el último error transitorio.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response = model.generate_content(contents, attempt=attempt, user_email=user_email, **kwargs)
+        except Exception as e:
+            if not _is_transient(e) or attempt == max_attempts:
+                raise
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+            print(f"Error transitorio de la IA (intento {attempt}), reintentando en {delay:.1f}s: {e}")
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            continue
+        try:
+            # `response.text` levanta ValueError si la respuesta vino bloqueada o vacía.
+            return parse(response.text, result_model, extra_fields)
+        except (InvalidModelOutput, ValueError) as e:
+            if attempt == max_attempts:
+                raise InvalidModelOutput(str(e))
+            print(f"Respuesta inválida de la IA (intento {attempt}): {e}")
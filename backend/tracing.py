@@ -0,0 +1,86 @@
+# En: backend/tracing.py
+import os
+from contextlib import contextmanager
+
+# --- TRAZAS (OPENTELEMETRY) ---
+# Apagado por defecto. Con TRACING_EXPORTER se elige a dónde van los spans:
+# - "console": se imprimen en la salida estándar (útil en desarrollo).
+# - "otlp": a un collector OTLP/HTTP (OTEL_EXPORTER_OTLP_ENDPOINT, por defecto
+#   http://localhost:4318).
+# Se instrumentan las rutas de FastAPI, cada consulta de SQLAlchemy y cada
+# pedido de httpx; las llamadas a Gemini abren su propio span desde clients.py.
+# Sin trazas, `span()` no hace nada y no se importa el SDK.
+
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "none")
+SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME", "resi-api")
+
+_tracer = None
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def setup(app, engine) -> bool:
+    """Configura el proveedor de trazas y los instrumentadores. Devuelve si quedó activo."""
+    global _tracer
+    if TRACING_EXPORTER == "none" or _tracer is not None:
+        return _tracer is not None
+
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+
+    if TRACING_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    elif TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    else:
+        raise ValueError(f"Exportador de trazas desconocido: '{TRACING_EXPORTER}'. Opciones: none, console, otlp")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics")
+    SQLAlchemyInstrumentor().instrument(engine=engine)
+    HTTPXClientInstrumentor().instrument()
+    _tracer = trace.get_tracer("resi")
+    return True
+
+
+def shutdown():
+    if _tracer is not None:
+        from opentelemetry import trace
+        provider = trace.get_tracer_provider()
+        if hasattr(provider, "shutdown"):
+            provider.shutdown()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Abre un span hijo del actual. Los atributos en None se omiten."""
+    if _tracer is None:
+        yield _NOOP_SPAN
+        return
+    with _tracer.start_as_current_span(name, attributes={key: value for key, value in attributes.items() if value is not None}) as current:
+        yield current
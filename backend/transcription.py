@@ -0,0 +1,367 @@
+# En: backend/transcription.py
+import os
+import io
+import queue
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+from metrics import track_upstream
+import circuit
+
+# --- LÍMITES POR SESIÓN DE STREAMING ---
+# Google corta los streams a los ~5 minutos; además acotamos la memoria que puede
+# retener cada sesión para que un cliente lento o malicioso no llene el contenedor.
+MAX_STREAM_BYTES = int(os.environ.get("TRANSCRIBE_MAX_STREAM_BYTES", 16 * 1024 * 1024))
+MAX_CHUNK_BYTES = int(os.environ.get("TRANSCRIBE_MAX_CHUNK_BYTES", 64 * 1024))
+MAX_QUEUED_CHUNKS = int(os.environ.get("TRANSCRIBE_MAX_QUEUED_CHUNKS", 32))
+
+SUPPORTED_ENCODINGS = ("LINEAR16", "WEBM_OPUS", "OGG_OPUS")
+
+
+# --- SELECCIÓN DEL MOTOR DE RECONOCIMIENTO ---
+# "google": Cloud Speech-to-Text (streaming real, requiere red).
+# "whisper": faster-whisper local en CPU, sin red y con latencia predecible.
+SPEECH_BACKEND = os.environ.get("SPEECH_BACKEND", "google").lower()
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "small")
+WHISPER_COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE", "int8")
+SPEECH_WORKERS = int(os.environ.get("SPEECH_WORKERS", 1))
+LOCAL_SAMPLE_RATE = 16000
+
+
+class StreamLimitExceeded(Exception):
+    pass
+
+
+class UnsupportedEncoding(ValueError):
+    pass
+
+
+class AudioInfo:
+    def __init__(self, format: Optional[str], sample_rate: Optional[int], channels: Optional[int], subtype: Optional[str] = None):
+        self.format = format
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.subtype = subtype
+
+
+def sniff_audio(audio: bytes) -> AudioInfo:
+    """Lee el encabezado del audio (WAV, FLAC, OGG) sin decodificarlo entero."""
+    try:
+        info = sf.info(io.BytesIO(audio))
+        return AudioInfo(info.format, info.samplerate, info.channels, info.subtype)
+    except Exception:
+        return AudioInfo(None, None, None)
+
+
+def decode_to_mono_16k(audio: bytes, raw_sample_rate: int = 44100) -> np.ndarray:
+    """
+    Decodifica el audio a float32 mono a 16 kHz, que es lo que esperan los modelos locales.
+    Si no tiene encabezado reconocible lo tratamos como PCM de 16 bits crudo.
+    """
+    if sniff_audio(audio).format is None:
+        data, sample_rate = sf.read(io.BytesIO(audio), dtype="float32", format="RAW", subtype="PCM_16", samplerate=raw_sample_rate, channels=1)
+    else:
+        data, sample_rate = sf.read(io.BytesIO(audio), dtype="float32")
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    if sample_rate != LOCAL_SAMPLE_RATE and len(data) > 0:
+        # soxr filtra antes de bajar la frecuencia: sin ese filtro lo que está por
+        # encima de 8 kHz se dobla sobre la banda de la voz y el modelo oye ruido.
+        data = soxr.resample(data, sample_rate, LOCAL_SAMPLE_RATE).astype(np.float32)
+    return data
+
+
+# `google.cloud.speech` (gRPC) se importa recién cuando se usa el motor de Google,
+# para no sumar su carga al arranque en frío ni a quien use el motor local.
+def build_recognition_config(encoding: str = "LINEAR16", sample_rate_hertz: int = 44100, language_code: str = "es-AR", channels: int = 1) -> "speech.RecognitionConfig":
+    from google.cloud import speech
+    if encoding not in SUPPORTED_ENCODINGS:
+        raise UnsupportedEncoding(f"Codificación de audio no soportada: {encoding}")
+    return speech.RecognitionConfig(
+        encoding=getattr(speech.RecognitionConfig.AudioEncoding, encoding),
+        sample_rate_hertz=sample_rate_hertz,
+        language_code=language_code,
+        audio_channel_count=channels
+    )
+
+
+def _transcode_to_flac(audio: bytes) -> bytes:
+    data, sample_rate = sf.read(io.BytesIO(audio), dtype="int16")
+    output = io.BytesIO()
+    sf.write(output, data, sample_rate, format="FLAC", subtype="PCM_16")
+    return output.getvalue()
+
+
+def config_for_audio(audio: bytes) -> Tuple["speech.RecognitionConfig", bytes]:
+    """
+    Arma la configuración a partir del encabezado en vez de asumir 44.1 kHz.
+    Lo que Google no reconoce tal cual (OGG Vorbis, WAV que no sea PCM de 16 bits,
+    MP3...) se transcodifica a FLAC; por eso devuelve también el audio a enviar.
+    """
+    from google.cloud import speech
+    info = sniff_audio(audio)
+    if info.format is None:
+        return build_recognition_config(), audio
+    if info.format == "OGG" and info.subtype == "OPUS":
+        return build_recognition_config(encoding="OGG_OPUS", sample_rate_hertz=info.sample_rate, channels=info.channels), audio
+    if info.format == "WAV" and info.subtype == "PCM_16":
+        return build_recognition_config(sample_rate_hertz=info.sample_rate, channels=info.channels), audio
+    if info.format != "FLAC" or info.subtype not in ("PCM_16", "PCM_24"):
+        audio = _transcode_to_flac(audio)
+    return speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.FLAC,
+        sample_rate_hertz=info.sample_rate,
+        language_code="es-AR",
+        audio_channel_count=info.channels
+    ), audio
+
+
+class StreamingTranscription:
+    """
+    Sesión de reconocimiento en streaming.
+    El audio llega desde el event loop (WebSocket) y se consume en un hilo aparte
+    que alimenta `streaming_recognize`, así el reconocimiento arranca mientras el
+    usuario todavía está hablando y el event loop nunca se bloquea.
+    """
+
+    def __init__(self, client: "speech.SpeechClient", config: "speech.RecognitionConfig", loop: asyncio.AbstractEventLoop):
+        from google.cloud import speech
+        self._speech = speech
+        self._client = client
+        self._config = speech.StreamingRecognitionConfig(config=config, interim_results=True)
+        self._loop = loop
+        self._audio: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=MAX_QUEUED_CHUNKS)
+        self.results: "asyncio.Queue[dict]" = asyncio.Queue()
+        self._received_bytes = 0
+        self._final_parts = []
+        self._closed = False
+        self._finished = False
+        self._thread = threading.Thread(target=self._run, name="speech-stream", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    async def feed(self, chunk: bytes):
+        if self._closed or self._finished:
+            return
+        if len(chunk) > MAX_CHUNK_BYTES:
+            raise StreamLimitExceeded("El fragmento de audio es demasiado grande.")
+        self._received_bytes += len(chunk)
+        if self._received_bytes > MAX_STREAM_BYTES:
+            raise StreamLimitExceeded("El audio supera la duración máxima permitida.")
+        # La cola acotada aplica contrapresión: si Google va más lento que el cliente,
+        # esperamos en un hilo en vez de acumular audio en memoria.
+        await asyncio.to_thread(self._audio.put, chunk)
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        await asyncio.to_thread(self._audio.put, None)
+
+    @property
+    def transcript(self) -> str:
+        return " ".join(self._final_parts).strip()
+
+    def _requests(self):
+        while True:
+            chunk = self._audio.get()
+            if chunk is None:
+                return
+            yield self._speech.StreamingRecognizeRequest(audio_content=chunk)
+
+    def _publish(self, message: dict):
+        self._loop.call_soon_threadsafe(self.results.put_nowait, message)
+
+    def _run(self):
+        # open_stream ya pasó por `before_call`; acá se anota cómo terminó el stream.
+        failed = False
+        try:
+            responses = self._client.streaming_recognize(config=self._config, requests=self._requests())
+            for response in responses:
+                for result in response.results:
+                    if not result.alternatives:
+                        continue
+                    text = result.alternatives[0].transcript
+                    if result.is_final:
+                        self._final_parts.append(text.strip())
+                        self._publish({"type": "final_segment", "transcript": text})
+                    else:
+                        self._publish({"type": "interim", "transcript": text})
+        except Exception as e:
+            failed = circuit.GOOGLE_SPEECH.is_failure(e)
+            print(f"Error en el reconocimiento en streaming: {e}")
+            self._publish({"type": "error", "detail": "No se pudo procesar el audio."})
+        finally:
+            circuit.GOOGLE_SPEECH.record(failed)
+            self._finished = True
+            # Vaciamos la cola para liberar a un productor que haya quedado esperando.
+            while not self._audio.empty():
+                try:
+                    self._audio.get_nowait()
+                except queue.Empty:
+                    break
+            self._publish({"type": "done"})
+
+
+class BufferedTranscription:
+    """
+    Sesión para motores sin streaming: acumula el audio (con el mismo tope de
+    memoria) y lo transcribe de una vez al cerrar. Expone la misma interfaz que
+    `StreamingTranscription` para que el WebSocket no distinga entre motores.
+    """
+
+    def __init__(self, backend: "SpeechBackend", sample_rate_hertz: int, loop: asyncio.AbstractEventLoop):
+        self._backend = backend
+        self._sample_rate = sample_rate_hertz
+        self._loop = loop
+        self._buffer = bytearray()
+        self.results: "asyncio.Queue[dict]" = asyncio.Queue()
+        self._transcript = ""
+        self._closed = False
+
+    def start(self):
+        pass
+
+    async def feed(self, chunk: bytes):
+        if self._closed:
+            return
+        if len(chunk) > MAX_CHUNK_BYTES:
+            raise StreamLimitExceeded("El fragmento de audio es demasiado grande.")
+        if len(self._buffer) + len(chunk) > MAX_STREAM_BYTES:
+            raise StreamLimitExceeded("El audio supera la duración máxima permitida.")
+        self._buffer.extend(chunk)
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._transcript = await self._backend.transcribe_async(bytes(self._buffer), raw_sample_rate=self._sample_rate)
+            if self._transcript:
+                self.results.put_nowait({"type": "final_segment", "transcript": self._transcript})
+        except Exception as e:
+            print(f"Error en el reconocimiento local: {e}")
+            self.results.put_nowait({"type": "error", "detail": "No se pudo procesar el audio."})
+        finally:
+            self._buffer = bytearray()
+            self.results.put_nowait({"type": "done"})
+
+    @property
+    def transcript(self) -> str:
+        return self._transcript.strip()
+
+
+# --- MOTORES DE RECONOCIMIENTO ---
+class SpeechBackend:
+    name = "base"
+    # Codificaciones que acepta `open_stream`.
+    stream_encodings = SUPPORTED_ENCODINGS
+
+    def transcribe(self, audio: bytes, raw_sample_rate: int = 44100) -> str:
+        raise NotImplementedError
+
+    async def transcribe_async(self, audio: bytes, raw_sample_rate: int = 44100) -> str:
+        return await asyncio.to_thread(self.transcribe, audio, raw_sample_rate)
+
+    def check_stream_encoding(self, encoding: str):
+        if encoding not in self.stream_encodings:
+            raise UnsupportedEncoding(
+                f"El motor '{self.name}' no acepta audio {encoding} en streaming. Codificaciones aceptadas: {', '.join(self.stream_encodings)}."
+            )
+
+    def open_stream(self, encoding: str, sample_rate_hertz: int, loop: asyncio.AbstractEventLoop):
+        self.check_stream_encoding(encoding)
+        return BufferedTranscription(self, sample_rate_hertz, loop)
+
+
+class GoogleSpeechBackend(SpeechBackend):
+    name = "google"
+
+    def __init__(self, client: Optional["speech.SpeechClient"] = None):
+        from google.cloud import speech
+        self.client = client or speech.SpeechClient()
+
+    def transcribe(self, audio: bytes, raw_sample_rate: int = 44100) -> str:
+        from google.cloud import speech
+        config, audio = config_for_audio(audio)
+        with circuit.GOOGLE_SPEECH.guard(), track_upstream("google_speech", "recognize"):
+            response = self.client.recognize(config=config, audio=speech.RecognitionAudio(content=audio))
+        return " ".join(result.alternatives[0].transcript for result in response.results if result.alternatives)
+
+    def open_stream(self, encoding: str, sample_rate_hertz: int, loop: asyncio.AbstractEventLoop):
+        self.check_stream_encoding(encoding)
+        config = build_recognition_config(encoding=encoding, sample_rate_hertz=sample_rate_hertz)
+        # Con el cortacircuitos abierto el stream ni se abre (CircuitOpen); si se
+        # abre, StreamingTranscription registra el resultado al terminar.
+        circuit.GOOGLE_SPEECH.before_call()
+        return StreamingTranscription(self.client, config, loop)
+
+
+# El modelo se carga una vez por proceso del pool, no por pedido.
+_whisper_model = None
+
+
+def _init_whisper_worker(model_name: str, compute_type: str):
+    global _whisper_model
+    from faster_whisper import WhisperModel
+    _whisper_model = WhisperModel(model_name, device="cpu", compute_type=compute_type)
+
+
+def _whisper_transcribe(audio: bytes, raw_sample_rate: int) -> str:
+    samples = decode_to_mono_16k(audio, raw_sample_rate)
+    if len(samples) == 0:
+        return ""
+    segments, _ = _whisper_model.transcribe(samples, language="es", beam_size=1, vad_filter=True)
+    return " ".join(segment.text.strip() for segment in segments)
+
+
+class WhisperSpeechBackend(SpeechBackend):
+    """
+    Reconocimiento local con faster-whisper en CPU. Corre en un pool de procesos
+    para no competir por el GIL con el servidor y para que la carga del modelo
+    no se repita en cada pedido.
+    En streaming solo acepta PCM de 16 bits (LINEAR16): los fragmentos Opus de
+    WebM u OGG no se pueden decodificar sueltos.
+    """
+    name = "whisper"
+    stream_encodings = ("LINEAR16",)
+
+    def __init__(self, model_name: str = WHISPER_MODEL, compute_type: str = WHISPER_COMPUTE_TYPE, workers: int = SPEECH_WORKERS):
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_whisper_worker,
+            initargs=(model_name, compute_type)
+        )
+
+    def transcribe(self, audio: bytes, raw_sample_rate: int = 44100) -> str:
+        with track_upstream("whisper", "transcribe"):
+            return self._pool.submit(_whisper_transcribe, audio, raw_sample_rate).result()
+
+    async def transcribe_async(self, audio: bytes, raw_sample_rate: int = 44100) -> str:
+        loop = asyncio.get_running_loop()
+        with track_upstream("whisper", "transcribe"):
+            return await loop.run_in_executor(self._pool, _whisper_transcribe, audio, raw_sample_rate)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+SPEECH_BACKENDS = {
+    "google": GoogleSpeechBackend,
+    "whisper": WhisperSpeechBackend,
+}
+
+
+def create_speech_backend(name: str = SPEECH_BACKEND) -> SpeechBackend:
+    if name not in SPEECH_BACKENDS:
+        raise ValueError(f"Motor de reconocimiento desconocido: '{name}'. Opciones: {list(SPEECH_BACKENDS)}")
+    return SPEECH_BACKENDS[name]()
@@ -0,0 +1,150 @@
+# En: backend/usage.py
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from database import SessionLocal, LLMUsage
+import entitlements
+
+# --- CONSUMO DE LA IA ---
+# Cada llamada a Gemini (ver clients.py) suma tokens, latencia, reintentos y
+# errores a un acumulador en memoria por (usuario, función, día, modelo). La
+# tarea `flush_llm_usage` lo vuelca a la tabla `llm_usage` cada minuto, así
+# que registrar una llamada no agrega escrituras al pedido.
+#
+# Presupuesto diario de tokens por usuario (Premium tiene uno más alto):
+# - Pasado el presupuesto, las llamadas usan LLM_DOWNGRADE_MODEL (más barato).
+# - Pasado presupuesto x LLM_HARD_LIMIT_FACTOR, se cortan con un 429 hasta el día siguiente.
+
+LLM_DAILY_TOKENS_FREE = int(os.environ.get("LLM_DAILY_TOKENS_FREE", "200000"))
+LLM_DAILY_TOKENS_PREMIUM = int(os.environ.get("LLM_DAILY_TOKENS_PREMIUM", "1000000"))
+LLM_HARD_LIMIT_FACTOR = float(os.environ.get("LLM_HARD_LIMIT_FACTOR", "1.5"))
+LLM_DOWNGRADE_MODEL = os.environ.get("LLM_DOWNGRADE_MODEL", "gemini-1.5-flash-8b")
+
+ANONYMOUS = "-"
+
+
+class BudgetExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Llegaste al límite diario de uso de la IA. Vas a poder volver a usarla mañana."
+        )
+
+
+# (email, función, día, modelo) -> [pedidos, tokens de entrada, tokens de salida, reintentos, errores, latencia ms]
+_pending: Dict[Tuple[str, str, str, str], list] = {}
+_pending_lock = threading.Lock()
+_stored_today = TTLCache(maxsize=20000, ttl=60)
+
+
+def _today() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+
+def record(user_email: Optional[str], feature: str, model: str, prompt_tokens: int, completion_tokens: int,
+           latency_ms: float, attempt: int = 1, error: bool = False):
+    key = (user_email or ANONYMOUS, feature, _today(), model)
+    with _pending_lock:
+        totals = _pending.get(key)
+        if totals is None:
+            totals = _pending[key] = [0, 0, 0, 0, 0, 0.0]
+        totals[0] += 1
+        totals[1] += prompt_tokens
+        totals[2] += completion_tokens
+        totals[3] += 1 if attempt > 1 else 0
+        totals[4] += 1 if error else 0
+        totals[5] += latency_ms
+
+
+def flush(db: Session) -> dict:
+    """Suma lo acumulado a `llm_usage` (UPDATE y, si la fila no existe, INSERT)."""
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+    table = LLMUsage.__table__
+    try:
+        for (email, feature, day, model), (requests, prompt_tokens, completion_tokens, retries, errors, latency_ms) in pending.items():
+            where = (table.c.user_email == email) & (table.c.feature == feature) & (table.c.day == day) & (table.c.model == model)
+            increments = {
+                "requests": table.c.requests + requests,
+                "prompt_tokens": table.c.prompt_tokens + prompt_tokens,
+                "completion_tokens": table.c.completion_tokens + completion_tokens,
+                "retries": table.c.retries + retries,
+                "errors": table.c.errors + errors,
+                "latency_ms_total": table.c.latency_ms_total + latency_ms,
+            }
+            if db.execute(table.update().where(where).values(increments)).rowcount == 0:
+                try:
+                    with db.begin_nested():
+                        db.execute(table.insert().values(
+                            user_email=email, feature=feature, day=day, model=model, requests=requests,
+                            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                            retries=retries, errors=errors, latency_ms_total=latency_ms
+                        ))
+                except IntegrityError:
+                    # Otra instancia insertó la fila entre el UPDATE y el INSERT.
+                    db.execute(table.update().where(where).values(increments))
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Se devuelve lo no guardado al acumulador para el próximo intento.
+        with _pending_lock:
+            for key, totals in pending.items():
+                current = _pending.setdefault(key, [0, 0, 0, 0, 0, 0.0])
+                for index, value in enumerate(totals):
+                    current[index] += value
+        raise
+    for email, _, day, _ in pending:
+        _stored_today.pop((email, day))
+    return {"rows": len(pending)}
+
+
+def tokens_today(user_email: str) -> int:
+    today = _today()
+
+    def load():
+        db = SessionLocal()
+        try:
+            return db.query(func.coalesce(func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens), 0)).filter(
+                LLMUsage.user_email == user_email, LLMUsage.day == today
+            ).scalar()
+        finally:
+            db.close()
+
+    stored = _stored_today.get_or_set((user_email, today), load)
+    with _pending_lock:
+        pending = sum(
+            totals[1] + totals[2] for (email, _, day, _), totals in _pending.items()
+            if email == user_email and day == today
+        )
+    return stored + pending
+
+
+def _daily_budget(user_email: str) -> int:
+    db = SessionLocal()
+    try:
+        premium = entitlements.get(db, user_email).is_premium
+    finally:
+        db.close()
+    return LLM_DAILY_TOKENS_PREMIUM if premium else LLM_DAILY_TOKENS_FREE
+
+
+def budget_decision(user_email: Optional[str]) -> str:
+    """"ok", "downgrade" (usar el modelo barato) o "block"."""
+    if not user_email:
+        return "ok"
+    used = tokens_today(user_email)
+    budget = _daily_budget(user_email)
+    if used >= budget * LLM_HARD_LIMIT_FACTOR:
+        return "block"
+    if used >= budget:
+        return "downgrade"
+    return "ok"
@@ -1,6 +1,22 @@
 // En: frontend/src/app/api/auth/[...nextauth]/route.ts
 import NextAuth from "next-auth"
 import GoogleProvider from "next-auth/providers/google"
+import { SignJWT } from "jose"
+
+// Token para la API: un JWT HS256 firmado con NEXTAUTH_SECRET (el backend lo
+// verifica con el mismo secreto). Dura una hora y se renueva cada vez que el
+// cliente vuelve a pedir la sesión (ver refetchInterval en providers.tsx).
+const API_TOKEN_TTL_SECONDS = 60 * 60
+
+async function signApiToken(email: string): Promise<string> {
+  const secret = new TextEncoder().encode(process.env.NEXTAUTH_SECRET ?? "")
+  return new SignJWT({ email })
+    .setProtectedHeader({ alg: "HS256" })
+    .setSubject(email)
+    .setIssuedAt()
+    .setExpirationTime(`${API_TOKEN_TTL_SECONDS}s`)
+    .sign(secret)
+}
 
 const handler = NextAuth({
   providers: [
@@ -10,6 +26,14 @@ const handler = NextAuth({
     }),
   ],
   secret: process.env.NEXTAUTH_SECRET,
+  callbacks: {
+    async session({ session }) {
+      if (session.user?.email) {
+        session.apiToken = await signApiToken(session.user.email)
+      }
+      return session
+    },
+  },
 })
 
-export { handler as GET, handler as POST }
\ No newline at end of file
+export { handler as GET, handler as POST }
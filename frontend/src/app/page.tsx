@@ -143,7 +143,7 @@ export default function HomePage() {
       if (session?.user?.email) {
         try {
           const response = await apiClient.get('/check-onboarding', {
-            headers: { 'Authorization': `Bearer ${session.user.email}` },
+            headers: { 'Authorization': `Bearer ${session.apiToken}` },
           });
           const completed = response.data.onboarding_completed;
           setHasCompletedOnboarding(completed);
@@ -176,7 +176,7 @@ export default function HomePage() {
         if (isChatOpen && session?.user?.email) {
             try {
                 const response = await apiClient.get('/chat/history', {
-                    headers: { 'Authorization': `Bearer ${session.user.email}` }
+                    headers: { 'Authorization': `Bearer ${session.apiToken}` }
                 });
                 const history = response.data.map((msg: any) => ({
                     sender: msg.sender,
@@ -212,7 +212,7 @@ export default function HomePage() {
 
     try {
       const response = await apiClient.post<{ response: string }>('/chat', { question: text }, {
-        headers: { 'Authorization': `Bearer ${session.user.email}` }
+        headers: { 'Authorization': `Bearer ${session.apiToken}` }
       });
       const aiMessage: ChatMessage = { sender: 'ai', text: response.data.response };
       setChatMessages(prev => [...prev, aiMessage]);
@@ -37,7 +37,7 @@ export default function PlannerPage() {
       setIsLoading(true);
       try {
         const dashboardResponse = await apiClient.get<DashboardData>('/finance/dashboard-summary', { 
-            headers: { 'Authorization': `Bearer ${session.user.email}` } 
+            headers: { 'Authorization': `Bearer ${session.apiToken}` } 
         });
         setDashboardData(dashboardResponse.data);
       } catch (error) {
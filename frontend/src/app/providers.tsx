@@ -6,8 +6,9 @@ import { SessionProvider } from 'next-auth/react';
 import { Toaster } from 'react-hot-toast';
 
 export function Providers({ children }: { children: React.ReactNode }) {
+  // El token de la API dura una hora: se renueva junto con la sesión.
   return (
-    <SessionProvider>
+    <SessionProvider refetchInterval={15 * 60}>
       <Toaster /> {/* Mover Toaster aquí */}
       {children}
     </SessionProvider>
@@ -115,7 +115,7 @@ export default function AddExpenseForm({ onExpenseAdded, initialText }: AddExpen
 
     try {
       const response = await apiClient.post('/transcribe', formData, {
-        headers: { 'Content-Type': 'multipart/form-data', 'Authorization': `Bearer ${session.user.email}` },
+        headers: { 'Content-Type': 'multipart/form-data', 'Authorization': `Bearer ${session.apiToken}` },
       });
       handleResponse(response.data);
       toast.success("¡Gasto registrado!", { id: toastId });
@@ -137,7 +137,7 @@ export default function AddExpenseForm({ onExpenseAdded, initialText }: AddExpen
       try {
         const response = await apiClient.post('/process-text', 
           { text: textInput },
-          { headers: { 'Authorization': `Bearer ${session.user.email}` } }
+          { headers: { 'Authorization': `Bearer ${session.apiToken}` } }
         );
         handleResponse(response.data);
         toast.success("¡Gasto registrado!", { id: toastId });
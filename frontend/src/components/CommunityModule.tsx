@@ -236,7 +236,7 @@ export default function CommunityModule() {
         if (status !== 'authenticated' || !session?.user?.email) { setIsLoading(false); return; }
         setIsLoading(true);
         try {
-            const config = { headers: { 'Authorization': `Bearer ${session.user.email}` } };
+            const config = { headers: { 'Authorization': `Bearer ${session.apiToken}` } };
             const actions = {
                 posts: () => apiClient.get('/community/posts', config).then(res => setPosts(res.data)),
                 events: () => apiClient.get('/community/events', config).then(res => setEvents(res.data)),
@@ -262,7 +262,7 @@ export default function CommunityModule() {
         if (!newPost.title || !newPost.content) { toast.error("El título y el contenido son obligatorios."); return; }
         const toastId = toast.loading("Publicando...");
         try {
-            await apiClient.post('/community/posts', newPost, { headers: { 'Authorization': `Bearer ${session?.user?.email}` } });
+            await apiClient.post('/community/posts', newPost, { headers: { 'Authorization': `Bearer ${session?.apiToken}` } });
             toast.success("Publicación creada.", { id: toastId });
             setNewPost({ title: '', content: '', category: 'General' });
             fetchData('posts');
@@ -281,7 +281,7 @@ export default function CommunityModule() {
         if (!newEvent.name || !newEvent.location || !newEvent.event_date) { toast.error("Nombre, lugar y fecha son obligatorios."); return; }
         const toastId = toast.loading("Creando evento...");
         try {
-            await apiClient.post('/community/events', newEvent, { headers: { 'Authorization': `Bearer ${session?.user?.email}` } });
+            await apiClient.post('/community/events', newEvent, { headers: { 'Authorization': `Bearer ${session?.apiToken}` } });
             toast.success("Evento creado.", { id: toastId });
             setNewEvent({ name: '', description: '', event_type: 'Feria', location: '', event_date: '' });
             fetchData('events');
@@ -307,7 +307,7 @@ export default function CommunityModule() {
     
             await apiClient.post('/market/items', formData, {
                 headers: {
-                    'Authorization': `Bearer ${session?.user?.email}`,
+                    'Authorization': `Bearer ${session?.apiToken}`,
                 }
             });
     
@@ -325,7 +325,7 @@ export default function CommunityModule() {
         if (!isPremiumUser) { setIsPremiumModalVisible(true); return; }
         const toastId = toast.loading("Destacando publicación...");
         try {
-            await apiClient.post(`/community/posts/${id}/feature`, {}, { headers: { 'Authorization': `Bearer ${session?.user?.email}` } });
+            await apiClient.post(`/community/posts/${id}/feature`, {}, { headers: { 'Authorization': `Bearer ${session?.apiToken}` } });
             toast.success("Publicación destacada.", { id: toastId });
             fetchData('posts');
         } catch (error) {
@@ -344,7 +344,7 @@ export default function CommunityModule() {
     const handleBuyItem = async (item: MarketplaceItem) => {
         const toastId = toast.loading("Iniciando compra...");
         try {
-            const response = await apiClient.post(`/market/items/${item.id}/buy`, {}, { headers: { 'Authorization': `Bearer ${session?.user?.email}` } });
+            const response = await apiClient.post(`/market/items/${item.id}/buy`, {}, { headers: { 'Authorization': `Bearer ${session?.apiToken}` } });
             toast.success("¡Reserva confirmada! Gestioná la entrega en 'Mis Transacciones'.", { id: toastId, duration: 5000 });
             setSelectedTransaction(response.data);
             setTransactionRole('buyer');
@@ -359,7 +359,7 @@ export default function CommunityModule() {
     const handleConfirmTransaction = async (txId: number) => {
         const toastId = toast.loading("Confirmando transacción...");
         try {
-            await apiClient.post(`/market/transactions/${txId}/confirm`, {}, { headers: { 'Authorization': `Bearer ${session?.user?.email}` } });
+            await apiClient.post(`/market/transactions/${txId}/confirm`, {}, { headers: { 'Authorization': `Bearer ${session?.apiToken}` } });
             toast.success("¡Transacción completada! Las monedas han sido transferidas.", { id: toastId });
             setIsTransactionModalVisible(false);
             fetchData('transactions');
@@ -378,7 +378,7 @@ const handleSubscribe = async () => {
 
     const toastId = toast.loading("Procesando suscripción Premium...");
     try {
-        await apiClient.post('/subscriptions/premium', {}, { headers: { 'Authorization': `Bearer ${session?.user?.email}` } });
+        await apiClient.post('/subscriptions/premium', {}, { headers: { 'Authorization': `Bearer ${session?.apiToken}` } });
         toast.success("¡Bienvenido a Resi Premium!", { id: toastId });
         setIsPremiumUser(true);
         setIsPremiumModalVisible(false);
@@ -401,7 +401,7 @@ const handleSubscribe = async () => {
         if (window.confirm("¿Estás seguro de que quieres eliminar esta publicación? Esta acción no se puede deshacer.")) {
             const toastId = toast.loading("Eliminando publicación...");
             try {
-                await apiClient.delete(`/community/posts/${id}`, { headers: { 'Authorization': `Bearer ${session?.user?.email}` } });
+                await apiClient.delete(`/community/posts/${id}`, { headers: { 'Authorization': `Bearer ${session?.apiToken}` } });
                 toast.success("Publicación eliminada.", { id: toastId });
                 fetchData('posts'); // Refresca la lista de publicaciones
             } catch (error: any) {
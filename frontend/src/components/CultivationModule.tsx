@@ -125,7 +125,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
       if (session?.user?.email) {
         try {
           const response = await apiClient.get<CultivationPlan>('/cultivation/latest', {
-            headers: { 'Authorization': `Bearer ${session.user.email}` }
+            headers: { 'Authorization': `Bearer ${session.apiToken}` }
           });
           setLatestPlan(response.data);
         } catch (error) {
@@ -139,7 +139,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
   const fetchHarvests = useCallback(async () => {
     if (!session?.user?.email) return;
     try {
-        const response = await apiClient.get('/cultivation/harvests', { headers: { 'Authorization': `Bearer ${session.user.email}` } });
+        const response = await apiClient.get('/cultivation/harvests', { headers: { 'Authorization': `Bearer ${session.apiToken}` } });
         setHarvestLogs(response.data);
     } catch (error) {
         console.error("Error fetching harvests:", error);
@@ -150,7 +150,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
   const fetchTasks = useCallback(async () => {
     if (!session?.user?.email) return;
     try {
-        const response = await apiClient.get('/cultivation/tasks', { headers: { 'Authorization': `Bearer ${session.user.email}` } });
+        const response = await apiClient.get('/cultivation/tasks', { headers: { 'Authorization': `Bearer ${session.apiToken}` } });
         setCultivationTasks(response.data);
     } catch (error) {
         console.error("Error fetching tasks:", error);
@@ -161,7 +161,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
   const fetchAnalysisData = useCallback(async () => {
     if (!session?.user?.email) return;
     try {
-        const response = await apiClient.get('/cultivation/analysis/monthly-data', { headers: { 'Authorization': `Bearer ${session.user.email}` } });
+        const response = await apiClient.get('/cultivation/analysis/monthly-data', { headers: { 'Authorization': `Bearer ${session.apiToken}` } });
         setAnalysisData(response.data);
     } catch (error) {
         console.error("Error fetching analysis data:", error);
@@ -184,7 +184,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
             crop_name: newHarvest.crop_name,
             quantity: parseFloat(newHarvest.quantity),
             unit: newHarvest.unit
-        }, { headers: { 'Authorization': `Bearer ${session.user.email}` } });
+        }, { headers: { 'Authorization': `Bearer ${session.apiToken}` } });
         toast.success("Cosecha registrada con éxito!", { id: toastId });
         setNewHarvest({ crop_name: '', quantity: '', unit: 'kg' });
         fetchHarvests();
@@ -197,7 +197,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
     if (!session?.user?.email) return;
     if (window.confirm("¿Estás seguro de que quieres eliminar este registro?")) {
       try {
-        await apiClient.delete(`/cultivation/harvests/${id}`, { headers: { 'Authorization': `Bearer ${session.user.email}` } });
+        await apiClient.delete(`/cultivation/harvests/${id}`, { headers: { 'Authorization': `Bearer ${session.apiToken}` } });
         toast.success("Registro de cosecha eliminado.");
         fetchHarvests();
       } catch (error) {
@@ -215,7 +215,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
             task_name: newTask.task_name,
             due_date: newTask.due_date,
             crop_name: newTask.crop_name || null,
-        }, { headers: { 'Authorization': `Bearer ${session.user.email}` } });
+        }, { headers: { 'Authorization': `Bearer ${session.apiToken}` } });
         toast.success("Tarea agregada con éxito!", { id: toastId });
         setNewTask({ task_name: '', due_date: '', crop_name: '' });
         fetchTasks();
@@ -227,7 +227,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
   const handleToggleTask = async (id: number) => {
     if (!session?.user?.email) return;
     try {
-        await apiClient.patch(`/cultivation/tasks/${id}/toggle`, {}, { headers: { 'Authorization': `Bearer ${session.user.email}` } });
+        await apiClient.patch(`/cultivation/tasks/${id}/toggle`, {}, { headers: { 'Authorization': `Bearer ${session.apiToken}` } });
         toast.success("Tarea actualizada.");
         fetchTasks();
     } catch (error) {
@@ -258,7 +258,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
 
     try {
         const response = await apiClient.post('/cultivation/generate-plan', planRequest, {
-            headers: { 'Authorization': `Bearer ${session.user.email}` }
+            headers: { 'Authorization': `Bearer ${session.apiToken}` }
         });
         setAiPlanResult(response.data);
         toast.success('¡Plan generado con éxito!', { id: toastId });
@@ -287,7 +287,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
             temp: temp ? parseFloat(temp) : null,
             soilMoisture: soilMoisture ? parseFloat(soilMoisture) : null,
         }, {
-            headers: { 'Authorization': `Bearer ${session.user.email}` }
+            headers: { 'Authorization': `Bearer ${session.apiToken}` }
         });
         setValidationResult(response.data);
         setAiControlAdvice(response.data.advice);
@@ -313,7 +313,7 @@ export default function CultivationModule({ initialMethod, userFinancialData }:
             question: aiQuestion,
             method: method
         }, {
-            headers: { 'Authorization': `Bearer ${session.user.email}` }
+            headers: { 'Authorization': `Bearer ${session.apiToken}` }
         });
         setAiResponse(response.data.response);
         if (isImageRequest && response.data.imagePrompt) {
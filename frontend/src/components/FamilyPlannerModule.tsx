@@ -50,7 +50,7 @@ export default function FamilyPlannerModule() {
         if (session?.user?.email) {
             try {
                 const response = await apiClient.get('/family-plan/latest', {
-                    headers: { 'Authorization': `Bearer ${session.user.email}` }
+                    headers: { 'Authorization': `Bearer ${session.apiToken}` }
                 });
                 if (response.data) {
                     setAiPlan(response.data);
@@ -101,7 +101,7 @@ export default function FamilyPlannerModule() {
 
     try {
       const response = await apiClient.post('/family-plan/generate', planRequest, {
-        headers: { 'Authorization': `Bearer ${session.user.email}` }
+        headers: { 'Authorization': `Bearer ${session.apiToken}` }
       });
       setAiPlan(response.data);
       toast.success("¡Mapa de Ruta Familiar generado y guardado!", { id: toastId });
@@ -95,7 +95,7 @@ export default function FinanceModule({ onDataLoaded, isOpen }: FinanceModulePro
     setIsLoading(true);
     setError(null);
     try {
-      const apiHeaders = { headers: { 'Authorization': `Bearer ${session.user.email}` } };
+      const apiHeaders = { headers: { 'Authorization': `Bearer ${session.apiToken}` } };
       const [summaryRes, budgetRes, expensesRes, goalsRes] = await Promise.all([
         apiClient.get('/finance/analysis/resilience-summary', apiHeaders),
         apiClient.get('/finance/budget', apiHeaders),
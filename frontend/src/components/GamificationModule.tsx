@@ -90,7 +90,7 @@ export default function GamificationModule() {
                 setIsLoading(true);
                 try {
                     const response = await apiClient.get<GameProfile>('/gamification', {
-                        headers: { 'Authorization': `Bearer ${session.user.email}` }
+                        headers: { 'Authorization': `Bearer ${session.apiToken}` }
                     });
                     setProfile(response.data);
                     setFetchError(null);
@@ -53,8 +53,8 @@ export default function Header({ refreshTrigger }: HeaderProps) {
         }
         try {
             const [dashboardRes, gamificationRes] = await Promise.all([
-                apiClient.get('/finance/dashboard-summary', { headers: { 'Authorization': `Bearer ${session.user.email}` } }),
-                apiClient.get('/gamification', { headers: { 'Authorization': `Bearer ${session.user.email}` } }),
+                apiClient.get('/finance/dashboard-summary', { headers: { 'Authorization': `Bearer ${session.apiToken}` } }),
+                apiClient.get('/gamification', { headers: { 'Authorization': `Bearer ${session.apiToken}` } }),
             ]);
             setDashboardData(dashboardRes.data);
             setGameProfile(gamificationRes.data);
@@ -31,7 +31,7 @@ export default function History({ expensesData, onExpenseUpdate }: HistoryProps)
             const toastId = toast.loading("Borrando gasto...");
             try {
                 await apiClient.delete(`/finance/expenses/${id}`, {
-                    headers: { 'Authorization': `Bearer ${session.user?.email}` }
+                    headers: { 'Authorization': `Bearer ${session.apiToken}` }
                 });
                 toast.success("Gasto borrado con éxito.", { id: toastId });
                 onExpenseUpdate();
@@ -54,7 +54,7 @@ const OnboardingFlow = ({ onboardingCompleted, onboardingCompleteHandler }: Onbo
       const toastId = toast.loading("Guardando tu información y creando tu primer presupuesto...");
       try {
         await apiClient.post('/onboarding-complete', onboardingData, {
-          headers: { 'Authorization': `Bearer ${session.user.email}` },
+          headers: { 'Authorization': `Bearer ${session.apiToken}` },
         });
         toast.success("¡Información guardada con éxito!", { id: toastId });
         onboardingCompleteHandler();
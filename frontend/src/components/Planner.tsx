@@ -131,7 +131,7 @@ export default function Planner({ budgetData, onBudgetUpdate }: PlannerProps) {
             // CORRECCIÓN: Se utiliza apiClient en lugar de axios con URL completa
             await apiClient.post('/finance/budget',
                 { income, items: budgetItems },
-                { headers: { 'Authorization': `Bearer ${session.user.email}` } }
+                { headers: { 'Authorization': `Bearer ${session.apiToken}` } }
             );
             toast.success("¡Planificación guardada con éxito!", { id: toastId });
             onBudgetUpdate();
@@ -52,7 +52,7 @@ export default function SavingGoals({ goalsData, onGoalUpdate }: SavingGoalsProp
             // CORRECCIÓN: Se usa apiClient en lugar de axios con URL completa
             await apiClient.post('/finance/goals', 
                 { name: newGoalName, target_amount: newGoalAmount },
-                { headers: { 'Authorization': `Bearer ${session.user.email}` } }
+                { headers: { 'Authorization': `Bearer ${session.apiToken}` } }
             );
             toast.success("¡Meta creada con éxito!", { id: toastId });
             setNewGoalName('');
@@ -71,7 +71,7 @@ export default function SavingGoals({ goalsData, onGoalUpdate }: SavingGoalsProp
         try {
             // CORRECCIÓN: Se usa apiClient en lugar de axios con URL completa
             const response = await apiClient.get(`/finance/goals/projection/${goal.id}`, {
-                headers: { 'Authorization': `Bearer ${session.user.email}` }
+                headers: { 'Authorization': `Bearer ${session.apiToken}` }
             });
             setProjection(response.data);
             toast.dismiss(toastId);
@@ -33,8 +33,8 @@ export default function WalletModule() {
         setIsLoading(true);
         try {
             const [profileRes, transactionsRes] = await Promise.all([
-                apiClient.get('/gamification', { headers: { 'Authorization': `Bearer ${session.user.email}` } }),
-                apiClient.get('/market/my-transactions', { headers: { 'Authorization': `Bearer ${session.user.email}` } })
+                apiClient.get('/gamification', { headers: { 'Authorization': `Bearer ${session.apiToken}` } }),
+                apiClient.get('/market/my-transactions', { headers: { 'Authorization': `Bearer ${session.apiToken}` } })
             ]);
             
             setWalletData({
@@ -0,0 +1,9 @@
+// En: frontend/src/types/next-auth.d.ts
+import 'next-auth';
+
+declare module 'next-auth' {
+  interface Session {
+    // JWT para el header Authorization de la API (ver api/auth/[...nextauth]/route.ts).
+    apiToken?: string;
+  }
+}